@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""asyncio 服务核心：HTTP/1.1 长连接，静态文件 / kb.json / 下载预览在事件循环上直接发送，其余路由交给线程池。
+
+- 静态页面、/data/kb.json、/data/kb.meta.json、/download、/preview 由事件循环处理：打开文件与读取预压缩缓存放到线程池，
+  正文用 loop.sendfile（Linux 下即 os.sendfile）发送，不占用工作线程；
+- 其余路由（检索、标书分析、钉钉接口等）复用 server.Handler 的实现，在有界线程池中执行，请求体/响应体按块桥接，
+  路由与响应格式与线程版完全一致；
+- 文本抽取、分析、上传、Office 预览转换等耗时请求另有并发上限，排队超时返回 503，避免拖垮其它请求。
+
+线程版 server.py 仍可单独运行（TUANKB_SERVER=threading ./start.sh）。
+"""
+import io
+import os
+import sys
+import time
+import asyncio
+import posixpath
+import http.client
+from http import HTTPStatus
+from email.utils import formatdate
+from urllib.parse import urlparse, unquote
+from concurrent.futures import ThreadPoolExecutor
+
+import server
+import metrics
+from server import Handler, file_param, preview_target
+from file_send import file_response
+from precompress import load_precompressed, precompressed_response
+from preview_cache import PREVIEW_EXT
+
+HANDLER_WORKERS = int(os.environ.get("TUANKB_HANDLER_WORKERS", "32"))
+EXPENSIVE_LIMIT = int(os.environ.get("TUANKB_EXPENSIVE_LIMIT", "4"))
+# 耗时请求排队等待的最长秒数，超过返回 503
+EXPENSIVE_WAIT = float(os.environ.get("TUANKB_EXPENSIVE_WAIT", "30"))
+KEEPALIVE_TIMEOUT = float(os.environ.get("TUANKB_KEEPALIVE_TIMEOUT", "15"))
+MAX_HEADER_BYTES = 64 * 1024
+CHUNK = 256 * 1024
+# 处理完请求后未读完的请求体不超过该大小时读掉以复用连接，否则直接断开
+DRAIN_MAX = 1024 * 1024
+
+# 需要限流的耗时请求（文本抽取、分析、PDF 生成、上传落盘）
+EXPENSIVE_ROUTES = {
+    ("POST", "/api/bid/analyze"),
+    ("POST", "/api/bid/analyze_pdf"),
+    ("POST", "/api/dingtalk/bid/upload"),
+}
+_PRECOMPRESSED = {"/data/kb.json": "DATA_FILE", "/data/kb.meta.json": "META_FILE"}
+# 交给 Handler 处理、不按静态文件解析的路径前缀
+_DYNAMIC_PREFIX = ("/api/", "/thumb")
+
+_STATE = {"pool": None, "expensive": None}
+
+
+def _pool():
+    if _STATE["pool"] is None:
+        _STATE["pool"] = ThreadPoolExecutor(max_workers=max(1, HANDLER_WORKERS), thread_name_prefix="tuankb-http")
+    return _STATE["pool"]
+
+
+def _log(peer, req, code):
+    req["code"] = code
+    sys.stderr.write(f'{peer[0]} - - [{formatdate(localtime=True)}] "{req["requestline"]}" {code} -\n')
+
+
+def _parse_request(head: bytes):
+    lines = head[:-4].split(b"\r\n")
+    words = lines[0].decode("latin-1").split()
+    if len(words) != 3 or not words[2].startswith("HTTP/1."):
+        return None
+    method, target, version = words
+    headers = http.client.parse_headers(io.BytesIO(b"\r\n".join(lines[1:]) + b"\r\n\r\n"))
+    conn = headers.get("Connection", "").lower()
+    keep = "close" not in conn if version == "HTTP/1.1" else "keep-alive" in conn
+    return {
+        "method": method, "target": target, "version": version, "headers": headers, "keep": keep,
+        "requestline": f"{method} {target} {version}",
+    }
+
+
+def _head_bytes(code: int, headers, keep: bool) -> bytes:
+    try:
+        phrase = HTTPStatus(code).phrase
+    except ValueError:
+        phrase = ""
+    lines = [f"HTTP/1.1 {code} {phrase}", "Server: TuanKB", f"Date: {formatdate(usegmt=True)}"]
+    lines += [f"{k}: {v}" for k, v in headers]
+    lines.append("Connection: keep-alive" if keep else "Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1", errors="strict")
+
+
+async def _simple(writer, req, peer, code: int, body: bytes = b"", ctype: str = "text/plain; charset=utf-8", extra=()):
+    writer.write(_head_bytes(code, [("Content-Type", ctype), ("Content-Length", str(len(body))), *extra], False))
+    if req["method"] != "HEAD":
+        writer.write(body)
+    await writer.drain()
+    _log(peer, req, code)
+    return False
+
+
+async def _send_file(writer, req, peer, path: str, disposition, filename: str = None) -> bool:
+    loop = asyncio.get_running_loop()
+    f = await loop.run_in_executor(_pool(), open, path, "rb")
+    try:
+        code, headers, body = file_response(req["headers"], os.fstat(f.fileno()), filename or os.path.basename(path), disposition)
+        writer.write(_head_bytes(code, headers, req["keep"]))
+        if req["method"] != "HEAD":
+            for part in body:
+                if isinstance(part, bytes):
+                    writer.write(part)
+                else:
+                    await writer.drain()
+                    await loop.sendfile(writer.transport, f, *part)
+        await writer.drain()
+    finally:
+        f.close()
+    _log(peer, req, code)
+    return req["keep"]
+
+
+def _static_path(url_path: str):
+    # 与 SimpleHTTPRequestHandler.translate_path 一致：去掉 . / .. 后拼到站点根目录下
+    parts = [p for p in posixpath.normpath(unquote(url_path)).split("/") if p and p not in (".", "..")]
+    p = os.path.join(server.BASE, *parts)
+    if os.path.isdir(p):
+        if not url_path.endswith("/"):
+            return None
+        p = os.path.join(p, "index.html")
+    return p if os.path.isfile(p) else None
+
+
+async def _serve_native(req, u, writer, peer):
+    """事件循环上直接处理的 GET/HEAD 请求；不归这里处理（含 404 等错误）时返回 None，交给 Handler。"""
+    loop = asyncio.get_running_loop()
+    if u.path in _PRECOMPRESSED:
+        try:
+            ent = await loop.run_in_executor(_pool(), load_precompressed, getattr(server, _PRECOMPRESSED[u.path]))
+        except OSError:
+            # 文件缺失时交给 Handler，错误响应与线程版一致
+            return None
+        code, headers, body = precompressed_response(ent, req["headers"], "application/json; charset=utf-8")
+        writer.write(_head_bytes(code, headers, req["keep"]))
+        if req["method"] != "HEAD":
+            writer.write(body)
+        await writer.drain()
+        _log(peer, req, code)
+        return req["keep"]
+
+    if u.path in ("/download", "/preview"):
+        p = await loop.run_in_executor(_pool(), file_param, u)
+        if p is None:
+            return None
+        if u.path == "/download":
+            return await _send_file(writer, req, peer, p, "attachment")
+        if os.path.splitext(p)[1].lower() in PREVIEW_EXT:
+            # Office 预览可能要等 LibreOffice 转换，计入耗时请求并发上限
+            if not await _acquire_expensive():
+                return await _busy(writer, req, peer)
+            try:
+                target = await loop.run_in_executor(_pool(), preview_target, p)
+            finally:
+                _STATE["expensive"].release()
+        else:
+            target = (p, "inline", os.path.basename(p))
+        return await _send_file(writer, req, peer, target[0], target[1], target[2])
+
+    if u.path.startswith(_DYNAMIC_PREFIX):
+        return None
+    p = await loop.run_in_executor(_pool(), _static_path, u.path)
+    if p is None:
+        return None
+    return await _send_file(writer, req, peer, p, None)
+
+
+async def _acquire_expensive() -> bool:
+    try:
+        await asyncio.wait_for(_STATE["expensive"].acquire(), EXPENSIVE_WAIT)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def _busy(writer, req, peer):
+    body = '{"ok": false, "error": "服务繁忙，请稍后重试"}'.encode("utf-8")
+    return await _simple(writer, req, peer, 503, body, "application/json; charset=utf-8", extra=[("Retry-After", "10")])
+
+
+class _BodyReader:
+    """在工作线程中按块读取请求体（阻塞等待事件循环读取），最多读 Content-Length 字节。"""
+
+    def __init__(self, reader, loop, length: int):
+        self.reader, self.loop, self.left = reader, loop, length
+
+    async def _read(self, n: int) -> bytes:
+        try:
+            return await self.reader.readexactly(n)
+        except asyncio.IncompleteReadError as e:
+            return e.partial
+
+    def read(self, n: int = -1) -> bytes:
+        if self.left <= 0:
+            return b""
+        n = self.left if n is None or n < 0 else min(n, self.left)
+        data = asyncio.run_coroutine_threadsafe(self._read(n), self.loop).result()
+        self.left -= len(data)
+        if len(data) < n:
+            self.left = 0
+        return data
+
+
+class _ResponseWriter:
+    """工作线程写出的响应：检查响应头决定能否保持连接，正文按块交给事件循环发送（带背压）。"""
+
+    def __init__(self, writer, loop, req):
+        self.writer, self.loop, self.req = writer, loop, req
+        self.buf = bytearray()
+        self.code = None
+        self.keep = False
+
+    def _fix_head(self, data: bytes) -> bytes:
+        # Handler 在 end_headers 时一次写出完整响应头
+        head, sep, rest = bytes(data).partition(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        self.code = int(lines[0].split()[1])
+        names = {ln.split(":", 1)[0].strip().lower(): ln.split(":", 1)[1].strip().lower() for ln in lines[1:] if ":" in ln}
+        framed = "content-length" in names or self.code in (204, 304) or 100 <= self.code < 200
+        self.keep = self.req["keep"] and framed and names.get("connection") != "close"
+        if "connection" not in names:
+            lines.append("Connection: keep-alive" if self.keep else "Connection: close")
+        return "\r\n".join(lines).encode("latin-1") + sep + rest
+
+    async def _send(self, data: bytes):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    def _push(self):
+        if not self.buf:
+            return
+        data = bytes(self.buf)
+        self.buf.clear()
+        asyncio.run_coroutine_threadsafe(self._send(data), self.loop).result()
+
+    def write(self, b) -> int:
+        if self.code is None:
+            b = self._fix_head(b)
+        self.buf += b
+        if len(self.buf) >= CHUNK:
+            self._push()
+        return len(b)
+
+    def flush(self):
+        self._push()
+
+
+def _run_handler(req, peer, rfile, wfile):
+    h = Handler.__new__(Handler)
+    h.rfile, h.wfile = rfile, wfile
+    h.client_address, h.server, h.request, h.connection = peer, None, None, None
+    h.directory = server.BASE
+    h.command, h.path, h.request_version, h.requestline = req["method"], req["target"], req["version"], req["requestline"]
+    h.headers = req["headers"]
+    h.protocol_version = "HTTP/1.1"
+    h.close_connection = not req["keep"]
+    method = getattr(h, "do_" + req["method"], None)
+    try:
+        if method is None:
+            h.send_error(501, f"Unsupported method ({req['method']!r})")
+        else:
+            method()
+    except Exception as e:
+        if wfile.code is None:
+            h.send_error(500, str(e)[:200])
+        else:
+            wfile.keep = False
+        h.log_error("handler error: %r", e)
+    wfile.flush()
+
+
+async def _bridge(req, reader, writer, peer, length: int) -> bool:
+    loop = asyncio.get_running_loop()
+    rfile = _BodyReader(reader, loop, length)
+    wfile = _ResponseWriter(writer, loop, req)
+    await loop.run_in_executor(_pool(), _run_handler, req, peer, rfile, wfile)
+    req["code"] = wfile.code
+    if wfile.code is None:
+        return False
+    if rfile.left > 0:
+        if rfile.left > DRAIN_MAX:
+            return False
+        try:
+            await reader.readexactly(rfile.left)
+        except asyncio.IncompleteReadError:
+            return False
+    return wfile.keep
+
+
+async def _dispatch(req, reader, writer, peer) -> bool:
+    t0 = time.perf_counter()
+    metrics.request_started()
+    try:
+        return await _route(req, reader, writer, peer)
+    finally:
+        metrics.request_finished(req["method"], urlparse(req["target"]).path, req.get("code"), time.perf_counter() - t0)
+
+
+async def _route(req, reader, writer, peer) -> bool:
+    headers = req["headers"]
+    if headers.get("Transfer-Encoding"):
+        return await _simple(writer, req, peer, 501, b"chunked request body not supported")
+    try:
+        length = int(headers.get("Content-Length") or 0)
+    except ValueError:
+        return await _simple(writer, req, peer, 400, b"bad Content-Length")
+    u = urlparse(req["target"])
+    if req["method"] in ("GET", "HEAD"):
+        keep = await _serve_native(req, u, writer, peer)
+        if keep is not None:
+            return keep
+    if (req["method"], u.path) in EXPENSIVE_ROUTES:
+        if not await _acquire_expensive():
+            return await _busy(writer, req, peer)
+        try:
+            return await _bridge(req, reader, writer, peer, length)
+        finally:
+            _STATE["expensive"].release()
+    return await _bridge(req, reader, writer, peer, length)
+
+
+async def _handle_conn(reader, writer):
+    peer = writer.get_extra_info("peername") or ("-", 0)
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+            except asyncio.LimitOverrunError:
+                writer.write(_head_bytes(431, [("Content-Length", "0")], False))
+                return
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                return
+            req = _parse_request(head)
+            if req is None:
+                writer.write(_head_bytes(400, [("Content-Length", "0")], False))
+                return
+            if not await _dispatch(req, reader, writer, peer):
+                return
+    except ConnectionError:
+        pass
+    except Exception as e:
+        sys.stderr.write(f"{peer[0]} connection error: {e!r}\n")
+    finally:
+        try:
+            writer.close()
+        except Exception:
+            pass
+
+
+async def start(host: str, port: int):
+    _STATE["expensive"] = asyncio.Semaphore(max(1, EXPENSIVE_LIMIT))
+    return await asyncio.start_server(_handle_conn, host, port, limit=MAX_HEADER_BYTES, backlog=512)
+
+
+async def _main(host: str, port: int):
+    srv = await start(host, port)
+    print(f"TuanKB serving on http://{host}:{port} base={server.BASE} (asyncio)")
+    async with srv:
+        await srv.serve_forever()
+
+
+if __name__ == "__main__":
+    server.kb_snapshot()
+    server.start_bid_workers()
+    asyncio.run(_main(server.HOST, server.PORT))
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""招标文件分析基准：单遍扫描 analyze_bid_text 对比 原逐项扫描全文的实现。
+
+用法：python3 scripts/bench_bid.py [--pages 50,500,2000] [--rounds 3]
+每个规模先校验两种实现输出的 JSON 逐字节一致，再输出各自的平均耗时。
+"""
+import re
+import json
+import time
+import random
+import argparse
+
+from bid_analysis import analyze_bid_text, split_pages
+from text_extract import normalize_text
+
+LINES = [
+    "第一章 投标邀请", "一、项目名称：某化工园区安全风险智能化管控平台建设项目", "采购需求详见第三章",
+    "投标人须具备有效的营业执照及相关资质证书", "近三年具有类似项目业绩不少于2个，以合同金额为准",
+    "项目经理须具有注册安全工程师证书及高级职称", "投标人不得被列入失信被执行人黑名单，无行政处罚记录",
+    "出现下列情形之一的，投标将被否决：", "未按要求签章的视为无效投标", "其他要求：特别说明见补充条款",
+    "商务评分（30分）", "商务部分：企业资质每项得2分，最高6分", "技术评分 60 分", "技术部分：总体技术方案合理得10.5分",
+    "价格评分采用低价优先法，评审基准价为有效投标报价的最低价", "报价得分=(评审基准价/投标报价)×10", "价格分 10分",
+    "投标文件组成及目录", "响应文件格式见附件", "资格审查资料", "承诺函（格式自拟）", "声明函", "技术要求与技术方案",
+    "备注：本项目不接受联合体投标", "附件1 法定代表人授权书", "ISO9001 认证", "团队人员配置表", "信用记录查询",
+    "本页无正文", "    ", "交货期：合同签订后90日内", "付款方式：按进度支付", "质保期：三年",
+]
+
+
+def make_tender(pages: int, seed: int = 3):
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(pages):
+        # 多数页面为正文填充，命中行稀疏分布，贴近真实招标文件
+        body = [rnd.choice(LINES) if rnd.random() < 0.15 else "正文内容" * rnd.randint(3, 20) for _ in range(rnd.randint(20, 60))]
+        out.append("\n".join(body))
+    return "\f".join(out)
+
+
+# ---- 以下为改造前 server.py 的实现，仅用于对照 ----
+
+def _find_hits(text: str, keywords, max_items=5, max_len=110):
+    pages = split_pages(text)
+    out = []
+    seen = set()
+    for idx, p in enumerate(pages, 1):
+        for ln in [x.strip() for x in re.split(r"[\r\n]+", p) if x.strip()]:
+            s = ln.lower()
+            if any(k.lower() in s for k in keywords):
+                one = re.sub(r"\s+", " ", ln)[:max_len]
+                key = (one, idx)
+                if key in seen:
+                    continue
+                seen.add(key)
+                out.append({"point": one, "page": idx})
+            if len(out) >= max_items:
+                break
+        if len(out) >= max_items:
+            break
+    return out
+
+
+def _make_rows(text: str, keywords, suggestion: str, max_items=4):
+    hits = _find_hits(text, keywords, max_items=max_items)
+    if not hits:
+        return [{"point": "未明显命中，建议人工复核原文。", "suggestion": suggestion, "page": "-"}]
+    return [{"point": h["point"], "suggestion": suggestion, "page": h["page"]} for h in hits]
+
+
+def _score_rows(text: str, keywords, suggestion: str, max_items=8):
+    hits = _find_hits(text, keywords, max_items=max_items)
+    rows = []
+    for h in hits:
+        m = re.search(r"(\d+(?:\.\d+)?)\s*分", h["point"])
+        score = m.group(1) + "分" if m else "未明确"
+        rows.append({"point": f"{h['point']}（分值：{score}）", "suggestion": suggestion, "page": h["page"]})
+    if not rows:
+        rows = [{"point": "未识别到明确评分条款，按通用结构输出。", "suggestion": suggestion, "page": "-"}]
+    return rows
+
+
+def legacy_analyze(text: str):
+    text = normalize_text(text)
+    return {
+        "供应商分析": {
+            "资质要求": _make_rows(text, ["资质", "资格", "营业执照", "认证", "证书"], "逐条准备资质证明并对应招标条款编号。"),
+            "业绩要求": _make_rows(text, ["业绩", "类似项目", "合同金额", "案例"], "准备对应合同、验收与中标通知书证明链。"),
+            "项目团队分析": _make_rows(text, ["项目经理", "团队", "人员", "工程师", "注册", "职称"], "根据评审办法准备人员证书、社保与任命文件。"),
+            "信誉要求": _make_rows(text, ["信誉", "信用", "不良记录", "处罚", "黑名单"], "提供信用中国、裁判文书等查询截图并加盖公章。"),
+            "废标条款分析": _make_rows(text, ["废标", "否决", "无效投标", "一票否决"], "建立废标条款核查清单，提交前逐项打勾复核。"),
+            "其他要求": _make_rows(text, ["其他要求", "特别说明", "补充"], "将补充条款纳入响应偏离表并逐条响应。"),
+        },
+        "评分分析": {
+            "商务评分": _score_rows(text, ["商务评分", "商务部分", "商务分"], "围绕可得分项准备对应证明材料，避免失分。"),
+            "技术评分": _score_rows(text, ["技术评分", "技术部分", "技术分"], "按评分细则组织技术方案，逐点评分响应。"),
+            "价格评分": _score_rows(text, ["价格评分", "报价得分", "价格分", "评审基准价"], "明确评审基准价公式并反推报价区间。"),
+        },
+        "标书编制分析": {
+            "响应标书文件目录要求": _make_rows(text, ["响应文件组成", "响应文件格式", "投标文件组成", "目录"], "按招标文件目录顺序逐章编排并保持页码连续。"),
+            "商务标书编制分析（商务评分标准）": _make_rows(text, ["商务评分", "商务文件", "资格审查", "承诺函"], "形成商务标材料清单（含承诺函）并一一对应评分点。"),
+            "技术标书编制分析（技术评分标准）": _make_rows(text, ["技术评分", "技术要求", "采购需求", "技术方案"], "围绕采购需求逐条响应，补充图表和里程碑计划。"),
+            "价格部分编制分析": _make_rows(text, ["价格评分", "最低价", "平均价", "评审基准价"], "按评分法测算最优报价区间并给出报价策略。"),
+            "承诺函分析": _make_rows(text, ["承诺函", "声明函", "承诺"], "梳理并统一模板，确保签章、日期、主体一致。"),
+            "其他部分分析": _make_rows(text, ["附件", "补充", "备注"], "将附件与正文建立交叉引用，防止缺页漏项。"),
+        }
+    }
+
+
+def _timeit(fn, rounds: int):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - t0) / rounds
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", default="50,500,2000")
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    # 边界样例：无命中、无分页符、大小写混排
+    samples = ["", "正文内容\n" * 100, "ISO认证\nAbc 资质\n\n\f\f 目录 \n", make_tender(3, seed=9).replace("\f", "\n")]
+    for n in [int(x) for x in args.pages.split(",") if x]:
+        samples.append(make_tender(n))
+    for text in samples:
+        a = json.dumps(legacy_analyze(text), ensure_ascii=False)
+        b = json.dumps(analyze_bid_text(text), ensure_ascii=False)
+        if a != b:
+            raise SystemExit(f"analysis mismatch (len={len(text)})\n{a}\n{b}")
+    print(f"golden: {len(samples)} samples identical")
+
+    for n in [int(x) for x in args.pages.split(",") if x]:
+        text = make_tender(n)
+        old = _timeit(lambda: legacy_analyze(text), args.rounds)
+        new = _timeit(lambda: analyze_bid_text(text), args.rounds)
+        print(f"pages={n:<6} chars={len(text):<9} legacy={old * 1000:8.1f}ms single-pass={new * 1000:8.1f}ms x{old / max(new, 1e-9):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""分类引擎黄金对照 + 吞吐基准。
+
+在合成路径语料上逐条比对 classify() 与参考实现 detect_category / detect_tags /
+project_name 的输出，任何不一致即以非零状态退出；随后输出两者的吞吐量。
+用法：python3 scripts/bench_classify.py [--n 200000] [--seed 1]
+"""
+import argparse
+import random
+import time
+
+import build_index as bi
+
+
+def _vocab():
+    words = {bi.QUAL_FOLDER_HINT, "图安世纪资质", "招标", "投标", "合同", "v2x", "V2X", "开发区", "AI", "Ai", "LLM", "HSE"}
+    words.update(bi.QUOTE_KEYWORDS, bi.STANDARD_KEYWORDS, bi.AI_FILE_KEYWORDS, bi.RULE_SAFETY, bi.RULE_PARK, bi.RULE_EMERGENCY, bi.RULE_V2X)
+    words.update(bi.PRIMARY_TAGS)
+    for subs in bi.PRIMARY_TAGS.values():
+        words.update(subs)
+    for m in bi.SUBTAG_KEYWORDS.values():
+        for kws in m.values():
+            words.update(kws)
+            words.update(k.upper() for k in kws)
+    for _, kws in bi.QUAL_GROUP_RULES:
+        words.update(kws)
+    # 干扰词：拆开的关键词、版本号、日期、无关中文
+    words.update(["南京", "化工", "园", "应", "急", "指挥中心", "v2", "终版", "2024-05-01", "方案", "汇报", "副本", "(1)", "【内部】", " ", "-", "_"])
+    return sorted(words)
+
+
+def make_corpus(n: int, seed: int):
+    rnd = random.Random(seed)
+    vocab = _vocab()
+    exts = [".pdf", ".docx", ".doc", ".pptx", ".ppt", ".xlsx", ".xls", ".mp4", ".mov", ".txt", ".zip", ""]
+    roots = ["/mnt/tuan", "/mnt/tuan/0图安世纪-标准解决方案", bi.QUAL_FOLDER_HINT, "/mnt/tuan/项目资料"]
+    out = []
+    for _ in range(n):
+        dirs = ["".join(rnd.choice(vocab) for _ in range(rnd.randint(0, 3))) or "资料" for _ in range(rnd.randint(0, 3))]
+        name = "".join(rnd.choice(vocab) for _ in range(rnd.randint(1, 4))).replace("/", "") + rnd.choice(exts)
+        path = "/".join([rnd.choice(roots)] + dirs + [name])
+        out.append((path, name))
+    return out
+
+
+def make_tree_corpus(n: int, seed: int):
+    # 更接近真实目录结构：多层目录、每个目录下若干文件
+    rnd = random.Random(seed)
+    vocab = _vocab()
+    segs = ["0图安世纪-标准解决方案", "01 图安世纪资质", "03 解决方案", "2023年", "2024年", "南京江北新材料科技园", "东营港经济开发区",
+            "项目资料", "投标归档", "汇报材料", "历史版本", "客户提供"] + vocab
+    dirs = []
+    for _ in range(max(1, n // 15)):
+        depth = rnd.randint(2, 6)
+        dirs.append("/".join(["/mnt/tuan"] + [rnd.choice(segs).replace("/", "") or "资料" for _ in range(depth)]))
+    exts = [".pdf", ".docx", ".pptx", ".xlsx", ".mp4", ".doc"]
+    out = []
+    for i in range(n):
+        d = rnd.choice(dirs)
+        name = rnd.choice(segs).replace("/", "") + rnd.choice(["建设方案", "汇报", "（终版）", "v2", "清单", ""]) + rnd.choice(exts)
+        out.append((f"{d}/{name}", name))
+    return out
+
+
+def reference(path: str, name: str):
+    ext = bi.os.path.splitext(name)[1].lower()
+    cat = bi.detect_category(path, ext, name)
+    primary, secondary = bi.detect_tags(path, name)
+    return cat, primary, secondary, bi.project_name(path, name, cat)
+
+
+def compiled(path: str, name: str):
+    return bi.classify(path, bi.os.path.splitext(name)[1].lower(), name)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    corpora = [("dense", make_corpus(args.n, args.seed)), ("tree", make_tree_corpus(args.n, args.seed))]
+    failed = False
+    for label, corpus in corpora:
+        mismatches = 0
+        for path, name in corpus:
+            a, b = reference(path, name), compiled(path, name)
+            if a != b:
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f"MISMATCH {path!r}\n  reference={a}\n  compiled ={b}")
+        print(f"golden[{label}]: {len(corpus)} paths, {mismatches} mismatches")
+        failed = failed or mismatches > 0
+    if failed:
+        raise SystemExit(1)
+
+    for label, corpus in corpora:
+        for impl, fn in (("reference", reference), ("compiled", compiled)):
+            bi._dir_hits.cache_clear()
+            t0 = time.perf_counter()
+            for path, name in corpus:
+                fn(path, name)
+            cost = time.perf_counter() - t0
+            print(f"{label:<6} {impl:<9} {cost:.2f}s  {len(corpus) / cost:,.0f} files/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""/download 吞吐基准：sendfile 零拷贝 对比 原 64KB read/write 循环。
+
+用法：python3 scripts/bench_download.py [--size-mb 256] [--clients 1,4] [--rounds 3]
+在临时目录生成测试文件，分别启动两种实现的本机服务，用原始 socket 下载并丢弃数据，
+先校验两者返回的字节数与文件大小一致，再输出各并发数下的总吞吐（MB/s）。
+"""
+import os
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+from urllib.parse import quote, urlparse, parse_qs, unquote
+from http.server import ThreadingHTTPServer
+
+import server
+
+
+class QuietHandler(server.Handler):
+    def log_message(self, *args):
+        pass
+
+
+class LegacyHandler(QuietHandler):
+    def do_GET(self):
+        # 与改造前 server.py 的 /download 实现一致
+        u = urlparse(self.path)
+        p = os.path.realpath(unquote(parse_qs(u.query).get("path", [""])[0]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(os.path.basename(p))}")
+        self.send_header("Content-Length", str(os.path.getsize(p)))
+        self.end_headers()
+        with open(p, "rb") as f:
+            while True:
+                chunk = f.read(1024 * 64)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+
+def _serve(handler):
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def _fetch(port: int, path: str) -> int:
+    s = socket.create_connection(("127.0.0.1", port))
+    s.sendall(f"GET /download?path={quote(path)} HTTP/1.0\r\nHost: bench\r\n\r\n".encode())
+    buf = bytearray(1024 * 1024)
+    head = b""
+    body = 0
+    while True:
+        n = s.recv_into(buf)
+        if not n:
+            break
+        if head is not None:
+            head += bytes(buf[:n])
+            idx = head.find(b"\r\n\r\n")
+            if idx >= 0:
+                body += len(head) - idx - 4
+                head = None
+            continue
+        body += n
+    s.close()
+    return body
+
+
+def _run(port: int, path: str, clients: int, rounds: int):
+    size = os.path.getsize(path)
+    best = 0.0
+    for _ in range(rounds):
+        got = []
+        threads = [threading.Thread(target=lambda: got.append(_fetch(port, path))) for _ in range(clients)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        cost = time.perf_counter() - t0
+        if got != [size] * clients:
+            raise SystemExit(f"返回字节数不一致：{got} != {size}")
+        best = max(best, size * clients / cost / 1024 / 1024)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size-mb", type=int, default=256)
+    ap.add_argument("--clients", default="1,4")
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="tuankb-bench-")
+    try:
+        path = os.path.join(tmp, "演示视频.mp4")
+        with open(path, "wb") as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+        server.ROOT = tmp
+        servers = {"loop": _serve(LegacyHandler), "sendfile": _serve(QuietHandler)}
+        for clients in [int(x) for x in args.clients.split(",") if x]:
+            for label, srv in servers.items():
+                mbps = _run(srv.server_address[1], path, clients, args.rounds)
+                print(f"{label:<9} size={args.size_mb}MB clients={clients:<3} {mbps:10.0f} MB/s")
+        for srv in servers.values():
+            srv.shutdown()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""HTTP 服务基准：asyncio 服务核心（aio_server.py）对比 原 ThreadingHTTPServer（server.py）。
+
+用法：python3 scripts/bench_http.py [--docs 20000] [--clients 8,64] [--seconds 5]
+在临时目录生成合成知识库（kb.json、分类分片、检索索引），分别启动两种服务，
+每个客户端线程用 http.client 复用连接循环请求混合负载（首屏清单、首页、分类分页、检索），
+先校验两者各路由返回的状态码与正文一致，再输出各并发数下的 req/s 与 p50/p99 延迟。
+"""
+import os
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import threading
+import http.client
+from urllib.parse import quote
+from http.server import ThreadingHTTPServer
+
+import server
+import aio_server
+import build_index
+import search_cache
+from precompress import write_precompressed
+from search_index import build_search_index, dump_search_index
+from bench_search import make_docs
+
+
+class QuietHandler(server.Handler):
+    def log_message(self, *args):
+        pass
+
+
+def _make_kb(tmp: str, n: int):
+    docs = make_docs(n)
+    cat_map = {c: [] for c in build_index.CATEGORY_ORDER}
+    for d in docs:
+        cat_map[d["category"]].append(d)
+    for c in cat_map:
+        cat_map[c].sort(key=lambda x: x["updated_at"], reverse=True)
+    out = {
+        "generated_at": "2026-01-01 02:00:00",
+        "generation": "bench",
+        "root": "/mnt/tuan",
+        "total_raw_files": n,
+        "total_indexed_latest": n,
+        "categories": [{"name": c, "count": len(cat_map[c])} for c in build_index.CATEGORY_ORDER],
+        "tag_tree": build_index.PRIMARY_TAGS,
+        "by_category": cat_map,
+    }
+    server.DATA_FILE = os.path.join(tmp, "kb.json")
+    server.META_FILE = build_index.META_OUT = os.path.join(tmp, "kb.meta.json")
+    server.SEARCH_INDEX_FILE = os.path.join(tmp, "kb.search.json")
+    server.PACK_FILE = os.path.join(tmp, "kb.pack")
+    server.SUGGEST_FILE = os.path.join(tmp, "kb.suggest")
+    search_cache.HISTORY_FILE = os.path.join(tmp, "search_history.json")
+    build_index.SHARD_DIR = os.path.join(tmp, "kb.shards")
+    raw = json.dumps(out, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    with open(server.DATA_FILE, "wb") as f:
+        f.write(raw)
+    write_precompressed(server.DATA_FILE, raw)
+    build_index.write_shards(out, cat_map)
+    flat = [d for c in build_index.CATEGORY_ORDER for d in cat_map[c]]
+    with open(server.SEARCH_INDEX_FILE, "w", encoding="utf-8") as f:
+        json.dump(dump_search_index(build_search_index(flat), out["generation"]), f, ensure_ascii=False)
+    server.kb_snapshot()
+
+
+def _workload():
+    paths = ["/data/kb.meta.json", "/index.html", "/api/search?q=" + quote("化工园区"),
+             "/api/search?q=" + quote("南京 应急指挥")]
+    for c in ("招标文档", "投标文档", "汇报PPT"):
+        paths.append(f"/api/docs?category={quote(c)}&page=1&size=50")
+    paths.append(f"/api/docs?category={quote('解决方案文档')}&q={quote('双重预防')}&page=2&size=50")
+    return paths
+
+
+def _serve_threading():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), QuietHandler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv.server_address[1]
+
+
+def _serve_aio():
+    aio_server.Handler = QuietHandler
+    aio_server._log = lambda *args: None
+    ready = threading.Event()
+    box = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        srv = loop.run_until_complete(aio_server.start("127.0.0.1", 0))
+        box["port"] = srv.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return box["port"]
+
+
+def _fetch(conn, path: str):
+    conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+    r = conn.getresponse()
+    return r.status, r.read()
+
+
+def _check(ports: dict, paths):
+    got = {}
+    for label, port in ports.items():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        got[label] = [_fetch(conn, p) for p in paths]
+        conn.close()
+    a, b = got.values()
+    for p, x, y in zip(paths, a, b):
+        if x != y:
+            raise SystemExit(f"响应不一致：{p} {x[0]} != {y[0]}")
+
+
+def _client(port: int, paths, deadline: float, lat: list, errors: list, offset: int):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    i = offset
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            status, _ = _fetch(conn, paths[i % len(paths)])
+            if status != 200:
+                errors.append(status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(repr(e))
+            conn.close()
+        lat.append(time.perf_counter() - t0)
+        i += 1
+    conn.close()
+
+
+def _run(port: int, paths, clients: int, seconds: float):
+    lat, errors = [], []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=_client, args=(port, paths, deadline, lat, errors, i)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cost = time.perf_counter() - t0
+    lat.sort()
+    pct = lambda q: lat[min(len(lat) - 1, int(len(lat) * q))] * 1000 if lat else 0.0
+    return len(lat) / cost, pct(0.5), pct(0.99), len(errors)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=20000)
+    ap.add_argument("--clients", default="8,64")
+    ap.add_argument("--seconds", type=float, default=5)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="tuankb-bench-")
+    try:
+        _make_kb(tmp, args.docs)
+        paths = _workload()
+        ports = {"threading": _serve_threading(), "asyncio": _serve_aio()}
+        _check(ports, paths)
+        for clients in [int(x) for x in args.clients.split(",") if x]:
+            for label, port in ports.items():
+                rps, p50, p99, errors = _run(port, paths, clients, args.seconds)
+                print(f"{label:<9} docs={args.docs} clients={clients:<4} {rps:8.0f} req/s  p50={p50:7.1f}ms  p99={p99:7.1f}ms  errors={errors}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
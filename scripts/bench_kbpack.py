@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""kb.pack 与 kb.json 对比：文件大小、服务端加载耗时与内存（RSS），并校验两种格式的检索结果一致。
+
+用法：python3 scripts/bench_kbpack.py [--files 100000] [--keep DIR]
+在合成目录树（synth_corpus）上执行一次全量构建（不含正文抽取与缩略图），
+然后分别在独立子进程中以 kb.json / kb.pack 加载 server.py 的知识库快照，记录加载前后的 RSS。
+"""
+import os
+import io
+import sys
+import gc
+import gzip
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+import build_index
+from bench_suite import QUERIES, _build_outputs_in
+from synth_corpus import make_tree
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(out_dir: str, fmt: str):
+    import server
+    import search_cache
+    # 只比较加载与检索本身：不预热、不缓存结果
+    search_cache.SEARCH_PREWARM = search_cache.SEARCH_CACHE_SIZE = 0
+    server.DATA_FILE = os.path.join(out_dir, "kb.json")
+    server.PACK_FILE = os.path.join(out_dir, "kb.pack")
+    server.SUGGEST_FILE = os.path.join(out_dir, "kb.suggest")
+    server.SEARCH_INDEX_FILE = os.path.join(out_dir, "kb.search.json")
+    server.KB_PACK = fmt == "pack"
+    gc.collect()
+    before = _rss_mb()
+    t0 = time.perf_counter()
+    snap = server.kb_snapshot()
+    load_s = time.perf_counter() - t0
+    gc.collect()
+    after = _rss_mb()
+    results, costs = [], []
+    for q in QUERIES:
+        t0 = time.perf_counter()
+        count, hits = server.search_kb(q, 5, snap)
+        costs.append(time.perf_counter() - t0)
+        results.append([count, [d["file_path"] for _, d in hits]])
+    print(json.dumps({"format": snap["format"], "docs": len(snap["docs"]), "rss_before_mb": before, "rss_after_mb": after,
+                      "load_s": load_s, "search_avg_ms": sum(costs) / len(costs) * 1000, "results": results}))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=100000)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--keep", metavar="DIR", help="合成目录树保存在 DIR 下并复用")
+    ap.add_argument("--child", nargs=2, metavar=("OUT_DIR", "FORMAT"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        _child(*args.child)
+        return
+
+    tmp = tempfile.mkdtemp(prefix="tuankb-pack-")
+    try:
+        root = os.path.join(args.keep, f"tree-{args.files}-{args.seed}") if args.keep else os.path.join(tmp, "tree")
+        if not os.path.isdir(root):
+            make_tree(root, args.files, args.seed)
+        _build_outputs_in(tmp, root)
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_index.build(full=True, content=False, thumbs=False, prewarm_previews=0)
+        sizes = {}
+        for name in ("kb.json", "kb.pack"):
+            with open(os.path.join(tmp, name), "rb") as f:
+                raw = f.read()
+            sizes[name] = (len(raw), len(gzip.compress(raw, compresslevel=6)))
+        print(f"== files={args.files}")
+        for name, (n, gz) in sizes.items():
+            print(f"{name:<8} {n / 1024 / 1024:8.1f}MB  gzip {gz / 1024 / 1024:6.1f}MB")
+
+        runs = {}
+        for fmt in ("json", "pack"):
+            p = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", tmp, fmt],
+                               capture_output=True, text=True, check=True)
+            r = runs[fmt] = json.loads(p.stdout.strip().splitlines()[-1])
+            print(f"{r['format']:<8} docs={r['docs']} load={r['load_s']:.2f}s rss {r['rss_before_mb']:.0f}MB -> "
+                  f"{r['rss_after_mb']:.0f}MB (+{r['rss_after_mb'] - r['rss_before_mb']:.0f}MB) "
+                  f"search avg={r['search_avg_ms']:.2f}ms")
+        same = runs["json"]["results"] == runs["pack"]["results"]
+        print(f"results identical: {same}")
+        if not same:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
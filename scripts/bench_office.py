@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Office 转换基准：常驻工作进程池 对比 原每文件启动一次 libreoffice。
+
+用法：python3 scripts/bench_office.py 样例1.xlsx [样例2.xls ...] [--rounds 5] [--fmt csv]
+需要本机已安装 LibreOffice；输出两种方式的单次转换平均/最大延迟（池模式含首次启动）。
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import office_pool
+
+
+def spawn_convert(src: str, fmt: str, outdir: str):
+    # 与改造前 text_extract.py 的调用方式一致（默认配置目录，每次冷启动）
+    subprocess.run([office_pool.OFFICE_BIN, "--headless", "--convert-to", fmt, "--outdir", outdir, src],
+                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=office_pool.OFFICE_TIMEOUT)
+    out = os.path.join(outdir, os.path.splitext(os.path.basename(src))[0] + "." + fmt)
+    if not os.path.exists(out):
+        raise RuntimeError(f"转换失败：{src}")
+    return out
+
+
+def _run(fn, files, fmt: str, rounds: int):
+    costs = []
+    for _ in range(rounds):
+        for src in files:
+            outdir = tempfile.mkdtemp(prefix="tuankb-bench-")
+            try:
+                t0 = time.perf_counter()
+                fn(src, fmt, outdir)
+                costs.append(time.perf_counter() - t0)
+            finally:
+                shutil.rmtree(outdir, ignore_errors=True)
+    return costs
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("files", nargs="+")
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--fmt", default="csv")
+    args = ap.parse_args()
+
+    if shutil.which(office_pool.OFFICE_BIN) is None:
+        raise SystemExit(f"未找到 {office_pool.OFFICE_BIN}，请安装 LibreOffice 或设置 TUANKB_SOFFICE")
+
+    print(f"pool mode={office_pool.pool_stats()['mode']} workers={office_pool.OFFICE_WORKERS}")
+    for label, fn in (("spawn", spawn_convert), ("pool", office_pool.convert)):
+        costs = _run(fn, args.files, args.fmt, args.rounds)
+        print(f"{label:<6} n={len(costs):<4} first={costs[0] * 1000:8.0f}ms avg={sum(costs) / len(costs) * 1000:8.0f}ms "
+              f"max={max(costs) * 1000:8.0f}ms")
+    print(office_pool.pool_stats())
+
+
+if __name__ == "__main__":
+    main()
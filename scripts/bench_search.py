@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""/api/search 检索基准：倒排索引 + top-k 堆 对比 原全量线性扫描。
+
+用法：python3 scripts/bench_search.py [--sizes 10000,100000,1000000] [--rounds 3]
+每个规模先校验两种实现的 count 与 top5 完全一致，再输出各自的平均/最大耗时。
+"""
+import argparse
+import random
+import time
+
+from search_index import score_doc, build_search_index, search
+
+CATS = ["汇报PPT", "解决方案文档", "招标文档", "投标文档", "报价文档", "合同文档", "标准规范", "演示视频", "图安资质", "其他"]
+INDUSTRIES = ["AI赋能", "安全生产", "智慧园区", "应急管理", "车路协同", "其他行业"]
+PLACES = ["南京", "苏州", "无锡", "常州", "连云港", "宁波", "嘉兴", "东营", "淄博", "惠州", "泉州", "荆门"]
+TOPICS = ["化工园区", "应急指挥", "双重预防", "重大危险源", "智慧高速", "人员定位", "安全生产标准化", "应急演练", "经开区", "AI视频分析一体机", "大模型", "HSE"]
+KINDS = ["建设方案", "技术方案", "汇报", "招标文件", "投标文件", "报价清单", "合同", "需求说明"]
+EXTS = [".docx", ".pdf", ".pptx", ".xlsx", ".mp4"]
+QUERIES = ["化工园区", "应急指挥", "南京 化工园区", "hse", "智慧高速", "v2", "报价", "园", "AI", "东营-双重预防", "不存在的项目名称"]
+
+
+def make_docs(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    docs = []
+    for i in range(n):
+        place, topic, kind = rnd.choice(PLACES), rnd.choice(TOPICS), rnd.choice(KINDS)
+        ext = rnd.choice(EXTS)
+        suffix = rnd.choice(["", "v2", "终版", f"{2020 + i % 6}{1 + i % 12:02d}{1 + i % 28:02d}"])
+        title = f"{place}{topic}{kind}{suffix}-{i}{ext}"
+        docs.append({
+            "title": title,
+            "category": rnd.choice(CATS),
+            "project_name": f"{place}{topic}项目",
+            "industry_type": rnd.choice(INDUSTRIES),
+            "updated_at": f"20{20 + i % 6}-{1 + i % 12:02d}-{1 + i % 28:02d} 10:00:00",
+            "file_path": f"/mnt/tuan/0图安世纪-标准解决方案/{topic}/{place}/{title}",
+        })
+    return docs
+
+
+def linear_search(docs, q: str, k: int = 5):
+    # 与改造前 server.py 的实现一致
+    ranked = []
+    for d in docs:
+        s = score_doc(q, d)
+        if s > 0:
+            item = dict(d)
+            item["score"] = s
+            ranked.append(item)
+    ranked.sort(key=lambda x: (x.get("score", 0), x.get("updated_at", "")), reverse=True)
+    return len(ranked), [(x["score"], x["title"]) for x in ranked[:k]]
+
+
+def indexed_search(docs, index, q: str, k: int = 5):
+    count, top = search(docs, index, q, k)
+    return count, [(s, d["title"]) for s, d in top]
+
+
+def _timeit(fn, rounds: int):
+    costs = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        costs.append(time.perf_counter() - t0)
+    return sum(costs) / len(costs), max(costs)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    for n in [int(x) for x in args.sizes.split(",") if x]:
+        docs = make_docs(n)
+        t0 = time.perf_counter()
+        index = build_search_index(docs)
+        t_build = time.perf_counter() - t0
+        print(f"== docs={n} index_build={t_build:.2f}s terms={len(index['postings'])}")
+        for q in QUERIES:
+            expect = linear_search(docs, q)
+            got = indexed_search(docs, index, q)
+            if expect != got:
+                raise SystemExit(f"ranking mismatch for q={q!r}: {expect} != {got}")
+            lin_avg, lin_max = _timeit(lambda: linear_search(docs, q), args.rounds)
+            idx_avg, idx_max = _timeit(lambda: indexed_search(docs, index, q), args.rounds)
+            print(f"q={q!r:<16} hits={expect[0]:<8} linear avg={lin_avg * 1000:8.1f}ms max={lin_max * 1000:8.1f}ms | "
+                  f"index avg={idx_avg * 1000:8.1f}ms max={idx_max * 1000:8.1f}ms | x{lin_avg / max(idx_avg, 1e-9):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""/api/suggest 前缀索引基准：构建耗时、文件大小、查询延迟分位数，并与线性扫描对照校验结果。
+
+用法：python3 scripts/bench_suggest.py [--sizes 100000,1000000] [--queries 2000] [--verify 200]
+查询集取语料中项目名/标题的各长度前缀、拼音首字母前缀与常见 ASCII 前缀。
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from bench_search import make_docs
+from suggest import build_suggest, open_suggest, suggest, pinyin_initials, _key_at, MAX_K
+
+
+def _queries(docs, n: int, seed: int = 5):
+    rnd = random.Random(seed)
+    out = ["v", "ai", "hse", "2024", "南", "化工", "应急指挥", "h", "hg", "hgyq", "yjzh", "njhg", "不存在"]
+    while len(out) < n:
+        d = rnd.choice(docs)
+        text = rnd.choice([d["project_name"], os.path.splitext(d["title"])[0]])
+        if rnd.random() < 0.3:
+            text = pinyin_initials(text) or text
+        out.append(text[:rnd.randint(1, min(8, len(text)))])
+    return out
+
+
+def _linear(keys, idx, q: str, k: int):
+    # 对照实现：逐个键比较前缀
+    ids = sorted({idx["key_entry"][i] for i, key in enumerate(keys) if key.startswith(q)})[:k]
+    return [str(idx["text_blob"][idx["text_off"][i]:idx["text_off"][i + 1]], "utf-8") for i in ids]
+
+
+def _pct(costs):
+    costs = sorted(costs)
+    pick = lambda p: costs[min(len(costs) - 1, int(len(costs) * p))] * 1000
+    return f"p50={pick(0.5):.3f}ms p90={pick(0.9):.3f}ms p99={pick(0.99):.3f}ms max={costs[-1] * 1000:.3f}ms"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100000,1000000")
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--verify", type=int, default=200, help="与线性扫描对照的查询数")
+    ap.add_argument("--k", type=int, default=8)
+    args = ap.parse_args()
+
+    for n in [int(x) for x in args.sizes.split(",") if x]:
+        docs = make_docs(n)
+        t0 = time.perf_counter()
+        raw = build_suggest(docs)
+        build_s = time.perf_counter() - t0
+        with tempfile.NamedTemporaryFile(suffix=".suggest", delete=False) as f:
+            f.write(raw)
+            path = f.name
+        try:
+            t0 = time.perf_counter()
+            idx = open_suggest(path)
+            open_ms = (time.perf_counter() - t0) * 1000
+            h = idx["header"]
+            print(f"== docs={n} entries={h['entries']} keys={h['keys']} size={len(raw) / 1024 / 1024:.1f}MB "
+                  f"build={build_s:.1f}s open={open_ms:.1f}ms")
+
+            queries = _queries(docs, args.queries)
+            costs = []
+            for q in queries:
+                t0 = time.perf_counter()
+                suggest(idx, q, args.k)
+                costs.append(time.perf_counter() - t0)
+            print(f"   suggest   {_pct(costs)}")
+
+            keys = [_key_at(idx, i) for i in range(h["keys"])]
+            bad, lin = 0, []
+            for q in queries[:args.verify]:
+                t0 = time.perf_counter()
+                expect = _linear(keys, idx, q.lower().strip(), min(args.k, MAX_K))
+                lin.append(time.perf_counter() - t0)
+                if [x["text"] for x in suggest(idx, q, args.k)] != expect:
+                    bad += 1
+            print(f"   linear    {_pct(lin)}  mismatches={bad}/{min(args.verify, len(queries))}")
+            if bad:
+                raise SystemExit(1)
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""综合基准：合成目录树上的索引构建各阶段耗时、检索延迟分位数与招标分析吞吐，结果写成 JSON 便于跨提交对比。
+
+用法：python3 scripts/bench_suite.py [--sizes 10000,100000] [--tenders 20] [--pages 200] [--out 结果.json] [--compare 旧结果.json]
+每个规模在临时目录用 synth_corpus 生成目录树（--keep DIR 时保留在 DIR 下，再次运行直接复用），然后：
+- 分阶段计时：scan（目录遍历）、group（normalize_name 版本归并）、classify、serialize（kb.json/分片/预压缩）、search_index；
+- 端到端计时：build() 全量与紧接着的增量构建（不含正文抽取与缩略图）；
+- 检索：固定查询集与语料中抽样的项目名，逐条计时 search()，输出 p50/p90/p99/max；
+- 分析：对合成招标文件全文运行 analyze_bid_text，输出每秒页数与字符数。
+结果默认写到 data/bench/<时间>-<提交>.json；--compare 时逐项输出与旧结果的比值，耗时类指标变慢超过 --threshold 即以非零状态退出。
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from collections import defaultdict
+
+import build_index
+from build_index import scan_files, normalize_name, classify, write_shards, CATEGORY_ORDER, PRIMARY_TAGS
+from precompress import write_precompressed
+from search_index import build_search_index, dump_search_index, search, search_fields
+from bid_analysis import analyze_bid_text
+from synth_corpus import make_tree, make_tender
+
+BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULT_DIR = os.path.join(BASE, "data", "bench")
+QUERIES = ["化工园区", "应急指挥", "南京 化工园区", "hse", "智慧高速", "v2", "报价", "园", "AI", "东营-双重预防",
+           "招标文件", "人员定位 投标", "不存在的项目名称"]
+
+
+def _percentiles(costs):
+    costs = sorted(costs)
+    pick = lambda q: costs[min(len(costs) - 1, int(len(costs) * q))] * 1000
+    return {"p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99), "max_ms": costs[-1] * 1000, "n": len(costs)}
+
+
+def _build_outputs_in(tmp: str, root: str):
+    build_index.ROOT = root
+    build_index.OUT = os.path.join(tmp, "kb.json")
+    build_index.MANIFEST = os.path.join(tmp, "kb.manifest.json")
+    build_index.SEARCH_INDEX = os.path.join(tmp, "kb.search.json")
+    build_index.META_OUT = os.path.join(tmp, "kb.meta.json")
+    build_index.SHARD_DIR = os.path.join(tmp, "kb.shards")
+    build_index.CONTENT_INDEX = os.path.join(tmp, "kb.content.json")
+    build_index.CONTENT_CACHE_DIR = os.path.join(tmp, "content_cache")
+    build_index.THUMB_DIR = os.path.join(tmp, "thumbs")
+    build_index.BUILD_STATS = os.path.join(tmp, "kb.stats.json")
+    build_index.PACK_OUT = os.path.join(tmp, "kb.pack")
+    build_index.SUGGEST_OUT = os.path.join(tmp, "kb.suggest")
+
+
+def bench_phases(root: str, workers: int):
+    """按 build() 的步骤分阶段计时，返回 (各阶段秒数, 展开后的文档列表, 检索索引, 统计)。"""
+    t = {}
+    t0 = time.perf_counter()
+    files = scan_files(root, workers=workers)
+    t["scan_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    groups = defaultdict(list)
+    for f in files:
+        groups[(normalize_name(f["name"]), f["ext"])].append(f)
+    latest = []
+    for arr in groups.values():
+        arr.sort(key=lambda x: x["mtime"], reverse=True)
+        latest.append((arr[0], arr[1:]))
+    t["group_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    docs = []
+    for f, history in latest:
+        cat, primary, secondary, project = classify(f["path"], f["ext"], f["name"])
+        dt, fallback = build_index.safe_dt_from_ts(f["mtime"])
+        docs.append({
+            "title": f["name"], "category": cat, "project_name": project, "industry_type": primary,
+            "industry_primary": primary, "industry_secondary": secondary, "time": dt.strftime("%Y-%m-%d"),
+            "presale_name": "", "updated_at": dt.strftime("%Y-%m-%d %H:%M:%S"), "timestamp_fallback": fallback,
+            "history_versions": [h["path"] for h in history], "file_path": f["path"], "size": f["size"], "ext": f["ext"],
+        })
+    cat_map = {c: [] for c in CATEGORY_ORDER}
+    for d in docs:
+        cat_map[d["category"]].append(d)
+    for c in cat_map:
+        cat_map[c].sort(key=lambda x: x["updated_at"], reverse=True)
+    t["classify_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    out = {
+        "generated_at": "2026-01-01 02:00:00", "generation": "bench", "root": root, "total_raw_files": len(files), "total_indexed_latest": len(docs),
+        "categories": [{"name": c, "count": len(cat_map[c])} for c in CATEGORY_ORDER], "tag_tree": PRIMARY_TAGS,
+        "by_category": cat_map,
+    }
+    raw = json.dumps(out, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    with open(build_index.OUT, "wb") as f:
+        f.write(raw)
+    write_precompressed(build_index.OUT, raw)
+    write_shards(out, cat_map)
+    t["serialize_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    flat = [d for c in CATEGORY_ORDER for d in cat_map[c]]
+    index = build_search_index(flat)
+    with open(build_index.SEARCH_INDEX, "w", encoding="utf-8") as f:
+        json.dump(dump_search_index(index, out["generation"]), f, ensure_ascii=False, separators=(",", ":"))
+    t["search_index_s"] = time.perf_counter() - t0
+
+    stats = {"raw_files": len(files), "docs": len(docs), "kb_json_bytes": len(raw),
+             "categories": {c: len(v) for c, v in cat_map.items()}}
+    return t, flat, index, stats
+
+
+def bench_build(workers: int):
+    """端到端 build() 全量与增量耗时，及 build() 自身记录的各阶段耗时。"""
+    t, phases = {}, {}
+    for label, full in (("build_full_s", True), ("build_incremental_s", False)):
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = build_index.build(full=full, workers=workers, content=False, thumbs=False, prewarm_previews=0)
+        t[label] = time.perf_counter() - t0
+        phases[label[:-2]] = stats["phases"]
+    return t, phases
+
+
+def bench_search(flat, index, rounds: int, seed: int = 11):
+    rnd = random.Random(seed)
+    queries = list(QUERIES)
+    projects = sorted({d["project_name"] for d in flat})
+    queries += rnd.sample(projects, min(20, len(projects)))
+    # 与服务端知识库快照一致：字段小写形式预先计算
+    fields = [search_fields(d) for d in flat]
+    costs = []
+    for _ in range(rounds):
+        for q in queries:
+            t0 = time.perf_counter()
+            search(flat, index, q, 5, fields)
+            costs.append(time.perf_counter() - t0)
+    out = _percentiles(costs)
+    out["queries"] = len(queries)
+    return out
+
+
+def bench_analysis(tenders: int, pages: int):
+    texts = [make_tender(pages, seed=i) for i in range(tenders)]
+    chars = sum(len(x) for x in texts)
+    t0 = time.perf_counter()
+    for text in texts:
+        analyze_bid_text(text)
+    cost = time.perf_counter() - t0
+    return {"tenders": tenders, "pages": pages, "chars": chars, "total_s": cost,
+            "per_tender_ms": cost / max(1, tenders) * 1000,
+            "pages_per_s": tenders * pages / cost, "chars_per_s": chars / cost}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def _flat_metrics(result: dict):
+    # 跨提交对比的指标：各规模下的耗时（越小越好）与吞吐（越大越好）
+    out = {}
+    for size, r in result["sizes"].items():
+        for k, v in r["phases"].items():
+            out[f"{size}.{k}"] = v
+        for k in ("p50_ms", "p90_ms", "p99_ms"):
+            out[f"{size}.search_{k}"] = r["search"][k]
+    out["analysis.pages_per_s"] = result["analysis"]["pages_per_s"]
+    return out
+
+
+def compare(old: dict, new: dict, threshold: float) -> int:
+    a, b = _flat_metrics(old), _flat_metrics(new)
+    print(f"== compare {old['meta']['commit']} -> {new['meta']['commit']}")
+    worse = 0
+    for k in sorted(set(a) & set(b)):
+        ratio = b[k] / a[k] if a[k] else float("inf")
+        slower = 1 / ratio if k.endswith("_per_s") and ratio else ratio
+        mark = ""
+        if slower > 1 + threshold:
+            mark = "  <-- 变慢"
+            worse += 1
+        print(f"{k:<32} {a[k]:12.4f} {b[k]:12.4f}  x{ratio:.2f}{mark}")
+    return worse
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000", help="目录树文件数，逗号分隔（10k~1M）")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--workers", type=int, default=build_index.SCAN_WORKERS)
+    ap.add_argument("--search-rounds", type=int, default=5)
+    ap.add_argument("--tenders", type=int, default=20)
+    ap.add_argument("--pages", type=int, default=200)
+    ap.add_argument("--keep", metavar="DIR", help="合成目录树保存在 DIR 下并复用（大规模时省去重复生成）")
+    ap.add_argument("--out", help="结果 JSON 路径（默认 data/bench/<时间>-<提交>.json）")
+    ap.add_argument("--compare", metavar="OLD_JSON", help="与之前的结果对比")
+    ap.add_argument("--threshold", type=float, default=0.2, help="--compare 时判定变慢的比例（默认 0.2）")
+    args = ap.parse_args()
+
+    commit = _commit()
+    result = {
+        "meta": {"commit": commit, "time": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "args": vars(args)},
+        "sizes": {},
+    }
+    for n in [int(x) for x in args.sizes.split(",") if x]:
+        tmp = tempfile.mkdtemp(prefix="tuankb-bench-")
+        try:
+            root = os.path.join(args.keep, f"tree-{n}-{args.seed}") if args.keep else os.path.join(tmp, "tree")
+            t0 = time.perf_counter()
+            if os.path.isdir(root):
+                corpus = {"reused": True}
+            else:
+                corpus = make_tree(root, n, args.seed)
+            corpus["generate_s"] = time.perf_counter() - t0
+            _build_outputs_in(tmp, root)
+            phases, flat, index, stats = bench_phases(root, args.workers)
+            build_times, build_phases = bench_build(args.workers)
+            phases.update(build_times)
+            r = {"corpus": corpus, "phases": phases, "build_phases": build_phases, "stats": stats,
+                 "search": bench_search(flat, index, args.search_rounds)}
+            result["sizes"][str(n)] = r
+            print(f"== files={n} docs={stats['docs']} kb.json={stats['kb_json_bytes'] / 1024 / 1024:.1f}MB "
+                  f"generate={corpus['generate_s']:.1f}s")
+            print("   " + " ".join(f"{k[:-2]}={v:.2f}s" for k, v in phases.items()))
+            s = r["search"]
+            print(f"   search p50={s['p50_ms']:.2f}ms p90={s['p90_ms']:.2f}ms p99={s['p99_ms']:.2f}ms max={s['max_ms']:.2f}ms")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    a = result["analysis"] = bench_analysis(args.tenders, args.pages)
+    print(f"== analysis tenders={a['tenders']} pages={a['pages']} {a['per_tender_ms']:.1f}ms/份 "
+          f"{a['pages_per_s']:.0f} pages/s {a['chars_per_s'] / 1e6:.1f}M chars/s")
+
+    out = args.out or os.path.join(RESULT_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"results: {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            worse = compare(json.load(f), result, args.threshold)
+        if worse:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
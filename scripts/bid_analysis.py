@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""招标文件结构化分析：供应商要求、评分办法、标书编制建议。
+
+全文按 (页码, 行, 小写行) 逐行切分一次，所有分析项的关键词编译成一个多模式匹配器，
+逐行扫描一遍，按各分析项的条数上限依次填充，输出与逐项扫描全文的旧实现完全一致。
+"""
+import re
+import json
+
+from keyword_matcher import compile_keywords, find_keywords
+from text_extract import normalize_text
+
+# 分析项、关键词或输出格式变化时递增，使标书分析缓存中的旧结果失效
+BID_ANALYSIS_VERSION = 1
+POINT_MAX_LEN = 110
+# 行命中型分析项最多 4 条，评分型最多 8 条
+MAX_ITEMS = {"rows": 4, "score": 8}
+
+# (一级模块, 分析项, 类型, 关键词, 建议响应内容)，顺序即输出顺序
+BID_SECTIONS = [
+    ("供应商分析", "资质要求", "rows", ["资质", "资格", "营业执照", "认证", "证书"], "逐条准备资质证明并对应招标条款编号。"),
+    ("供应商分析", "业绩要求", "rows", ["业绩", "类似项目", "合同金额", "案例"], "准备对应合同、验收与中标通知书证明链。"),
+    ("供应商分析", "项目团队分析", "rows", ["项目经理", "团队", "人员", "工程师", "注册", "职称"], "根据评审办法准备人员证书、社保与任命文件。"),
+    ("供应商分析", "信誉要求", "rows", ["信誉", "信用", "不良记录", "处罚", "黑名单"], "提供信用中国、裁判文书等查询截图并加盖公章。"),
+    ("供应商分析", "废标条款分析", "rows", ["废标", "否决", "无效投标", "一票否决"], "建立废标条款核查清单，提交前逐项打勾复核。"),
+    ("供应商分析", "其他要求", "rows", ["其他要求", "特别说明", "补充"], "将补充条款纳入响应偏离表并逐条响应。"),
+    ("评分分析", "商务评分", "score", ["商务评分", "商务部分", "商务分"], "围绕可得分项准备对应证明材料，避免失分。"),
+    ("评分分析", "技术评分", "score", ["技术评分", "技术部分", "技术分"], "按评分细则组织技术方案，逐点评分响应。"),
+    ("评分分析", "价格评分", "score", ["价格评分", "报价得分", "价格分", "评审基准价"], "明确评审基准价公式并反推报价区间。"),
+    ("标书编制分析", "响应标书文件目录要求", "rows", ["响应文件组成", "响应文件格式", "投标文件组成", "目录"], "按招标文件目录顺序逐章编排并保持页码连续。"),
+    ("标书编制分析", "商务标书编制分析（商务评分标准）", "rows", ["商务评分", "商务文件", "资格审查", "承诺函"], "形成商务标材料清单（含承诺函）并一一对应评分点。"),
+    ("标书编制分析", "技术标书编制分析（技术评分标准）", "rows", ["技术评分", "技术要求", "采购需求", "技术方案"], "围绕采购需求逐条响应，补充图表和里程碑计划。"),
+    ("标书编制分析", "价格部分编制分析", "rows", ["价格评分", "最低价", "平均价", "评审基准价"], "按评分法测算最优报价区间并给出报价策略。"),
+    ("标书编制分析", "承诺函分析", "rows", ["承诺函", "声明函", "承诺"], "梳理并统一模板，确保签章、日期、主体一致。"),
+    ("标书编制分析", "其他部分分析", "rows", ["附件", "补充", "备注"], "将附件与正文建立交叉引用，防止缺页漏项。"),
+]
+
+_SECTION_KEYWORDS = [frozenset(k.lower() for k in kws) for _, _, _, kws, _ in BID_SECTIONS]
+_SECTION_LIMITS = [MAX_ITEMS[kind] for _, _, kind, _, _ in BID_SECTIONS]
+_MATCHER = compile_keywords(set().union(*_SECTION_KEYWORDS))
+
+
+def split_pages(text: str):
+    if "\f" in text:
+        pages = [p for p in text.split("\f") if p.strip()]
+        if pages:
+            return pages
+    return [text]
+
+
+def iter_lines(text: str):
+    """逐行产出 (页码, 原行, 小写行)，页码取自 \\f 分页符；整页无任何关键词时跳过该页。"""
+    for idx, p in enumerate(split_pages(text), 1):
+        if not find_keywords(_MATCHER, p.lower()):
+            continue
+        for x in re.split(r"[\r\n]+", p):
+            ln = x.strip()
+            if ln:
+                yield idx, ln, ln.lower()
+
+
+def scan_sections(text: str):
+    """单遍扫描全文，返回与 BID_SECTIONS 一一对应的命中列表 [{"point", "page"}]。"""
+    hits = [[] for _ in BID_SECTIONS]
+    seen = [set() for _ in BID_SECTIONS]
+    pending = list(range(len(BID_SECTIONS)))
+    for page, ln, low in iter_lines(text):
+        found = find_keywords(_MATCHER, low)
+        if not found:
+            continue
+        point = None
+        for i in pending:
+            if found.isdisjoint(_SECTION_KEYWORDS[i]):
+                continue
+            if point is None:
+                point = re.sub(r"\s+", " ", ln)[:POINT_MAX_LEN]
+            key = (point, page)
+            if key in seen[i]:
+                continue
+            seen[i].add(key)
+            hits[i].append({"point": point, "page": page})
+        pending = [i for i in pending if len(hits[i]) < _SECTION_LIMITS[i]]
+        if not pending:
+            break
+    return hits
+
+
+def _make_rows(hits, suggestion: str):
+    if not hits:
+        return [{"point": "未明显命中，建议人工复核原文。", "suggestion": suggestion, "page": "-"}]
+    return [{"point": h["point"], "suggestion": suggestion, "page": h["page"]} for h in hits]
+
+
+def _score_rows(hits, suggestion: str):
+    rows = []
+    for h in hits:
+        m = re.search(r"(\d+(?:\.\d+)?)\s*分", h["point"])
+        score = m.group(1) + "分" if m else "未明确"
+        rows.append({"point": f"{h['point']}（分值：{score}）", "suggestion": suggestion, "page": h["page"]})
+    if not rows:
+        rows = [{"point": "未识别到明确评分条款，按通用结构输出。", "suggestion": suggestion, "page": "-"}]
+    return rows
+
+
+def analyze_bid_text(text: str):
+    text = normalize_text(text)
+    out = {}
+    for (group, item, kind, _, suggestion), hits in zip(BID_SECTIONS, scan_sections(text)):
+        rows = _score_rows(hits, suggestion) if kind == "score" else _make_rows(hits, suggestion)
+        out.setdefault(group, {})[item] = rows
+    return out
+
+
+def risk_hints(analysis: dict):
+    txt = json.dumps(analysis, ensure_ascii=False)
+    risks = []
+    if any(k in txt for k in ["否决", "废标", "无效投标", "一票否决"]):
+        risks.append("存在一票否决/废标相关条款，需重点复核响应完整性。")
+    if any(k in txt for k in ["资质", "资格", "证书"]):
+        risks.append("请核对资质证书有效期与招标文件要求，避免资质缺口。")
+    if any(k in txt for k in ["业绩", "类似项目"]):
+        risks.append("请提前准备可证明业绩材料，防止业绩不足扣分。")
+    risks.append("请检查格式与签章要求，避免格式性风险导致否决。")
+    return risks[:4]
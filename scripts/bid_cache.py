@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""标书分析内容寻址缓存：按上传文件字节的 SHA-256 缓存抽取文本与分析结果。
+
+同一份招标文件反复上传（网页/钉钉）时直接返回缓存，不再重复调用 pdftotext、LibreOffice、tesseract。
+缓存键包含扩展名与抽取器/分析器版本号，规则变化后旧条目自然失效；
+总大小超过上限时按最近访问时间（文件 mtime）淘汰最久未用的条目。
+"""
+import os
+import json
+import hashlib
+import threading
+
+from text_extract import extract_text, EXTRACT_VERSION
+from bid_analysis import analyze_bid_text, BID_ANALYSIS_VERSION
+
+BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BID_CACHE_DIR = os.path.join(BASE, "data", "bid_cache")
+BID_CACHE_MAX_BYTES = int(os.environ.get("TUANKB_BID_CACHE_MB", "512")) * 1024 * 1024
+
+_LOCK = threading.Lock()
+# size: 缓存目录当前总字节数，首次使用时扫描目录得到
+_STATE = {"size": None}
+STATS = {"text_hit": 0, "text_miss": 0, "analysis_hit": 0, "analysis_miss": 0, "evicted": 0}
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _entry_path(name: str) -> str:
+    return os.path.join(BID_CACHE_DIR, name)
+
+
+def _dir_size() -> int:
+    total = 0
+    try:
+        with os.scandir(BID_CACHE_DIR) as it:
+            for e in it:
+                if e.is_file() and not e.name.endswith(".tmp"):
+                    total += e.stat().st_size
+    except OSError:
+        pass
+    return total
+
+
+def _read(name: str):
+    p = _entry_path(name)
+    try:
+        with open(p, "r", encoding="utf-8") as f:
+            raw = f.read()
+        # 命中即刷新 mtime，淘汰时按 mtime 排序实现 LRU
+        os.utime(p, None)
+        return raw
+    except OSError:
+        return None
+
+
+def _evict(keep: str):
+    entries = []
+    with os.scandir(BID_CACHE_DIR) as it:
+        for e in it:
+            if e.is_file() and not e.name.endswith(".tmp") and e.name != keep:
+                st = e.stat()
+                entries.append((st.st_mtime, e.name, st.st_size))
+    entries.sort()
+    for _, name, size in entries:
+        if _STATE["size"] <= BID_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(_entry_path(name))
+        except OSError:
+            continue
+        _STATE["size"] -= size
+        STATS["evicted"] += 1
+
+
+def _write(name: str, raw: str):
+    os.makedirs(BID_CACHE_DIR, exist_ok=True)
+    p = _entry_path(name)
+    data = raw.encode("utf-8")
+    with _LOCK:
+        if _STATE["size"] is None:
+            _STATE["size"] = _dir_size()
+        old = os.path.getsize(p) if os.path.exists(p) else 0
+        tmp = f"{p}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, p)
+        _STATE["size"] += len(data) - old
+        if _STATE["size"] > BID_CACHE_MAX_BYTES:
+            _evict(keep=name)
+
+
+def _text_key(digest: str, ext: str) -> str:
+    return f"{digest}.{ext.lstrip('.') or 'bin'}.x{EXTRACT_VERSION}"
+
+
+def cached_text(path: str, digest: str = None) -> str:
+    """抽取文本（带缓存）；抽取结果为空时不缓存，便于下次重试。"""
+    key = _text_key(digest or file_sha256(path), os.path.splitext(path)[1].lower()) + ".txt"
+    raw = _read(key)
+    if raw is not None:
+        STATS["text_hit"] += 1
+        return raw
+    STATS["text_miss"] += 1
+    text = extract_text(path)
+    if text.strip():
+        _write(key, text)
+    return text
+
+
+def cached_analysis(path: str, on_stage=None, digest: str = None):
+    """返回 analyze_bid_text 的结果（带缓存），同时复用文本缓存。
+
+    on_stage(stage) 在进入 "extracting" / "analyzing" 阶段前回调，缓存命中时不回调；
+    digest 为上传时已算好的 SHA-256，省去再读一遍文件。
+    """
+    digest = digest or file_sha256(path)
+    key = _text_key(digest, os.path.splitext(path)[1].lower()) + f".a{BID_ANALYSIS_VERSION}.json"
+    raw = _read(key)
+    if raw is not None:
+        try:
+            analysis = json.loads(raw)
+            STATS["analysis_hit"] += 1
+            return analysis
+        except ValueError:
+            pass
+    STATS["analysis_miss"] += 1
+    if on_stage:
+        on_stage("extracting")
+    text = cached_text(path, digest)
+    if on_stage:
+        on_stage("analyzing")
+    analysis = analyze_bid_text(text)
+    if text.strip():
+        _write(key, json.dumps(analysis, ensure_ascii=False))
+    return analysis
+
+
+def cache_stats():
+    with _LOCK:
+        if _STATE["size"] is None:
+            _STATE["size"] = _dir_size()
+        out = dict(STATS)
+        out["bytes"] = _STATE["size"]
+        out["max_bytes"] = BID_CACHE_MAX_BYTES
+    return out
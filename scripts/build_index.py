@@ -2,11 +2,50 @@
 import os
 import re
 import json
+import time
+import uuid
+import argparse
 from datetime import datetime
 from collections import defaultdict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from search_index import build_search_index, dump_search_index
+from content_index import build_content_index, CONTENT_WORKERS
+from thumbnails import build_thumbnails, THUMB_WORKERS
+from preview_cache import prewarm
+from precompress import write_precompressed
+from kb_pack import pack_kb
+from suggest import build_suggest
+from keyword_matcher import compile_keywords, find_keywords
 
 ROOT = "/mnt/tuan"
 OUT = os.path.join(os.path.dirname(__file__), "..", "data", "kb.json")
+# 增量构建清单：记录目录 mtime、文件 size/mtime/inode 及上次分类结果
+MANIFEST = os.path.join(os.path.dirname(OUT), "kb.manifest.json")
+MANIFEST_VERSION = 1
+# 检索倒排索引（/api/search 使用），文档 id 为按 CATEGORY_ORDER 展开 by_category 后的下标
+SEARCH_INDEX = os.path.join(os.path.dirname(OUT), "kb.search.json")
+# 全文索引及正文抽取缓存（按 path/size/mtime 缓存，仅抽取新增或变化的文件）
+CONTENT_INDEX = os.path.join(os.path.dirname(OUT), "kb.content.json")
+CONTENT_CACHE_DIR = os.path.join(os.path.dirname(OUT), "content_cache")
+# 缩略图缓存（按 path/size/mtime 生成的 id 命名，由 /thumb?id= 提供）
+THUMB_DIR = os.path.join(os.path.dirname(OUT), "thumbs")
+# 首屏清单（分类、数量、标签树）与按分类拆分的文档分片，供 /api/docs 分页查询
+META_OUT = os.path.join(os.path.dirname(OUT), "kb.meta.json")
+SHARD_DIR = os.path.join(os.path.dirname(OUT), "kb.shards")
+# 紧凑格式（目录表 + 文件名串表 + 列存），server.py 以 mmap 加载；kb.json 仍写出供前端使用
+PACK_OUT = os.path.join(os.path.dirname(OUT), "kb.pack")
+# 搜索框联想的前缀索引（项目名、标题、行业标签及拼音首字母），/api/suggest 使用
+SUGGEST_OUT = os.path.join(os.path.dirname(OUT), "kb.suggest")
+# 构建统计：各阶段耗时与文件数（server.py 的 /metrics 读取）
+BUILD_STATS = os.path.join(os.path.dirname(OUT), "kb.stats.json")
+# 构建后为每个分类最新的 N 个 Office 文档预先生成预览 PDF（0 为不预热）
+PREVIEW_PREWARM = int(os.environ.get("TUANKB_PREVIEW_PREWARM", "0"))
+# 调整 normalize_name / detect_* / project_name 规则后递增，旧清单中的分类结果随之失效
+RULES_VERSION = 1
+# 目录遍历并发数：NAS 上每次 listdir/stat 都是一次网络往返，按目录并发可重叠等待
+SCAN_WORKERS = int(os.environ.get("TUANKB_SCAN_WORKERS", "8"))
 
 CATEGORY_ORDER = ["汇报PPT", "解决方案文档", "招标文档", "投标文档", "报价文档", "合同文档", "标准规范", "演示视频", "图安资质", "其他"]
 
@@ -180,6 +219,170 @@ def project_name(path: str, name: str, category: str) -> str:
     return b2 or parent or "未命名项目"
 
 
+# ---- 编译后的单遍分类引擎 ----
+# 上面的 detect_* 为参考实现；classify() 把所有关键词表一次性编译成多模式匹配器（keyword_matcher），
+# 目录部分按目录缓存、文件名扫描一遍，再按原有优先级判定。两者须保持逐条一致，
+# 修改规则后运行 scripts/bench_classify.py 校验。
+QUOTE_KEYWORDS = ["报价", "预算", "清单", "分项"]
+STANDARD_KEYWORDS = ["标准", "规范", "指南"]
+TAG_PRIMARY_ORDER = ["安全生产", "智慧园区", "应急管理", "车路协同"]
+RULE_SAFETY = ["安全生产", "隐患", "双重预防", "重大危险源"]
+RULE_PARK = ["智慧园区", "园区", "数字孪生", "化工园区", "经开区"]
+RULE_EMERGENCY = ["应急指挥", "应急演练", "应急推演", "应急"]
+RULE_V2X = ["车路协同", "智慧高速", "智慧隧道", "智慧桥梁", "智慧服务区", "智慧收费站", "智慧停车场", "无人驾驶训练场", "无人驾驶训练厂", "v2x"]
+QUAL_GROUP_RULES = [
+    ("公司介绍（含产品介绍）", ["公司介绍", "产品介绍", "产品手册", "宣传册"]),
+    ("相关证书", ["证书", "认证", "资信", "荣誉"]),
+    ("专利", ["专利"]),
+    ("著作权", ["著作权", "软著", "软件著作权"]),
+    ("测试报告", ["测试报告", "检测报告", "检验报告", "测评报告"]),
+    ("合同业绩", ["合同业绩", "业绩", "案例合同", "项目合同"]),
+    ("人员资质", ["人员资质", "人员证书", "工程师", "职称", "建造师"]),
+]
+
+
+def _rule_priorities(rules):
+    # rules 为按优先级排列的 (结果, 关键词列表)；每个关键词只记其最先触发的规则
+    prio = {}
+    for i, (_, kws) in enumerate(rules):
+        for k in kws:
+            prio.setdefault(k.lower(), i)
+    return prio, [r for r, _ in rules]
+
+
+def _compile_rules():
+    hint = QUAL_FOLDER_HINT.lower()
+    cat_rules = [
+        ("图安资质", ["图安世纪资质"]),
+        ("招标文档", ["招标"]),
+        ("投标文档", ["投标"]),
+        ("合同文档", ["合同"]),
+        ("报价文档", QUOTE_KEYWORDS),
+        ("标准规范", STANDARD_KEYWORDS),
+    ]
+    ai_rules = list(SUBTAG_KEYWORDS["AI赋能"].items())
+    tag_rules = []
+    for primary in TAG_PRIMARY_ORDER:
+        tag_rules.extend(((primary, sub), kws) for sub, kws in SUBTAG_KEYWORDS.get(primary, {}).items())
+        tag_rules.append(((primary, "其他"), [primary]))
+    # 结果第二项为 None 的规则需要再按命中情况细分二级标签
+    tag_rules += [
+        (("安全生产", "其他"), RULE_SAFETY),
+        (("智慧园区", None), RULE_PARK),
+        (("应急管理", None), RULE_EMERGENCY),
+        (("车路协同", None), RULE_V2X),
+    ]
+    v2x_subs = [s.lower() for s in PRIMARY_TAGS["车路协同"] if s != "其他"]
+
+    rules = {"hint": hint, "ai_name": frozenset(k.lower() for k in AI_FILE_KEYWORDS), "v2x_subs": v2x_subs}
+    rules["cat_excel"] = _rule_priorities(cat_rules)
+    rules["cat_other"] = _rule_priorities([r for r in cat_rules if r[0] != "报价文档"])
+    rules["ai_sub"] = _rule_priorities(ai_rules)
+    rules["tag"] = _rule_priorities(tag_rules)
+    rules["qual"] = _rule_priorities(QUAL_GROUP_RULES)
+
+    kws = {hint, "经开区", "开发区", "化工园区", "应急指挥", "应急演练", "应急推演"}
+    kws.update(rules["ai_name"], v2x_subs)
+    for key in ("cat_excel", "ai_sub", "tag", "qual"):
+        kws.update(rules[key][0])
+
+    # QUAL_FOLDER_HINT 只在 path 内判定（直接子串检查），不参与分隔符跨界检查
+    spaced = tuple(k for k in kws if " " in k and k != hint)
+    rules.update(matcher=compile_keywords(kws), spaced=spaced, spaced_len=max((len(k) for k in spaced), default=1))
+    return rules
+
+
+_RULES = _compile_rules()
+
+
+def _hits(t: str):
+    return find_keywords(_RULES["matcher"], t)
+
+
+@lru_cache(maxsize=8192)
+def _dir_hits(d: str):
+    # 同一目录下的文件共享目录部分的命中结果
+    return _hits(d)
+
+
+def _scan_keywords(name: str, path: str):
+    # 参考实现检查三个字符串：name、full="name path"、s="path name"。
+    # path = 目录/ + name：目录部分按目录缓存，name 扫描一次；不含空格的关键词不会跨越
+    # "name path" / "path name" 的分隔符，含空格的关键词再单独检查分隔符附近是否跨界命中。
+    nl, pl = name.lower(), path.lower()
+    name_hits = _hits(nl)
+    cut = len(pl) - len(nl)
+    if cut > 0 and pl[cut - 1] == "/" and pl.endswith(nl):
+        hits = _dir_hits(pl[:cut]) | name_hits
+    else:
+        hits = _hits(pl) | name_hits
+    full_hits = s_hits = hits
+    w = _RULES["spaced_len"] - 1
+    full_edge = f"{nl[-w:]} {pl[:w]}"
+    s_edge = f"{pl[-w:]} {nl[:w]}"
+    for k in _RULES["spaced"]:
+        if k in full_edge:
+            full_hits = full_hits | {k}
+        if k in s_edge:
+            s_hits = s_hits | {k}
+    return not name_hits.isdisjoint(_RULES["ai_name"]), full_hits, s_hits, _RULES["hint"] in pl
+
+
+def _first_rule(hits, compiled):
+    prio, results = compiled
+    best = None
+    for k in hits:
+        i = prio.get(k)
+        if i is not None and (best is None or i < best):
+            best = i
+    return None if best is None else results[best]
+
+
+def _resolve_category(s_hits: set, in_path_hint: bool, ext: str) -> str:
+    if in_path_hint:
+        return "图安资质"
+    cat = _first_rule(s_hits, _RULES["cat_excel"] if ext in EXCEL_EXT else _RULES["cat_other"])
+    if cat:
+        return cat
+    if ext in {".ppt", ".pptx"}:
+        return "汇报PPT"
+    if ext in VIDEO_EXT:
+        return "演示视频"
+    if ext in DOC_EXT:
+        return "解决方案文档"
+    return "其他"
+
+
+def _resolve_tags(name_ai: bool, full: set):
+    if name_ai:
+        return "AI赋能", _first_rule(full, _RULES["ai_sub"]) or "其他"
+
+    hit = _first_rule(full, _RULES["tag"])
+    if hit is None:
+        return "其他行业", ""
+    primary, sub = hit
+    if sub is not None:
+        return primary, sub
+    if primary == "智慧园区":
+        return primary, "化工园区" if "化工园区" in full else ("经开区" if "经开区" in full or "开发区" in full else "其他")
+    if primary == "应急管理":
+        return primary, "应急指挥" if "应急指挥" in full else ("应急演练" if "应急演练" in full else ("应急推演" if "应急推演" in full else "其他"))
+    for sub in _RULES["v2x_subs"]:
+        if sub in full:
+            return primary, sub
+    return primary, "其他"
+
+
+def classify(path: str, ext: str, name: str):
+    """单遍分类：返回 (category, industry_primary, industry_secondary, project_name)。"""
+    name_ai, full_hits, s_hits, in_path_hint = _scan_keywords(name, path)
+    cat = _resolve_category(s_hits, in_path_hint, ext)
+    primary, secondary = _resolve_tags(name_ai, full_hits)
+    if cat == "图安资质":
+        return cat, primary, secondary, _first_rule(s_hits, _RULES["qual"]) or "其他"
+    return cat, primary, secondary, project_name(path, name, cat)
+
+
 def safe_dt_from_ts(ts: int):
     try:
         dt = datetime.fromtimestamp(int(ts))
@@ -190,52 +393,259 @@ def safe_dt_from_ts(ts: int):
         return FALLBACK_TS, True
 
 
-def scan_files(root: str):
-    files = []
-    for dp, dns, fns in os.walk(root):
-        dns[:] = [d for d in dns if d not in SKIP_DIRS]
-        for fn in fns:
-            if fn.startswith('.'):
-                continue
+def _list_dir(dp: str, prev: dict):
+    """列出单个目录；目录 mtime 未变化时复用清单中的文件名与子目录列表，不再 scandir。
+
+    原地改写文件不改变目录 mtime，因此复用列表时仍逐个 stat 文件取当前 size/mtime/inode，
+    属性有变化的文件在 build() 中经 _prev_record 比对后重新分类。
+    """
+    try:
+        dir_mtime = os.stat(dp).st_mtime_ns
+    except OSError:
+        return None, [], False
+    old = prev["dirs"].get(dp)
+    if old and old.get("mtime") == dir_mtime:
+        files = []
+        for fn in old["files"]:
             full = os.path.join(dp, fn)
-            if not os.path.isfile(full):
+            if full not in prev["files"]:
+                break
+            try:
+                st = os.stat(full)
+            except OSError:
+                # 列表与磁盘不一致（文件已删除等），改为重新列举
+                break
+            files.append(_file_entry(fn, full, st.st_size, int(st.st_mtime), st.st_ino))
+        else:
+            return old, files, True
+
+    subdirs, names, files = [], [], []
+    try:
+        with os.scandir(dp) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError:
+        return None, [], False
+    for e in entries:
+        try:
+            if e.is_dir():
+                # 与 os.walk 一致：不进入符号链接目录
+                if e.name not in SKIP_DIRS and not e.is_symlink():
+                    subdirs.append(e.name)
+                continue
+            if e.name.startswith('.') or not e.is_file():
                 continue
-            ext = os.path.splitext(fn)[1].lower()
-            st = os.stat(full)
-            files.append({
-                "name": fn,
-                "path": full,
-                "ext": ext,
-                "mtime": int(st.st_mtime),
-                "size": st.st_size,
-            })
+            st = e.stat()
+        except OSError:
+            continue
+        names.append(e.name)
+        files.append(_file_entry(e.name, e.path, st.st_size, int(st.st_mtime), st.st_ino))
+    return {"mtime": dir_mtime, "subdirs": subdirs, "files": names}, files, False
+
+
+def _file_entry(name: str, path: str, size: int, mtime: int, inode: int):
+    return {
+        "name": name,
+        "path": path,
+        "ext": os.path.splitext(name)[1].lower(),
+        "mtime": mtime,
+        "size": size,
+        "inode": inode,
+    }
+
+
+def _top_folder(root: str, dp: str) -> str:
+    rel = os.path.relpath(dp, root)
+    return "." if rel == "." else rel.split(os.sep, 1)[0]
+
+
+def scan_files(root: str, prev: dict = None, dirs_out: dict = None, stats: dict = None, workers: int = SCAN_WORKERS):
+    prev = prev or {"dirs": {}, "files": {}}
+    dirs_out = {} if dirs_out is None else dirs_out
+    stats = {} if stats is None else stats
+    stats.setdefault("dirs_reused", 0)
+    stats.setdefault("dirs_scanned", 0)
+    walk_times = stats.setdefault("walk_times", {})
+
+    def _timed(dp):
+        t0 = time.perf_counter()
+        res = _list_dir(dp, prev)
+        return dp, res, time.perf_counter() - t0
+
+    # 线程池按目录并发列举，完成顺序不确定，先全部收集再按名称顺序组装
+    listed = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        pending = {ex.submit(_timed, root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                dp, (rec, dir_files, reused), cost = fut.result()
+                top = walk_times.setdefault(_top_folder(root, dp), {"dirs": 0, "files": 0, "seconds": 0.0})
+                top["seconds"] += cost
+                if rec is None:
+                    continue
+                top["dirs"] += 1
+                top["files"] += len(dir_files)
+                listed[dp] = (rec, dir_files)
+                stats["dirs_reused" if reused else "dirs_scanned"] += 1
+                pending.update(ex.submit(_timed, os.path.join(dp, d)) for d in rec["subdirs"])
+
+    files = []
+    stack = [root]
+    while stack:
+        dp = stack.pop()
+        if dp not in listed:
+            continue
+        rec, dir_files = listed[dp]
+        dirs_out[dp] = rec
+        files.extend(dir_files)
+        # 逆序入栈，保证按名称顺序深度优先遍历
+        stack.extend(os.path.join(dp, d) for d in reversed(rec["subdirs"]))
     return files
 
 
-def build():
-    all_files = scan_files(ROOT)
+def load_manifest(path: str = None):
+    # 路径在调用时解析，MANIFEST 可在导入后修改（基准测试等指向临时目录）
+    path = path or MANIFEST
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            m = json.load(f)
+    except Exception:
+        return None
+    if m.get("version") != MANIFEST_VERSION or m.get("root") != ROOT:
+        return None
+    if m.get("rules") != RULES_VERSION:
+        # 规则变化：目录列表仍可复用，分类结果全部作废
+        for rec in m.get("files", {}).values():
+            for k in ("norm", "category", "primary", "secondary", "project"):
+                rec.pop(k, None)
+    return m
+
+
+def save_manifest(dirs: dict, files: dict, path: str = None):
+    path = path or MANIFEST
+    m = {
+        "version": MANIFEST_VERSION,
+        "rules": RULES_VERSION,
+        "root": ROOT,
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "dirs": dirs,
+        "files": files,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(m, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _prev_record(prev_files: dict, f: dict):
+    rec = prev_files.get(f["path"])
+    if rec and rec.get("size") == f["size"] and rec.get("mtime") == f["mtime"] and rec.get("inode") == f["inode"]:
+        return rec
+    return None
+
+
+def _publish(path: str, raw: bytes, compressed: bool = False):
+    """原子发布：先写同目录临时文件再 os.replace，读者只会看到完整的旧文件或新文件。
+
+    compressed 时预压缩版本（文件名带原文哈希）在 rename 之前写出，新原文出现时即有匹配的压缩版本。
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(raw)
+    if compressed:
+        write_precompressed(path, raw)
+    os.replace(tmp, path)
+
+
+def _json_bytes(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _load_json(path: str):
+    # 上次构建的输出；缺失或损坏时返回 None（按首次构建处理）
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_shards(out: dict, cat_map: dict):
+    """写出首屏清单 kb.meta.json 与各分类分片 kb.shards/NN.json，并删除已不存在分类的旧分片。"""
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    live = set()
+    categories = []
+    for i, c in enumerate(CATEGORY_ORDER):
+        fn = f"{i:02d}.json"
+        live.add(fn)
+        shard = {"generated_at": out["generated_at"], "generation": out["generation"], "category": c,
+                 "documents": cat_map.get(c, [])}
+        _publish(os.path.join(SHARD_DIR, fn), _json_bytes(shard))
+        categories.append({"name": c, "count": len(shard["documents"]), "shard": f"kb.shards/{fn}"})
+    for fn in os.listdir(SHARD_DIR):
+        if fn not in live:
+            os.remove(os.path.join(SHARD_DIR, fn))
+
+    meta = {k: v for k, v in out.items() if k != "by_category"}
+    meta["categories"] = categories
+    _publish(META_OUT, _json_bytes(meta), compressed=True)
+
+
+def build(full: bool = False, workers: int = SCAN_WORKERS, content: bool = True, content_workers: int = CONTENT_WORKERS,
+          thumbs: bool = True, thumb_workers: int = THUMB_WORKERS, prewarm_previews: int = PREVIEW_PREWARM):
+    phases = {}
+    clock = {"t": time.perf_counter()}
+
+    def phase_done(name: str):
+        now = time.perf_counter()
+        phases[name] = round(now - clock["t"], 3)
+        clock["t"] = now
+
+    started = clock["t"]
+    prev = None if full else load_manifest()
+    prev = prev or {"dirs": {}, "files": {}}
+    prev_files = prev["files"]
+
+    dirs = {}
+    scan_stats = {}
+    all_files = scan_files(ROOT, prev, dirs, scan_stats, workers=workers)
+    phase_done("scan")
+
+    # 新清单只保留本次仍存在的文件；未变化文件沿用旧记录（含分类结果）
+    files_manifest = {}
     groups = defaultdict(list)
     for f in all_files:
-        key = normalize_name(f["name"])
-        groups[(key, f["ext"])].append(f)
+        rec = _prev_record(prev_files, f)
+        if rec is None or "norm" not in rec:
+            rec = {"size": f["size"], "mtime": f["mtime"], "inode": f["inode"], "norm": normalize_name(f["name"])}
+        files_manifest[f["path"]] = rec
+        groups[(rec["norm"], f["ext"])].append(f)
 
     latest_entries = []
     for (_, _), arr in groups.items():
         arr.sort(key=lambda x: x["mtime"], reverse=True)
         latest_entries.append((arr[0], arr[1:]))
+    phase_done("group")
 
     docs = []
+    reused = reclassified = 0
     for latest, history in latest_entries:
         path = latest["path"]
         name = latest["name"]
         ext = latest["ext"]
-        cat = detect_category(path, ext, name)
+        rec = files_manifest[path]
+        if "category" in rec:
+            reused += 1
+        else:
+            reclassified += 1
+            rec["category"], rec["primary"], rec["secondary"], rec["project"] = classify(path, ext, name)
+        cat = rec["category"]
+        primary, secondary = rec["primary"], rec["secondary"]
         dt, ts_fallback = safe_dt_from_ts(latest["mtime"])
-        primary, secondary = detect_tags(path, name)
         docs.append({
             "title": name,
             "category": cat,
-            "project_name": project_name(path, name, cat),
+            "project_name": rec["project"],
             "industry_type": primary,
             "industry_primary": primary,
             "industry_secondary": secondary,
@@ -255,9 +665,34 @@ def build():
 
     for c in cat_map:
         cat_map[c].sort(key=lambda x: x["updated_at"], reverse=True)
-
+    phase_done("classify")
+
+    flat = [d for c in CATEGORY_ORDER for d in cat_map[c]]
+    mtimes = {f["path"]: f["mtime"] for f in all_files}
+    thumb_stats = None
+    if thumbs:
+        thumb_ids, thumb_stats = build_thumbnails(
+            [(d["file_path"], d["size"], mtimes[d["file_path"]]) for d in flat], THUMB_DIR, workers=thumb_workers)
+        for d in flat:
+            if d["file_path"] in thumb_ids:
+                d["thumb"] = thumb_ids[d["file_path"]]
+        phase_done("thumbs")
+
+    # 全文索引按路径关联文档，提前抽取，使本次构建的各输出文件在最后集中发布
+    os.makedirs(os.path.dirname(OUT), exist_ok=True)
+    content_stats = None
+    if content:
+        content_idx, content_stats = build_content_index(
+            [(d["file_path"], d["size"], mtimes[d["file_path"]]) for d in flat], CONTENT_CACHE_DIR, workers=content_workers,
+            prev=None if full else _load_json(CONTENT_INDEX))
+        _publish(CONTENT_INDEX, _json_bytes(content_idx))
+        phase_done("content")
+
+    now = datetime.now()
     out = {
-        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "generated_at": now.strftime("%Y-%m-%d %H:%M:%S"),
+        # 每次构建唯一的代号，分片、倒排索引与 kb.json 据此对应
+        "generation": f"{now.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}",
         "root": ROOT,
         "total_raw_files": len(all_files),
         "total_indexed_latest": len(docs),
@@ -267,13 +702,95 @@ def build():
         "by_category": cat_map,
     }
 
-    os.makedirs(os.path.dirname(OUT), exist_ok=True)
-    with open(OUT, "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, separators=(",", ":"))
+    raw = _json_bytes(out)
+    write_shards(out, cat_map)
+    phase_done("serialize")
+
+    search_idx = dump_search_index(build_search_index(flat), out["generation"])
+    _publish(SEARCH_INDEX, _json_bytes(search_idx))
+    phase_done("search_index")
 
-    print(f"generated: {OUT}")
-    print(f"raw={len(all_files)} indexed_latest={len(docs)}")
+    try:
+        packed = pack_kb(out)
+    except ValueError as e:
+        # 文档字段与紧凑格式不符时只提供 kb.json，删除旧 kb.pack 以免服务端误用
+        print(f"kb.pack skipped: {e}")
+        packed = None
+        if os.path.exists(PACK_OUT):
+            os.remove(PACK_OUT)
+    if packed is not None:
+        _publish(PACK_OUT, packed)
+    phase_done("pack")
+
+    _publish(SUGGEST_OUT, build_suggest(flat, out["generation"]))
+    phase_done("suggest")
+
+    # kb.json 最后发布，作为本次构建的提交点：服务端看到新 kb.json 时其余文件均已就绪。
+    # 预压缩版本供 server.py 直接发送，不再逐请求压缩
+    _publish(OUT, raw, compressed=True)
+    phase_done("publish")
+
+    save_manifest(dirs, files_manifest)
+    phase_done("manifest")
+
+    prewarm_stats = None
+    if prewarm_previews > 0:
+        prewarm_stats = prewarm(cat_map, prewarm_previews)
+        phase_done("prewarm")
+
+    stats = {
+        "generated_at": out["generated_at"],
+        "generation": out["generation"],
+        "mode": "full" if full else "incremental",
+        "total_seconds": round(time.perf_counter() - started, 3),
+        "phases": phases,
+        "files": {
+            "raw": len(all_files),
+            "indexed_latest": len(docs),
+            "dirs_scanned": scan_stats["dirs_scanned"],
+            "dirs_reused": scan_stats["dirs_reused"],
+            "reused": reused,
+            "reclassified": reclassified,
+        },
+        "content": content_stats,
+        "thumbs": thumb_stats,
+        "prewarm": prewarm_stats,
+    }
+    with open(BUILD_STATS + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+    os.replace(BUILD_STATS + ".tmp", BUILD_STATS)
+
+    print(f"generated: {OUT} generation={out['generation']}")
+    print(f"raw={len(all_files)} indexed_latest={len(docs)} search_terms={len(search_idx['postings'])} "
+          f"kb.json={len(raw)} kb.pack={len(packed) if packed is not None else 0}")
+    print(f"mode={'full' if full else 'incremental'} dirs_reused={scan_stats['dirs_reused']} dirs_scanned={scan_stats['dirs_scanned']} "
+          f"reused={reused} reclassified={reclassified}")
+    if content_stats:
+        print(f"content docs={content_stats['docs']} cached={content_stats['cached']} "
+              f"extracted={content_stats['extracted']} failed={content_stats['failed']} reindexed={content_stats['reindexed']}")
+    if thumb_stats:
+        print(f"thumbs docs={thumb_stats['docs']} cached={thumb_stats['cached']} rendered={thumb_stats['rendered']} "
+              f"failed={thumb_stats['failed']} skipped={thumb_stats['skipped']}")
+    if prewarm_stats:
+        print(f"preview prewarmed={prewarm_stats['prewarmed']} failed={prewarm_stats['failed']}")
+    # 各一级目录累计列举耗时（并发下为各目录耗时之和），便于定位慢的子树
+    slow = sorted(scan_stats["walk_times"].items(), key=lambda kv: kv[1]["seconds"], reverse=True)
+    for top, t in slow[:10]:
+        print(f"walk {t['seconds']:.2f}s dirs={t['dirs']} files={t['files']} {top}")
+    print(f"phases total={stats['total_seconds']:.2f}s " + " ".join(f"{k}={v:.2f}s" for k, v in phases.items()))
+    return stats
 
 
 if __name__ == "__main__":
-    build()
+    ap = argparse.ArgumentParser(description="构建图安知识库索引")
+    ap.add_argument("--full", action="store_true", help="忽略增量清单，全量重新扫描与分类")
+    ap.add_argument("--workers", type=int, default=SCAN_WORKERS, help="目录遍历并发线程数（默认 %(default)s，可用 TUANKB_SCAN_WORKERS 配置）")
+    ap.add_argument("--no-content", action="store_true", help="跳过正文抽取与全文索引")
+    ap.add_argument("--content-workers", type=int, default=CONTENT_WORKERS, help="正文抽取进程数（默认 %(default)s，可用 TUANKB_CONTENT_WORKERS 配置）")
+    ap.add_argument("--no-thumbs", action="store_true", help="跳过缩略图渲染")
+    ap.add_argument("--thumb-workers", type=int, default=THUMB_WORKERS, help="缩略图渲染并发数（默认 %(default)s，可用 TUANKB_THUMB_WORKERS 配置）")
+    ap.add_argument("--prewarm-previews", type=int, default=PREVIEW_PREWARM, metavar="N",
+                    help="构建后为每个分类最新的 N 个 Office 文档生成预览 PDF（默认 %(default)s，可用 TUANKB_PREVIEW_PREWARM 配置）")
+    args = ap.parse_args()
+    build(full=args.full, workers=args.workers, content=not args.no_content, content_workers=args.content_workers,
+          thumbs=not args.no_thumbs, thumb_workers=args.thumb_workers, prewarm_previews=args.prewarm_previews)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""知识库全文索引：进程池抽取正文，按 (path, size, mtime) 缓存，倒排检索并生成高亮摘要。
+
+夜间构建只对新增/变化的文件抽取正文；倒排索引在上次的 kb.content.json 上增量更新：
+未变化条目的倒排直接沿用（只重排文档编号），只读取新增条目的词项文件、只删除已失效条目的缓存，
+不再逐篇检查和读取整个缓存目录。
+"""
+import os
+import re
+import html
+import signal
+import hashlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from search_index import index_terms, candidate_ids, prepare_index, encode_postings, decode_postings
+from text_extract import extract_text
+
+CONTENT_VERSION = 1
+CONTENT_EXT = {".pdf", ".docx", ".xls", ".xlsx"}
+CONTENT_WORKERS = int(os.environ.get("TUANKB_CONTENT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# 单文件抽取超时（秒），超时按失败缓存，文件变化后才会重试
+CONTENT_TIMEOUT = int(os.environ.get("TUANKB_CONTENT_TIMEOUT", "120"))
+CONTENT_MAX_SIZE = 200 * 1024 * 1024
+CONTENT_MAX_CHARS = 200000
+
+
+class _ExtractTimeout(BaseException):
+    # 继承 BaseException，避免被 extract_text 内部的 except Exception 吞掉
+    pass
+
+
+def cache_key(path: str, size: int, mtime: int) -> str:
+    return hashlib.sha1(f"{path}|{size}|{mtime}".encode("utf-8")).hexdigest()
+
+
+def _on_alarm(signum, frame):
+    raise _ExtractTimeout()
+
+
+def _extract_worker(path: str):
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.alarm(CONTENT_TIMEOUT)
+    try:
+        text = extract_text(path, fallback=False, ocr=False)[:CONTENT_MAX_CHARS]
+        return text, sorted(index_terms(text)), ""
+    except _ExtractTimeout:
+        return "", [], "timeout"
+    except Exception as e:
+        return "", [], str(e) or type(e).__name__
+    finally:
+        signal.alarm(0)
+
+
+def _write_cache(cache_dir: str, key: str, text: str, terms):
+    base = os.path.join(cache_dir, key)
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        f.write(text)
+    # 词项文件最后写入，作为该缓存条目完整的标记
+    with open(base + ".terms.tmp", "w", encoding="utf-8") as f:
+        f.write("\n".join(terms))
+    os.replace(base + ".terms.tmp", base + ".terms")
+
+
+def _read_terms(cache_dir: str, key: str):
+    try:
+        with open(os.path.join(cache_dir, key + ".terms"), "r", encoding="utf-8") as f:
+            return [t for t in f.read().split("\n") if t]
+    except OSError:
+        return []
+
+
+def read_cached_text(cache_dir: str, key: str) -> str:
+    try:
+        with open(os.path.join(cache_dir, key + ".txt"), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def build_content_index(files, cache_dir: str, workers: int = CONTENT_WORKERS, prev: dict = None):
+    """files: [(path, size, mtime)]，顺序即结果排序；返回 (可序列化索引, 统计)。
+
+    prev 为上次构建的 kb.content.json；缺省（全量构建）或缓存目录不存在时由缓存词项重建全部倒排并清扫缓存目录。
+    """
+    if not os.path.isdir(cache_dir) or not prev or prev.get("version") != CONTENT_VERSION:
+        # 删除缓存目录即强制重新抽取，此时上次的倒排不可再信
+        prev = None
+    os.makedirs(cache_dir, exist_ok=True)
+    prev_ids = {key: i for i, (_, key) in enumerate(prev["docs"])} if prev else {}
+    entries = []
+    todo = []
+    # 需要读取词项文件的条目 (新编号, key)
+    fresh = []
+    for path, size, mtime in files:
+        if os.path.splitext(path)[1].lower() not in CONTENT_EXT or size > CONTENT_MAX_SIZE:
+            continue
+        key = cache_key(path, size, mtime)
+        entries.append([path, key])
+        if key in prev_ids:
+            continue
+        fresh.append((len(entries) - 1, key))
+        if not os.path.exists(os.path.join(cache_dir, key + ".terms")):
+            todo.append((path, key))
+
+    stats = {"docs": len(entries), "cached": len(entries) - len(todo), "extracted": 0, "failed": 0,
+             "reindexed": len(fresh)}
+    if todo:
+        with ProcessPoolExecutor(max_workers=max(1, workers)) as ex:
+            futs = {ex.submit(_extract_worker, path): key for path, key in todo}
+            for fut in as_completed(futs):
+                key = futs[fut]
+                try:
+                    text, terms, err = fut.result()
+                except Exception:
+                    # 进程池异常（子进程崩溃等）不写缓存，下次构建重试
+                    stats["failed"] += 1
+                    continue
+                _write_cache(cache_dir, key, text, terms)
+                stats["extracted"] += 1
+                if err:
+                    stats["failed"] += 1
+
+    # 沿用条目：上次编号 -> 本次编号
+    remap = {prev_ids[key]: i for i, (_, key) in enumerate(entries) if key in prev_ids}
+    postings = {}
+    if prev:
+        for t, ids in decode_postings(prev.get("postings", {})).items():
+            kept = [remap[o] for o in ids if o in remap]
+            if kept:
+                postings[t] = kept
+    for i, key in fresh:
+        for t in _read_terms(cache_dir, key):
+            postings.setdefault(t, []).append(i)
+    for ids in postings.values():
+        # 文件顺序变化或插入新条目后编号不再有序（差分编码要求升序）
+        ids.sort()
+
+    # 清理已失效（文件删除或变化）的缓存条目
+    live = {key for _, key in entries}
+    if prev:
+        for key in set(prev_ids) - live:
+            for suffix in (".txt", ".terms", ".terms.tmp"):
+                try:
+                    os.remove(os.path.join(cache_dir, key + suffix))
+                except OSError:
+                    pass
+    else:
+        for fn in os.listdir(cache_dir):
+            if fn.split(".", 1)[0] not in live:
+                try:
+                    os.remove(os.path.join(cache_dir, fn))
+                except OSError:
+                    pass
+
+    out = {
+        "version": CONTENT_VERSION,
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "docs": entries,
+        "postings": encode_postings(postings),
+    }
+    return out, stats
+
+
+def load_content_index(raw: dict):
+    if raw.get("version") != CONTENT_VERSION:
+        return None
+    idx = prepare_index({"doc_count": len(raw.get("docs", [])), "postings": decode_postings(raw.get("postings", {}))})
+    idx["docs"] = raw.get("docs", [])
+    return idx
+
+
+def make_snippet(text: str, q: str, width: int = 40) -> str:
+    q = q.strip()
+    pieces = [q] + [t for t in q.replace("_", " ").replace("-", " ").split() if t and t != q]
+    for piece in pieces:
+        m = re.search(re.escape(piece), text, re.IGNORECASE)
+        if not m:
+            continue
+        a = max(0, m.start() - width)
+        b = min(len(text), m.end() + width)
+        clean = lambda x: html.escape(re.sub(r"\s+", " ", x))
+        return (
+            ("…" if a > 0 else "")
+            + clean(text[a:m.start()])
+            + "<mark>" + clean(m.group(0)) + "</mark>"
+            + clean(text[m.end():b])
+            + ("…" if b < len(text) else "")
+        )
+    return ""
+
+
+def search_content(index: dict, cache_dir: str, q: str, k: int = 5, doc_by_path: dict = None, max_verify: int = 200):
+    """返回 (候选文档数, [(doc, snippet)])；候选逐个读取缓存正文确认命中，最多确认 max_verify 篇。
+
+    候选文档数来自倒排索引（中文二元组 + ASCII 词），只表示索引词都出现，未逐篇确认，是命中数的上界。
+    """
+    if index is None or not q.strip():
+        return 0, []
+    ids = candidate_ids(index, q)
+    if not ids:
+        return 0, []
+    hits = []
+    for n, i in enumerate(ids):
+        if n >= max_verify or len(hits) >= k:
+            break
+        path, key = index["docs"][i]
+        d = doc_by_path.get(path) if doc_by_path is not None else {"file_path": path}
+        if d is None:
+            continue
+        snippet = make_snippet(read_cached_text(cache_dir, key), q)
+        if snippet:
+            hits.append((d, snippet))
+    return len(ids), hits
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""/download、/preview 文件发送：Range / If-Range 断点续传、按扩展名的 MIME 类型、sendfile 零拷贝。
+
+ETag 由 inode/大小/mtime 组成（不读文件内容）；多个区间合并重叠部分后以 multipart/byteranges 返回，
+区间过多时按整文件返回。发送走 socket.sendfile（Linux 下即 os.sendfile），不可用时退回分块读写。
+"""
+import os
+import uuid
+import mimetypes
+from urllib.parse import quote
+from email.utils import formatdate, parsedate_to_datetime
+
+CHUNK = 256 * 1024
+# 合并后仍超过该数量的多区间请求按整文件返回，避免大量碎片区间拖慢服务
+MAX_RANGES = 16
+
+# 系统 mime.types 不全或映射不一致的常见类型，统一固定
+_MIME = {
+    ".pdf": "application/pdf",
+    ".doc": "application/msword",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".xls": "application/vnd.ms-excel",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".ppt": "application/vnd.ms-powerpoint",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ".wps": "application/vnd.ms-works",
+    ".mp4": "video/mp4",
+    ".m4v": "video/mp4",
+    ".mov": "video/quicktime",
+    ".mkv": "video/x-matroska",
+    ".avi": "video/x-msvideo",
+    ".wmv": "video/x-ms-wmv",
+    ".flv": "video/x-flv",
+    ".webm": "video/webm",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".tif": "image/tiff",
+    ".tiff": "image/tiff",
+    ".txt": "text/plain; charset=utf-8",
+    ".csv": "text/csv; charset=utf-8",
+    ".zip": "application/zip",
+    ".rar": "application/vnd.rar",
+    ".7z": "application/x-7z-compressed",
+}
+
+
+# /preview、/download 允许浏览器内嵌显示的类型；其余（html/svg/xml 等可执行脚本的类型）一律按附件下载，
+# 否则共享盘上的网页文件会以本站来源执行脚本
+_INLINE_TYPES = {"application/pdf", "image/png", "image/jpeg", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+
+
+def inline_safe(ctype: str) -> bool:
+    base = ctype.split(";", 1)[0].strip().lower()
+    return base in _INLINE_TYPES or base.startswith("video/") or base == "text/plain"
+
+
+def guess_type(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in _MIME:
+        return _MIME[ext]
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def file_etag(st) -> str:
+    return f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def last_modified(st) -> str:
+    return formatdate(st.st_mtime, usegmt=True)
+
+
+def parse_range(value: str, size: int):
+    """解析 Range 头，返回合并排序后的 [(start, end)]（闭区间）。
+
+    头缺失、语法错误或区间过多时返回 None（按整文件 200 处理）；全部区间都不可满足时返回 []（416）。
+    """
+    if not value:
+        return None
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        if not sep:
+            return None
+        first, last = first.strip(), last.strip()
+        try:
+            if not first:
+                # 后缀区间 "-N"：最后 N 个字节
+                n = int(last)
+                if n < 0:
+                    return None
+                if n == 0 or size == 0:
+                    continue
+                ranges.append((max(0, size - n), size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last else None
+        except ValueError:
+            return None
+        if start < 0 or (end is not None and end < start):
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, size - 1 if end is None else min(end, size - 1)))
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
+
+
+def if_range_ok(value: str, etag: str, st) -> bool:
+    """If-Range 与当前文件一致时返回 True（可按区间响应）；ETag 用强比较，日期须与 Last-Modified 完全相同。"""
+    if not value:
+        return True
+    value = value.strip()
+    if value.startswith('"'):
+        return value == etag
+    if value.startswith("W/"):
+        return False
+    try:
+        return int(parsedate_to_datetime(value).timestamp()) == int(st.st_mtime)
+    except (TypeError, ValueError):
+        return False
+
+
+def file_not_modified(if_none_match: str, if_modified_since: str, etag: str, st) -> bool:
+    if if_none_match:
+        return any(t.strip() in ("*", etag, "W/" + etag) for t in if_none_match.split(","))
+    if if_modified_since:
+        try:
+            return int(parsedate_to_datetime(if_modified_since).timestamp()) >= int(st.st_mtime)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def send_range(sock, wfile, f, offset: int, count: int):
+    """把文件 [offset, offset+count) 写到连接上：优先 socket.sendfile，失败时退回分块读写。"""
+    wfile.flush()
+    if count <= 0:
+        return
+    try:
+        sock.sendfile(f, offset, count)
+        return
+    except (AttributeError, NotImplementedError):
+        pass
+    f.seek(offset)
+    left = count
+    while left > 0:
+        chunk = f.read(min(CHUNK, left))
+        if not chunk:
+            break
+        wfile.write(chunk)
+        left -= len(chunk)
+
+
+def byteranges_parts(ranges, size: int, ctype: str):
+    """生成 multipart/byteranges 的 (boundary, [(分段头, start, end)], 结尾, 总长度)。"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    total = 0
+    for start, end in ranges:
+        head = (f"\r\n--{boundary}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n").encode("latin-1")
+        parts.append((head, start, end))
+        total += len(head) + end - start + 1
+    tail = f"\r\n--{boundary}--\r\n".encode("latin-1")
+    return boundary, parts, tail, total + len(tail)
+
+
+def file_response(req_headers, st, filename: str, disposition: str):
+    """按请求头决定文件响应，返回 (状态码, [(头, 值)], 正文分段)。
+
+    正文分段为 bytes（直接写出）或 (offset, count)（从文件发送），线程版与 asyncio 版服务共用；
+    disposition 为空时不带 Content-Disposition（站点自身的静态页面）。共享盘文件（disposition 非空）
+    只有 inline_safe 的类型保留原类型，其余按 application/octet-stream 附件发送。
+    """
+    size = st.st_size
+    etag = file_etag(st)
+    ctype = guess_type(filename)
+    if disposition and not inline_safe(ctype):
+        ctype, disposition = "application/octet-stream", "attachment"
+    if file_not_modified(req_headers.get("If-None-Match", ""), req_headers.get("If-Modified-Since", ""), etag, st):
+        return 304, [("ETag", etag), ("X-Content-Type-Options", "nosniff")], []
+
+    ranges = None
+    if if_range_ok(req_headers.get("If-Range", ""), etag, st):
+        ranges = parse_range(req_headers.get("Range", ""), size)
+    if ranges == []:
+        return 416, [("Content-Range", f"bytes */{size}"), ("X-Content-Type-Options", "nosniff"), ("Content-Length", "0")], []
+
+    if not ranges:
+        code, headers, body, length = 200, [("Content-Type", ctype)], [(0, size)], size
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        length = end - start + 1
+        code, body = 206, [(start, length)]
+        headers = [("Content-Type", ctype), ("Content-Range", f"bytes {start}-{end}/{size}")]
+    else:
+        boundary, parts, tail, length = byteranges_parts(ranges, size, ctype)
+        code, headers, body = 206, [("Content-Type", f"multipart/byteranges; boundary={boundary}")], []
+        for part_head, start, end in parts:
+            body += [part_head, (start, end - start + 1)]
+        body.append(tail)
+    headers += [("Accept-Ranges", "bytes"), ("ETag", etag), ("Last-Modified", last_modified(st)),
+                ("X-Content-Type-Options", "nosniff")]
+    if disposition:
+        headers.append(("Content-Disposition", f"{disposition}; filename*=UTF-8''{quote(filename)}"))
+    headers.append(("Content-Length", str(length)))
+    return code, headers, body
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""/api/docs 服务端筛选与分页：按分类分片加载文档，按标签/项目/关键词过滤，按项目合并后分页。
+
+筛选与合并规则与 index.html 原前端实现一致（关键词匹配整条记录的 JSON 文本，项目按最新更新时间倒序）。
+"""
+import os
+import json
+import threading
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+_SHARDS = {}
+_LOCK = threading.Lock()
+
+
+def load_shard(path: str):
+    """返回分片文档列表（按 mtime 缓存），附带用于关键词匹配的小写 JSON 文本。"""
+    st = os.stat(path)
+    ent = _SHARDS.get(path)
+    if ent is None or ent["mtime"] != st.st_mtime_ns:
+        with open(path, "r", encoding="utf-8") as f:
+            docs = json.load(f).get("documents", [])
+        ent = {
+            "mtime": st.st_mtime_ns,
+            "docs": docs,
+            # 与前端 JSON.stringify(d).toLowerCase() 一致的紧凑格式
+            "blobs": [json.dumps(d, ensure_ascii=False, separators=(",", ":")).lower() for d in docs],
+        }
+        with _LOCK:
+            _SHARDS[path] = ent
+    return ent
+
+
+def filter_docs(shard: dict, primary: str = "", secondary: str = "", project: str = "", q: str = ""):
+    q = q.strip().lower()
+    out = []
+    for d, blob in zip(shard["docs"], shard["blobs"]):
+        if primary and d.get("industry_primary") != primary:
+            continue
+        if secondary and d.get("industry_secondary") != secondary:
+            continue
+        if project and _project_key(d) != project:
+            continue
+        if q and q not in blob:
+            continue
+        out.append(d)
+    return out
+
+
+def _project_key(d: dict) -> str:
+    return (d.get("project_name") or "未命名项目").strip()
+
+
+def merge_by_project(rows):
+    groups = {}
+    for d in rows:
+        k = _project_key(d)
+        g = groups.get(k)
+        if g is None:
+            g = groups[k] = {
+                "project_name": k,
+                "file_count": 0,
+                "latest_updated_at": "",
+                "industry_primary": d.get("industry_primary") or "其他行业",
+                "industry_secondary": d.get("industry_secondary") or "",
+                "time": d.get("time") or "",
+                "presale_name": d.get("presale_name") or "",
+            }
+        g["file_count"] += 1
+        if not g["latest_updated_at"] or str(d.get("updated_at")) > str(g["latest_updated_at"]):
+            g["latest_updated_at"] = d.get("updated_at")
+        if g["industry_primary"] in ("其他行业", "") and d.get("industry_primary"):
+            g["industry_primary"] = d["industry_primary"]
+        if not g["industry_secondary"] and d.get("industry_secondary"):
+            g["industry_secondary"] = d["industry_secondary"]
+        if str(d.get("time") or "") > str(g["time"]):
+            g["time"] = d["time"]
+    return sorted(groups.values(), key=lambda g: str(g["latest_updated_at"]), reverse=True)
+
+
+def page_slice(items, page: int, size: int):
+    size = max(1, min(size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    page = max(1, page or 1)
+    return items[(page - 1) * size: page * size], page, size
+
+
+def query_docs(shard: dict, primary: str = "", secondary: str = "", project: str = "", q: str = "", page: int = 1, size: int = DEFAULT_PAGE_SIZE):
+    """未指定 project 时返回按项目合并后的一页项目摘要；指定 project 时返回该项目的一页文件。"""
+    rows = filter_docs(shard, primary, secondary, project, q)
+    out = {"total_docs": len(rows)}
+    if project:
+        rows = sorted(rows, key=lambda d: str(d.get("updated_at")), reverse=True)
+        out["docs"], out["page"], out["size"] = page_slice(rows, page, size)
+        out["total"] = len(rows)
+        return out
+    projects = merge_by_project(rows)
+    out["total_projects"] = len(projects)
+    out["projects"], out["page"], out["size"] = page_slice(projects, page, size)
+    out["total"] = len(projects)
+    return out
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""知识库紧凑格式 kb.pack：build_index.py 与 kb.json 同时写出，server.py 以 mmap 只读加载、按需解码文档。
+
+kb.json 中每个文档重复完整的 /mnt/tuan/... 路径（file_path 与 history_versions）、分类/行业等枚举串，
+且 industry_type 与 industry_primary 相同。kb.pack 的布局：
+
+    b"TKBPACK1" | u32 头部长度 | 头部 JSON | 各段（8 字节对齐，小端）
+
+- 共享串表 sym：目录、分类、行业、项目名、扩展名等重复出现的字符串，加载时一次性解码；
+- 文件名串表 name：文件名各不相同，按需解码；路径 = 目录 + "/" + 文件名；
+- 文档列：dir/name/category/project/primary/secondary/ext/presale 为串号（u32），
+  size 与 updated（YYYYMMDDhhmmss 整数）为 u64，flags 为 u8，缩略图 id 为 20 字节；
+- 历史版本：hist_start（n+1 个偏移）+ hist_dir/hist_name；
+- 路径查找：path_hash（路径 blake2b 前 8 字节，升序）+ path_doc。
+
+文档顺序与 kb.json 的 by_category 展开顺序一致，倒排索引的文档号两者通用。
+头部保存 kb.json 除 by_category 以外的字段，to_kb() 可还原出与 kb.json 相同的内容。
+
+用法：python3 scripts/kb_pack.py export data/kb.pack > kb.json
+"""
+import os
+import sys
+import json
+import mmap
+import array
+import bisect
+import hashlib
+import argparse
+
+MAGIC = b"TKBPACK1"
+VERSION = 1
+# 文档字段顺序与 build_index.py 一致，to_kb() 据此还原
+DOC_KEYS = ("title", "category", "project_name", "industry_type", "industry_primary", "industry_secondary", "time",
+            "presale_name", "updated_at", "timestamp_fallback", "history_versions", "file_path", "size", "ext")
+OPTIONAL_KEYS = ("thumb",)
+FLAG_FALLBACK = 1
+FLAG_THUMB = 2
+_NO_THUMB = bytes(20)
+
+
+def _path_hash(path: str) -> int:
+    return int.from_bytes(hashlib.blake2b(path.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _updated_int(s: str) -> int:
+    return int(s[0:4] + s[5:7] + s[8:10] + s[11:13] + s[14:16] + s[17:19])
+
+
+def _updated_str(v: int) -> str:
+    s = f"{v:014d}"
+    return f"{s[0:4]}-{s[4:6]}-{s[6:8]} {s[8:10]}:{s[10:12]}:{s[12:14]}"
+
+
+def _split(path: str):
+    d, sep, name = path.rpartition("/")
+    if not sep:
+        raise ValueError(f"路径缺少目录：{path}")
+    return d, name
+
+
+def _string_table(strings):
+    off = array.array("I", [0])
+    blob = bytearray()
+    for s in strings:
+        blob += s.encode("utf-8")
+        off.append(len(blob))
+    return off, bytes(blob)
+
+
+def pack_kb(kb: dict) -> bytes:
+    """kb.json 内容 → kb.pack 字节串；文档字段与 build_index.py 输出不符时抛 ValueError。"""
+    docs = [d for arr in kb.get("by_category", {}).values() for d in arr]
+    sym, sym_ids = [], {}
+    names = []
+
+    def sid(s: str) -> int:
+        i = sym_ids.get(s)
+        if i is None:
+            i = sym_ids[s] = len(sym)
+            sym.append(s)
+        return i
+
+    def nid(s: str) -> int:
+        names.append(s)
+        return len(names) - 1
+
+    cols = {k: array.array("I") for k in ("dir", "name", "category", "project", "primary", "secondary", "ext", "presale")}
+    size, updated = array.array("Q"), array.array("Q")
+    flags = array.array("B")
+    thumbs = bytearray()
+    hist_start, hist_dir, hist_name = array.array("I", [0]), array.array("I"), array.array("I")
+    hashes = []
+    for i, d in enumerate(docs):
+        extra = set(d) - set(DOC_KEYS) - set(OPTIONAL_KEYS)
+        if extra or not set(DOC_KEYS) <= set(d):
+            raise ValueError(f"文档字段不符：{d.get('file_path', '')}")
+        dir_, name = _split(d["file_path"])
+        if d["title"] != name or d["industry_type"] != d["industry_primary"] or d["time"] != d["updated_at"][:10]:
+            raise ValueError(f"文档字段不符：{d['file_path']}")
+        cols["dir"].append(sid(dir_))
+        cols["name"].append(nid(name))
+        cols["category"].append(sid(d["category"]))
+        cols["project"].append(sid(d["project_name"]))
+        cols["primary"].append(sid(d["industry_primary"]))
+        cols["secondary"].append(sid(d["industry_secondary"]))
+        cols["ext"].append(sid(d["ext"]))
+        cols["presale"].append(sid(d["presale_name"]))
+        size.append(d["size"])
+        updated.append(_updated_int(d["updated_at"]))
+        f = FLAG_FALLBACK if d["timestamp_fallback"] else 0
+        if "thumb" in d:
+            f |= FLAG_THUMB
+            thumbs += bytes.fromhex(d["thumb"])
+        else:
+            thumbs += _NO_THUMB
+        flags.append(f)
+        for h in d["history_versions"]:
+            hd, hn = _split(h)
+            hist_dir.append(sid(hd))
+            hist_name.append(nid(hn))
+        hist_start.append(len(hist_dir))
+        hashes.append((_path_hash(d["file_path"]), i))
+    hashes.sort()
+
+    sym_off, sym_blob = _string_table(sym)
+    name_off, name_blob = _string_table(names)
+    sections = [
+        ("sym_off", sym_off), ("sym_blob", sym_blob), ("name_off", name_off), ("name_blob", name_blob),
+        *cols.items(), ("size", size), ("updated", updated), ("flags", flags), ("thumb", bytes(thumbs)),
+        ("hist_start", hist_start), ("hist_dir", hist_dir), ("hist_name", hist_name),
+        ("path_hash", array.array("Q", [h for h, _ in hashes])), ("path_doc", array.array("I", [i for _, i in hashes])),
+    ]
+    header = {k: v for k, v in kb.items() if k != "by_category"}
+    header["pack_version"] = VERSION
+    header["doc_count"] = len(docs)
+    header["category_order"] = list(kb.get("by_category", {}))
+    return write_sections(MAGIC, header, sections)
+
+
+def write_sections(magic: bytes, header: dict, sections) -> bytes:
+    """magic | u32 头部长度 | 头部 JSON | 各段；sections 为 [(名称, array 或 bytes)]，布局记入 header["sections"]。"""
+    if sys.byteorder != "little":
+        for _, a in sections:
+            if isinstance(a, array.array) and a.itemsize > 1:
+                a.byteswap()
+    # 各段偏移依赖头部长度，预留足够位数后定长填充
+    layout, pos = {}, 0
+    for name, a in sections:
+        raw_len = len(a) * (a.itemsize if isinstance(a, array.array) else 1)
+        layout[name] = [pos, raw_len, a.typecode if isinstance(a, array.array) else "B"]
+        pos += (raw_len + 7) // 8 * 8
+    header["sections"] = layout
+    head = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    base = (len(magic) + 4 + len(head) + 7) // 8 * 8
+    head += b" " * (base - len(magic) - 4 - len(head))
+
+    out = bytearray(magic + len(head).to_bytes(4, "little") + head)
+    for name, a in sections:
+        out += a.tobytes() if isinstance(a, array.array) else a
+        out += bytes(-len(out) % 8)
+    return bytes(out)
+
+
+def read_sections(buf, magic: bytes) -> dict:
+    """解析 write_sections 的输出（mmap 或 bytes，不复制），返回 {"header", 各段 memoryview}；magic 不符时抛 ValueError。"""
+    if buf[:len(magic)] != magic:
+        raise ValueError(f"文件头不是 {magic!r}")
+    start = len(magic) + 4
+    n = int.from_bytes(buf[len(magic):start], "little")
+    header = json.loads(bytes(buf[start:start + n]).decode("utf-8"))
+    base = start + n
+    view = memoryview(buf)
+    out = {"header": header}
+    for name, (off, length, code) in header["sections"].items():
+        seg = view[base + off:base + off + length]
+        if code == "B":
+            out[name] = seg
+        elif sys.byteorder == "little":
+            out[name] = seg.cast(code)
+        else:
+            a = array.array(code, seg.tobytes())
+            a.byteswap()
+            out[name] = a
+    return out
+
+
+def map_file(path: str):
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def open_pack(path: str) -> dict:
+    """mmap 打开 kb.pack，返回 {"header", "sym", ...各段 memoryview}；格式不符时抛 ValueError。"""
+    pack = read_sections(map_file(path), MAGIC)
+    if pack["header"].get("pack_version") != VERSION:
+        raise ValueError("kb.pack 版本不符")
+    off, blob = pack["sym_off"], pack["sym_blob"]
+    pack["sym"] = [str(blob[off[i]:off[i + 1]], "utf-8") for i in range(len(off) - 1)]
+    return pack
+
+
+def name_at(pack: dict, i: int) -> str:
+    off = pack["name_off"]
+    return str(pack["name_blob"][off[i]:off[i + 1]], "utf-8")
+
+
+def path_at(pack: dict, i: int) -> str:
+    return pack["sym"][pack["dir"][i]] + "/" + name_at(pack, pack["name"][i])
+
+
+def doc_at(pack: dict, i: int) -> dict:
+    """解码第 i 个文档，字段与 kb.json 中的文档相同。"""
+    sym = pack["sym"]
+    name = name_at(pack, pack["name"][i])
+    updated = _updated_str(pack["updated"][i])
+    primary = sym[pack["primary"][i]]
+    a, b = pack["hist_start"][i], pack["hist_start"][i + 1]
+    d = {
+        "title": name,
+        "category": sym[pack["category"][i]],
+        "project_name": sym[pack["project"][i]],
+        "industry_type": primary,
+        "industry_primary": primary,
+        "industry_secondary": sym[pack["secondary"][i]],
+        "time": updated[:10],
+        "presale_name": sym[pack["presale"][i]],
+        "updated_at": updated,
+        "timestamp_fallback": bool(pack["flags"][i] & FLAG_FALLBACK),
+        "history_versions": [sym[pack["hist_dir"][j]] + "/" + name_at(pack, pack["hist_name"][j]) for j in range(a, b)],
+        "file_path": sym[pack["dir"][i]] + "/" + name,
+        "size": pack["size"][i],
+        "ext": sym[pack["ext"][i]],
+    }
+    if pack["flags"][i] & FLAG_THUMB:
+        d["thumb"] = pack["thumb"][i * 20:(i + 1) * 20].hex()
+    return d
+
+
+def find_path(pack: dict, path: str):
+    """按路径查文档号，不存在返回 None。"""
+    h = _path_hash(path)
+    keys = pack["path_hash"]
+    j = bisect.bisect_left(keys, h)
+    while j < len(keys) and keys[j] == h:
+        i = pack["path_doc"][j]
+        if path_at(pack, i) == path:
+            return i
+        j += 1
+    return None
+
+
+class PackedDocs:
+    """kb.pack 文档的只读序列视图：docs[i] 按需解码为 dict，by_path.get(path) 按路径查找。"""
+
+    def __init__(self, pack: dict):
+        self.pack = pack
+        self.by_path = _PathView(pack)
+
+    def __len__(self):
+        return self.pack["header"]["doc_count"]
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return doc_at(self.pack, i)
+
+    def __iter__(self):
+        return (doc_at(self.pack, i) for i in range(len(self)))
+
+
+class _PathView:
+    def __init__(self, pack: dict):
+        self.pack = pack
+
+    def get(self, path: str, default=None):
+        i = find_path(self.pack, path)
+        return default if i is None else doc_at(self.pack, i)
+
+
+def search_fields_packed(pack: dict):
+    """各文档的 search_index.search_fields，目录等共享串只小写一次；updated 以整数参与排序。"""
+    low = [s.lower() for s in pack["sym"]]
+    low = [l if l != s else s for l, s in zip(low, pack["sym"])]
+    name_off, blob = pack["name_off"], pack["name_blob"]
+    out = []
+    for i in range(pack["header"]["doc_count"]):
+        n = pack["name"][i]
+        name = str(blob[name_off[n]:name_off[n + 1]], "utf-8")
+        name_l = name.lower()
+        out.append((name_l, low[pack["project"][i]], low[pack["dir"][i]] + "/" + name_l, low[pack["category"][i]],
+                    low[pack["primary"][i]], pack["updated"][i]))
+    return out
+
+
+def to_kb(pack: dict) -> dict:
+    """还原 kb.json 内容（供前端的 JSON 导出与校验）。"""
+    header = pack["header"]
+    by_category = {c: [] for c in header["category_order"]}
+    for i in range(header["doc_count"]):
+        d = doc_at(pack, i)
+        by_category.setdefault(d["category"], []).append(d)
+    kb = {k: v for k, v in header.items() if k not in ("pack_version", "doc_count", "category_order", "sections")}
+    kb["by_category"] = by_category
+    return kb
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="kb.pack 工具")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("export", help="导出为 kb.json 格式").add_argument("pack")
+    sub.add_parser("info", help="输出头部与各段大小").add_argument("pack")
+    args = ap.parse_args()
+    p = open_pack(args.pack)
+    if args.cmd == "export":
+        sys.stdout.write(json.dumps(to_kb(p), ensure_ascii=False, separators=(",", ":")))
+    else:
+        h = p["header"]
+        print(f"generation={h.get('generation', '')} docs={h['doc_count']} sym={len(p['sym'])} "
+              f"size={os.path.getsize(args.pack)}")
+        for name, (_, length, code) in h["sections"].items():
+            print(f"  {name:<11} {code} {length}")
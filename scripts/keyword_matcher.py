@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""多关键词单遍匹配：把关键词表编译成一个前缀树形式的正则，一次扫描得到文本中出现的全部关键词。
+
+正则只做最左最长、不重叠的匹配。为了不漏掉重叠命中，把“L 的后缀是 K 的前缀”的关键词对
+预先拼接成超串加入模式（迭代到不再产生新串），每个模式串再映射到其内部包含的全部关键词。
+"""
+import re
+
+_NO_HITS = frozenset()
+
+
+def _trie_regex(words) -> str:
+    # 前缀树形式的正则：同一位置只比较一次首字符，贪婪可选组保证取最长关键词
+    trie = {}
+    for w in words:
+        node = trie
+        for c in w:
+            node = node.setdefault(c, {})
+        node[""] = {}
+
+    def emit(node):
+        alts = [re.escape(c) + emit(node[c]) for c in sorted(k for k in node if k)]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return emit(trie)
+
+
+def _expand_overlaps(kws, max_rounds: int = 16):
+    patterns = set(kws)
+    for _ in range(max_rounds):
+        new = set()
+        for L in patterns:
+            for o in range(1, len(L)):
+                suffix = L[o:]
+                for k in patterns:
+                    if len(k) > len(suffix) and k.startswith(suffix) and L + k[len(suffix):] not in patterns:
+                        new.add(L + k[len(suffix):])
+        if not new:
+            return patterns
+        patterns |= new
+    raise ValueError("关键词重叠展开不收敛，请检查关键词表")
+
+
+def compile_keywords(keywords):
+    kws = {k for k in keywords if k}
+    patterns = _expand_overlaps(kws)
+    return {
+        "pattern": re.compile(_trie_regex(patterns)) if patterns else None,
+        "inner": {L: frozenset(k for k in kws if k in L) for L in patterns},
+    }
+
+
+def find_keywords(matcher: dict, text: str):
+    """返回 text 中出现的全部关键词（区分大小写，调用方自行统一小写）。"""
+    if matcher["pattern"] is None:
+        return _NO_HITS
+    inner = matcher["inner"]
+    return _NO_HITS.union(*[inner[m] for m in matcher["pattern"].findall(text)])
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""进程内运行指标，/metrics 以 Prometheus 文本格式输出。
+
+计数器、仪表、直方图按 (名称, 标签) 存放在 dict 中，一把锁保护；缓存命中、队列长度等
+已有统计不重复记账，由各模块注册的采集函数在抓取时读取。
+外部工具（pdftotext / pdftoppm / tesseract / libreoffice ...）经 run_tool 或 observe_tool 记录耗时与结果。
+"""
+import math
+import time
+import bisect
+import threading
+import subprocess
+
+# 请求耗时分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# 外部工具耗时分桶（秒）
+TOOL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# route 标签只取这些路径，其余归为 static / other，避免任意 URL 撑大指标数量；新增路由时同步
+ROUTES = {
+    "/", "/index.html", "/bid.html", "/data/kb.json", "/data/kb.meta.json", "/metrics",
+    "/download", "/preview", "/thumb",
+    "/api/search", "/api/dingtalk_search", "/api/docs", "/api/bid/cache_stats", "/api/preview/cache_stats",
+    "/api/search/cache_stats", "/api/suggest", "/api/bid/report_stats",
+    "/api/bid/analyze", "/api/bid/analyze_pdf",
+    "/api/dingtalk/bid/start", "/api/dingtalk/bid/upload", "/api/dingtalk/bid/confirm", "/api/dingtalk/bid/status",
+}
+
+_LOCK = threading.Lock()
+# name -> {"type", "help", "buckets", "values": {labels: 值 或 [各桶计数..., +Inf 计数, sum]}}
+_METRICS = {}
+_COLLECTORS = []
+
+
+def define(name: str, kind: str, help_text: str, buckets=None):
+    with _LOCK:
+        _METRICS.setdefault(name, {"type": kind, "help": help_text, "buckets": buckets, "values": {}})
+
+
+def _key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def inc(name: str, labels: dict = None, value: float = 1):
+    with _LOCK:
+        vals = _METRICS[name]["values"]
+        k = _key(labels)
+        vals[k] = vals.get(k, 0) + value
+
+
+def set_gauge(name: str, value: float, labels: dict = None):
+    with _LOCK:
+        _METRICS[name]["values"][_key(labels)] = value
+
+
+def observe(name: str, value: float, labels: dict = None):
+    with _LOCK:
+        m = _METRICS[name]
+        k = _key(labels)
+        h = m["values"].get(k)
+        if h is None:
+            h = m["values"][k] = [0] * (len(m["buckets"]) + 1) + [0.0]
+        h[bisect.bisect_left(m["buckets"], value)] += 1
+        h[-1] += value
+
+
+def register_collector(fn):
+    """fn() 返回 [(名称, 类型, 说明, 标签 dict, 值)]，每次抓取时调用；异常的采集函数跳过。"""
+    _COLLECTORS.append(fn)
+
+
+def route_label(path: str) -> str:
+    if path in ROUTES:
+        return path
+    if path.startswith("/api/"):
+        return "other"
+    return "static"
+
+
+def request_started():
+    inc("tuankb_http_inflight", value=1)
+
+
+def request_finished(method: str, path: str, code, seconds: float):
+    inc("tuankb_http_inflight", value=-1)
+    if code is None:
+        return
+    route = route_label(path)
+    inc("tuankb_http_requests_total", {"method": method, "route": route, "code": str(code)})
+    observe("tuankb_http_request_duration_seconds", seconds, {"route": route})
+
+
+def observe_tool(tool: str, seconds: float, outcome: str):
+    observe("tuankb_tool_duration_seconds", seconds, {"tool": tool, "outcome": outcome})
+
+
+def run_tool(cmd, **kwargs):
+    """subprocess.run 并记录耗时；outcome 为 ok / fail（非零退出）/ timeout / error（无法启动）。"""
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        p = subprocess.run(cmd, **kwargs)
+        outcome = "ok" if p.returncode == 0 else "fail"
+        return p
+    except subprocess.TimeoutExpired:
+        outcome = "timeout"
+        raise
+    finally:
+        observe_tool(cmd[0].rsplit("/", 1)[-1], time.perf_counter() - t0, outcome)
+
+
+def _fmt(v) -> str:
+    if isinstance(v, float):
+        if math.isinf(v):
+            return "+Inf" if v > 0 else "-Inf"
+        return repr(v)
+    return str(v)
+
+
+def _labels(labels, extra=()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    esc = lambda s: str(s).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def render() -> str:
+    lines = []
+    with _LOCK:
+        snapshot = [(n, m["type"], m["help"], m["buckets"], {k: (list(v) if isinstance(v, list) else v) for k, v in m["values"].items()})
+                    for n, m in sorted(_METRICS.items())]
+    for name, kind, help_text, buckets, values in snapshot:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, v in sorted(values.items()):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_fmt(v)}")
+                continue
+            total = 0
+            for le, n in zip(list(buckets) + [math.inf], v[:-1]):
+                total += n
+                lines.append(f"{name}_bucket{_labels(labels, [('le', _fmt(float(le)))])} {total}")
+            lines.append(f"{name}_sum{_labels(labels)} {_fmt(v[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {total}")
+
+    # 采集函数给出的同名指标合并到一组 HELP/TYPE 下
+    collected = {}
+    for fn in _COLLECTORS:
+        try:
+            for name, kind, help_text, labels, value in fn():
+                collected.setdefault(name, (kind, help_text, []))[2].append((_key(labels), value))
+        except Exception:
+            continue
+    for name, (kind, help_text, samples) in sorted(collected.items()):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(labels)} {_fmt(value)}")
+    return "\n".join(lines) + "\n"
+
+
+define("tuankb_http_requests_total", "counter", "HTTP 请求数（按方法、路由、状态码）")
+define("tuankb_http_request_duration_seconds", "histogram", "HTTP 请求处理耗时（按路由）", LATENCY_BUCKETS)
+define("tuankb_http_inflight", "gauge", "正在处理的 HTTP 请求数")
+define("tuankb_tool_duration_seconds", "histogram", "外部工具调用耗时（按工具与结果）", TOOL_BUCKETS)
+define("tuankb_kb_reloads_total", "counter", "kb.json 重新加载次数（按结果）")
+define("tuankb_kb_reload_seconds", "gauge", "最近一次 kb.json 加载耗时")
+define("tuankb_bid_analyzing", "gauge", "正在执行的后台标书分析任务数")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""流式 multipart/form-data 解析：文件分块直接写盘，同时计算 SHA-256，并尽早拒绝超限/不支持的上传。
+
+替代 cgi.FieldStorage（Python 3.13 已移除，且会把整个文件读入内存）。
+Content-Length 超过上限时不读取请求体直接拒绝；文件扩展名在读到该文件分段头时即校验，不再读取其内容。
+"""
+import os
+import hashlib
+import tempfile
+from email.message import Message
+
+UPLOAD_MAX_BYTES = int(os.environ.get("TUANKB_UPLOAD_MAX_MB", "300")) * 1024 * 1024
+CHUNK = 256 * 1024
+HEADER_MAX = 16 * 1024
+FIELD_MAX = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message: str, code: int = 400):
+        super().__init__(message)
+        self.code = code
+
+
+def _header_params(name: str, value: str) -> Message:
+    m = Message()
+    m[name] = value
+    return m
+
+
+def content_type(value: str):
+    """返回 (小写 MIME 类型, boundary)。"""
+    m = _header_params("content-type", value or "")
+    return m.get_content_type(), m.get_param("boundary")
+
+
+def _read_more(st: dict):
+    if st["left"] <= 0:
+        raise UploadError("上传数据不完整")
+    data = st["rfile"].read(min(CHUNK, st["left"]))
+    if not data:
+        raise UploadError("上传数据不完整")
+    st["left"] -= len(data)
+    st["buf"] += data
+
+
+def _read_until(st: dict, token: bytes, limit: int) -> bytes:
+    while True:
+        idx = st["buf"].find(token)
+        if idx >= 0:
+            out = bytes(st["buf"][:idx])
+            del st["buf"][:idx + len(token)]
+            return out
+        if len(st["buf"]) > limit:
+            raise UploadError("上传数据格式错误")
+        _read_more(st)
+
+
+def _stream_until(st: dict, delim: bytes, write):
+    # 缓冲区只保留可能构成分隔符前缀的尾部，其余数据立即交给 write
+    keep = len(delim) - 1
+    while True:
+        idx = st["buf"].find(delim)
+        if idx >= 0:
+            write(st["buf"][:idx])
+            del st["buf"][:idx + len(delim)]
+            return
+        if len(st["buf"]) > keep:
+            write(st["buf"][:-keep])
+            del st["buf"][:-keep]
+        _read_more(st)
+
+
+def _part_info(raw: bytes):
+    name, filename = "", None
+    for line in raw.decode("utf-8", errors="replace").split("\r\n"):
+        k, _, v = line.partition(":")
+        if k.strip().lower() == "content-disposition":
+            m = _header_params("content-disposition", v.strip())
+            name = m.get_param("name", header="content-disposition") or ""
+            filename = m.get_filename()
+    return name, filename
+
+
+def parse_multipart(rfile, headers, dest_dir: str, max_bytes: int = UPLOAD_MAX_BYTES, allowed_ext=None):
+    """解析请求体，返回 (fields, files)。
+
+    fields: {字段名: 文本值}；files: {字段名: {"filename", "ext", "path", "size", "sha256"}}，
+    文件写入 dest_dir 下的临时文件，由调用方移动或删除。出错时抛出 UploadError（code 为 HTTP 状态码），
+    已写入的临时文件会被清理。未选择文件（filename 为空）的文件字段不出现在 files 中。
+    """
+    ctype, boundary = content_type(headers.get("Content-Type", ""))
+    if ctype != "multipart/form-data" or not boundary:
+        raise UploadError("请使用 multipart/form-data 上传文件")
+    try:
+        length = int(headers.get("Content-Length", ""))
+    except ValueError:
+        raise UploadError("缺少 Content-Length", 411)
+    if length > max_bytes:
+        raise UploadError(f"上传文件超过大小上限（{max_bytes // 1024 // 1024}MB）", 413)
+
+    delim = b"\r\n--" + boundary.encode("latin-1")
+    # 在请求体前补 CRLF，使第一个分隔符与后续分隔符形式一致
+    st = {"rfile": rfile, "left": length, "buf": bytearray(b"\r\n")}
+    fields, files = {}, {}
+    try:
+        _stream_until(st, delim, lambda b: None)
+        while True:
+            while len(st["buf"]) < 2:
+                _read_more(st)
+            if st["buf"][:2] == b"--":
+                break
+            if st["buf"][:2] != b"\r\n":
+                raise UploadError("上传数据格式错误")
+            del st["buf"][:2]
+            name, filename = _part_info(_read_until(st, b"\r\n\r\n", HEADER_MAX))
+
+            if filename is None:
+                value = bytearray()
+
+                def collect(b):
+                    if len(value) + len(b) > FIELD_MAX:
+                        raise UploadError("表单字段过长")
+                    value.extend(b)
+
+                _stream_until(st, delim, collect)
+                fields[name] = value.decode("utf-8", errors="replace")
+                continue
+
+            filename = os.path.basename(filename.replace("\\", "/"))
+            if not filename:
+                _stream_until(st, delim, lambda b: None)
+                continue
+            ext = os.path.splitext(filename)[1].lower()
+            if allowed_ext is not None and ext not in allowed_ext:
+                raise UploadError("不支持的文件格式")
+            if name in files:
+                os.remove(files.pop(name)["path"])
+            fd, path = tempfile.mkstemp(prefix="upload-", suffix=ext, dir=dest_dir)
+            info = {"filename": filename, "ext": ext, "path": path, "size": 0, "sha256": ""}
+            files[name] = info
+            h = hashlib.sha256()
+            with os.fdopen(fd, "wb") as f:
+                def write(b):
+                    h.update(b)
+                    f.write(b)
+                    info["size"] += len(b)
+
+                _stream_until(st, delim, write)
+            info["sha256"] = h.hexdigest()
+    except BaseException:
+        for info in files.values():
+            try:
+                os.remove(info["path"])
+            except OSError:
+                pass
+        raise
+    return fields, files
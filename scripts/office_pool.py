@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""Office 文档转换服务：常驻 headless LibreOffice 工作进程池（正文抽取与预览转换共用）。
+
+每个工作进程使用独立的用户配置目录，转换请求排队分配给空闲进程，输出写入调用方给定的独立目录，
+同名文件并发转换互不干扰。安装了 python3-uno 时工作进程常驻，通过 UNO 套接字接收转换请求，
+省去每个文件数秒的冷启动；否则退化为在该工作进程的配置目录下逐个调用 --convert-to
+（配置目录只初始化一次）。转换超时视为卡死：杀掉进程，下次分配到该工作进程时重启。
+"""
+import os
+import time
+import queue
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+from multiprocessing import util as mp_util
+
+from metrics import observe_tool
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+
+OFFICE_BIN = os.environ.get("TUANKB_SOFFICE", "libreoffice")
+OFFICE_WORKERS = int(os.environ.get("TUANKB_OFFICE_WORKERS", "2"))
+OFFICE_TIMEOUT = int(os.environ.get("TUANKB_OFFICE_TIMEOUT", "60"))
+# 设为 0 时强制使用逐个 --convert-to 模式
+OFFICE_USE_UNO = os.environ.get("TUANKB_OFFICE_UNO", "1") != "0" and uno is not None
+
+# (目标格式, 文档类型) -> 导出过滤器
+_FILTERS = {
+    ("csv", "calc"): "Text - txt - csv (StarCalc)",
+    ("pdf", "calc"): "calc_pdf_Export",
+    ("pdf", "writer"): "writer_pdf_Export",
+    ("pdf", "impress"): "impress_pdf_Export",
+    ("pdf", "draw"): "draw_pdf_Export",
+    ("txt", "writer"): "Text",
+}
+
+_POOL = {"idle": queue.Queue(), "workers": [], "lock": threading.Lock(), "pid": None}
+STATS = {"converted": 0, "failed": 0, "restarts": 0, "timeouts": 0}
+
+
+def _profile_url(w: dict) -> str:
+    return "file://" + w["profile"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _props(**kw):
+    out = []
+    for k, v in kw.items():
+        p = PropertyValue()
+        p.Name, p.Value = k, v
+        out.append(p)
+    return tuple(out)
+
+
+def _kill(w: dict):
+    proc = w.get("proc")
+    w["proc"] = None
+    w["desktop"] = None
+    if proc is not None and proc.poll() is None:
+        proc.kill()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+def _start_uno(w: dict):
+    port = _free_port()
+    w["proc"] = subprocess.Popen(
+        [OFFICE_BIN, f"-env:UserInstallation={_profile_url(w)}", "--headless", "--invisible", "--nologo",
+         "--norestore", "--nodefault", "--nolockcheck", f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    local = uno.getComponentContext()
+    resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+    deadline = time.time() + OFFICE_TIMEOUT
+    while True:
+        try:
+            ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+            w["desktop"] = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+            return
+        except Exception:
+            if w["proc"].poll() is not None or time.time() > deadline:
+                _kill(w)
+                raise RuntimeError("LibreOffice 工作进程启动失败")
+            time.sleep(0.2)
+
+
+def _healthy(w: dict) -> bool:
+    if not OFFICE_USE_UNO:
+        return True
+    if w.get("proc") is None or w["proc"].poll() is not None or w.get("desktop") is None:
+        return False
+    try:
+        w["desktop"].getFrames()
+        return True
+    except Exception:
+        return False
+
+
+def _ensure_pool():
+    # fork 出的子进程（全文索引进程池）不继承父进程的工作进程，重新建池
+    if _POOL["pid"] != os.getpid():
+        _POOL.update(idle=queue.Queue(), workers=[], lock=threading.Lock(), pid=os.getpid())
+        # 主进程由 atexit、子进程由 multiprocessing 退出流程执行，退出时关闭工作进程
+        mp_util.Finalize(None, shutdown, exitpriority=10)
+
+
+def _acquire(timeout: int) -> dict:
+    _ensure_pool()
+    try:
+        return _POOL["idle"].get_nowait()
+    except queue.Empty:
+        pass
+    with _POOL["lock"]:
+        if len(_POOL["workers"]) < max(1, OFFICE_WORKERS):
+            w = {
+                "id": len(_POOL["workers"]),
+                "profile": os.path.join(tempfile.gettempdir(), f"tuankb-office-{os.getpid()}-{len(_POOL['workers'])}"),
+                "proc": None,
+                "desktop": None,
+                "started": False,
+            }
+            _POOL["workers"].append(w)
+            return w
+    try:
+        return _POOL["idle"].get(timeout=timeout)
+    except queue.Empty:
+        raise TimeoutError("LibreOffice 转换排队超时")
+
+
+def _doc_kind(doc) -> str:
+    for service, kind in (
+        ("com.sun.star.sheet.SpreadsheetDocument", "calc"),
+        ("com.sun.star.presentation.PresentationDocument", "impress"),
+        ("com.sun.star.drawing.DrawingDocument", "draw"),
+    ):
+        if doc.supportsService(service):
+            return kind
+    return "writer"
+
+
+def _convert_uno(w: dict, src: str, fmt: str, out: str, timeout: int):
+    if not _healthy(w):
+        if w["started"]:
+            STATS["restarts"] += 1
+        _kill(w)
+        _start_uno(w)
+        w["started"] = True
+    # 看门狗：超时杀掉进程，阻塞中的 UNO 调用随即抛出异常
+    timer = threading.Timer(timeout, _kill, args=(w,))
+    timer.start()
+    try:
+        doc = w["desktop"].loadComponentFromURL(uno.systemPathToFileUrl(os.path.abspath(src)), "_blank", 0, _props(Hidden=True, ReadOnly=True))
+        if doc is None:
+            raise RuntimeError("LibreOffice 无法打开文件")
+        try:
+            filt = _FILTERS.get((fmt, _doc_kind(doc)))
+            if filt is None:
+                raise ValueError(f"不支持的转换：{fmt}")
+            doc.storeToURL(uno.systemPathToFileUrl(out), _props(FilterName=filt))
+        finally:
+            doc.close(True)
+    except Exception:
+        if not timer.is_alive():
+            STATS["timeouts"] += 1
+        raise
+    finally:
+        timer.cancel()
+
+
+def _convert_cli(w: dict, src: str, fmt: str, outdir: str, timeout: int):
+    try:
+        subprocess.run(
+            [OFFICE_BIN, f"-env:UserInstallation={_profile_url(w)}", "--headless", "--norestore", "--nolockcheck",
+             "--convert-to", fmt, "--outdir", outdir, src],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        STATS["timeouts"] += 1
+        raise
+
+
+def convert(src: str, fmt: str, outdir: str, timeout: int = OFFICE_TIMEOUT) -> str:
+    """把 src 转换为 fmt（csv/pdf/txt）写入 outdir，返回输出文件路径；失败抛出异常。
+
+    outdir 应为调用方独占的目录（如 tempfile.mkdtemp()），用完自行删除。
+    """
+    out = os.path.join(outdir, os.path.splitext(os.path.basename(src))[0] + "." + fmt)
+    w = _acquire(timeout)
+    t0 = time.perf_counter()
+    timeouts = STATS["timeouts"]
+    try:
+        if OFFICE_USE_UNO:
+            _convert_uno(w, src, fmt, out, timeout)
+        else:
+            _convert_cli(w, src, fmt, outdir, timeout)
+    except BaseException:
+        # 含全文索引的 SIGALRM 超时：状态不明的工作进程一律杀掉，下次使用时重启
+        _kill(w)
+        STATS["failed"] += 1
+        observe_tool("libreoffice", time.perf_counter() - t0, "timeout" if STATS["timeouts"] != timeouts else "error")
+        raise
+    finally:
+        _POOL["idle"].put(w)
+    if not os.path.exists(out):
+        STATS["failed"] += 1
+        observe_tool("libreoffice", time.perf_counter() - t0, "fail")
+        raise RuntimeError("LibreOffice 转换无输出")
+    STATS["converted"] += 1
+    observe_tool("libreoffice", time.perf_counter() - t0, "ok")
+    return out
+
+
+def shutdown():
+    if _POOL["pid"] != os.getpid():
+        return
+    for w in _POOL["workers"]:
+        _kill(w)
+        shutil.rmtree(w["profile"], ignore_errors=True)
+
+
+def pool_stats():
+    out = dict(STATS)
+    out["mode"] = "uno" if OFFICE_USE_UNO else "cli"
+    out["workers"] = len(_POOL["workers"]) if _POOL["pid"] == os.getpid() else 0
+    out["busy"] = out["workers"] - _POOL["idle"].qsize() if out["workers"] else 0
+    return out
+
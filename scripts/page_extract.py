@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""扫描件友好的逐页文本抽取：PDF / 多页 TIFF 拆页并行处理，输出以 \\f 分隔页面。
+
+PDF 每页先用 pdftotext 取文本层，文本过少（扫描页）时才栅格化（pdftoppm）后交给 tesseract 识别；
+多页 TIFF 逐帧识别（需要 Pillow，缺失时整文件交给 tesseract）。
+各页的工作都在外部进程中完成，这里用线程池并发驱动，页数多时可占满全部 CPU；
+每个 tesseract 限制为单线程，避免与页级并发叠加造成过量订阅。
+"""
+import os
+import re
+import shutil
+import tempfile
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import run_tool
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PAGE_WORKERS = int(os.environ.get("TUANKB_PAGE_WORKERS", str(os.cpu_count() or 2)))
+PDF_PAGE_TIMEOUT = 20
+OCR_PAGE_TIMEOUT = 90
+OCR_DPI = 300
+OCR_LANG = "chi_sim+eng"
+# 文本层少于该字符数（不含空白）的页按扫描页处理
+OCR_MIN_CHARS = 10
+
+_OCR_ENV = dict(os.environ, OMP_THREAD_LIMIT="1")
+_POOL = {"ex": None}
+
+
+def _executor():
+    if _POOL["ex"] is None:
+        _POOL["ex"] = ThreadPoolExecutor(max_workers=max(1, PAGE_WORKERS), thread_name_prefix="tuankb-page")
+    return _POOL["ex"]
+
+
+def _map_pages(fn, items, workers: int = None):
+    """按顺序返回 fn(item) 的结果；同一文件同时在处理的页不超过 workers（默认 PAGE_WORKERS，另受共享线程池大小限制）。"""
+    limit = workers or PAGE_WORKERS
+    if limit <= 1 or len(items) <= 1:
+        return [fn(x) for x in items]
+    ex = _executor()
+    out, window = [], deque()
+    for x in items:
+        if len(window) >= limit:
+            out.append(window.popleft().result())
+        window.append(ex.submit(fn, x))
+    out.extend(f.result() for f in window)
+    return out
+
+
+def _run(cmd, timeout: int, env=None) -> str:
+    p = run_tool(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout, env=env)
+    return p.stdout if p.returncode == 0 else ""
+
+
+def pdf_page_count(path: str) -> int:
+    try:
+        out = _run(["pdfinfo", path], timeout=PDF_PAGE_TIMEOUT)
+    except (subprocess.TimeoutExpired, OSError):
+        return 0
+    m = re.search(r"^Pages:\s+(\d+)", out, re.M)
+    return int(m.group(1)) if m else 0
+
+
+def ocr_image(path: str) -> str:
+    return _run(["tesseract", path, "stdout", "-l", OCR_LANG], timeout=OCR_PAGE_TIMEOUT, env=_OCR_ENV).rstrip("\f")
+
+
+def _pdf_page(path: str, n: int) -> str:
+    try:
+        text = _run(["pdftotext", "-layout", "-f", str(n), "-l", str(n), path, "-"], timeout=PDF_PAGE_TIMEOUT).rstrip("\f")
+    except (subprocess.TimeoutExpired, OSError):
+        text = ""
+    if len(re.sub(r"\s+", "", text)) >= OCR_MIN_CHARS:
+        return text
+    tmp = tempfile.mkdtemp(prefix="tuankb-ocr-")
+    try:
+        _run(["pdftoppm", "-f", str(n), "-l", str(n), "-r", str(OCR_DPI), "-gray", "-png", "-singlefile", path, os.path.join(tmp, "p")], timeout=OCR_PAGE_TIMEOUT)
+        png = os.path.join(tmp, "p.png")
+        ocr = ocr_image(png) if os.path.exists(png) else ""
+        return ocr if ocr.strip() else text
+    except (subprocess.TimeoutExpired, OSError):
+        return text
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def extract_pdf_pages(path: str, workers: int = None) -> str:
+    """逐页抽取 PDF，页间以 \\f 分隔；workers 为本文件同时处理的页数上限。取不到页数（pdfinfo 不可用/文件损坏）时返回空串。"""
+    pages = pdf_page_count(path)
+    if pages <= 0:
+        return ""
+    return "\f".join(_map_pages(lambda n: _pdf_page(path, n), list(range(1, pages + 1)), workers))
+
+
+def extract_tiff_pages(path: str, workers: int = None) -> str:
+    """多页 TIFF 逐帧 OCR，页间以 \\f 分隔；workers 同 extract_pdf_pages。单帧或缺少 Pillow 时整文件识别。"""
+    frames = 1
+    if Image is not None:
+        try:
+            with Image.open(path) as im:
+                frames = getattr(im, "n_frames", 1)
+        except Exception:
+            frames = 1
+    if frames <= 1:
+        # tesseract 对多页 TIFF 本身也以 \f 分隔各页
+        return ocr_image(path)
+    tmp = tempfile.mkdtemp(prefix="tuankb-ocr-")
+    try:
+        files = []
+        with Image.open(path) as im:
+            for i in range(frames):
+                im.seek(i)
+                fn = os.path.join(tmp, f"p{i + 1}.png")
+                im.save(fn)
+                files.append(fn)
+        return "\f".join(_map_pages(ocr_image, files, workers))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""静态 JSON 预压缩与条件请求：构建时写出 .gz（可选 .br/.zst），服务端按内容哈希生成 ETag。
+
+压缩版本以原文 SHA-256 前 16 位命名（如 kb.json.<sha16>.gz），服务端只采用与当前原文哈希一致的版本，
+原文与压缩版本不在同一时刻替换、或构建中途退出时也不会配错。
+brotli / zstandard 为可选依赖，未安装时只生成 gzip。服务端按文件 mtime 缓存原文与各压缩版本，
+请求时只做编码协商与 304 判断，不再逐请求压缩。
+"""
+import os
+import re
+import gzip
+import hashlib
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# (Content-Encoding, 文件后缀, 压缩函数)，顺序即协商优先级
+ENCODINGS = []
+if brotli is not None:
+    ENCODINGS.append(("br", ".br", lambda b: brotli.compress(b, quality=11)))
+if zstandard is not None:
+    ENCODINGS.append(("zstd", ".zst", lambda b: zstandard.ZstdCompressor(level=19).compress(b)))
+ENCODINGS.append(("gzip", ".gz", lambda b: gzip.compress(b, compresslevel=9, mtime=0)))
+_ALL_SUFFIXES = (".br", ".zst", ".gz")
+_VARIANT_RE = re.compile(r"\.([0-9a-f]{16})(\.br|\.zst|\.gz)$")
+
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def content_tag(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def variant_path(path: str, tag: str, suffix: str) -> str:
+    return f"{path}.{tag}{suffix}"
+
+
+def _current_tag(path: str) -> str:
+    try:
+        with open(path, "rb") as f:
+            return content_tag(f.read())
+    except OSError:
+        return ""
+
+
+def write_precompressed(path: str, raw: bytes):
+    """在 path 旁写出 raw 的各压缩版本（应在替换 path 之前调用）。
+
+    保留与 path 当前内容对应的上一版，供替换前的请求继续使用；更早的版本与旧式无哈希文件名一并删除。
+    """
+    tag = content_tag(raw)
+    for _, suffix, fn in ENCODINGS:
+        _atomic_write(variant_path(path, tag, suffix), fn(raw))
+    keep = {tag, _current_tag(path)}
+    folder, base = os.path.split(path)
+    for name in os.listdir(folder or "."):
+        if not name.startswith(base + "."):
+            continue
+        m = _VARIANT_RE.fullmatch(name[len(base):])
+        if (m and m.group(1) not in keep) or name[len(base):] in _ALL_SUFFIXES:
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
+
+
+def load_precompressed(path: str) -> dict:
+    """返回 {"raw", "etag", "last_modified", "mtime", "variants": {encoding: bytes}}，按 mtime 缓存。
+
+    只采用文件名中的哈希与原文一致的压缩版本；没有 gzip 版本（旧构建/手工修改）时在内存中补做一次。
+    """
+    st = os.stat(path)
+    ent = _CACHE.get(path)
+    if ent is not None and ent["mtime"] == st.st_mtime_ns and ent["size"] == st.st_size:
+        return ent
+    with _LOCK:
+        ent = _CACHE.get(path)
+        if ent is not None and ent["mtime"] == st.st_mtime_ns and ent["size"] == st.st_size:
+            return ent
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        variants = {}
+        for enc, suffix in (("br", ".br"), ("zstd", ".zst"), ("gzip", ".gz")):
+            try:
+                with open(variant_path(path, digest[:16], suffix), "rb") as f:
+                    variants[enc] = f.read()
+            except OSError:
+                pass
+        if "gzip" not in variants:
+            variants["gzip"] = gzip.compress(raw, compresslevel=6, mtime=0)
+        ent = {
+            "mtime": st.st_mtime_ns,
+            "size": st.st_size,
+            "raw": raw,
+            "etag": digest[:20],
+            "last_modified": formatdate(st.st_mtime, usegmt=True),
+            "variants": variants,
+        }
+        _CACHE[path] = ent
+        return ent
+
+
+def pick_encoding(accept_encoding: str, variants: dict) -> str:
+    """按 ENCODINGS 优先级选出客户端接受（q>0）且已有的压缩版本，没有则返回空串。"""
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(","):
+        token, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                pass
+        accepted.add(token.strip())
+    for enc in ("br", "zstd", "gzip"):
+        if enc in variants and (enc in accepted or "*" in accepted):
+            return enc
+    return ""
+
+
+def entity_tag(ent: dict, encoding: str = "") -> str:
+    # 不同编码是不同的表示，ETag 带编码后缀；比较时只看内容哈希部分
+    return f'"{ent["etag"]}-{encoding}"' if encoding else f'"{ent["etag"]}"'
+
+
+def not_modified(ent: dict, if_none_match: str, if_modified_since: str) -> bool:
+    if if_none_match:
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag.strip('"').split("-", 1)[0] == ent["etag"]:
+                return True
+        return False
+    if if_modified_since:
+        try:
+            return int(parsedate_to_datetime(if_modified_since).timestamp()) >= int(ent["mtime"] // 1_000_000_000)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def precompressed_response(ent: dict, req_headers, ctype: str):
+    """按 Accept-Encoding 与条件请求头决定响应，返回 (状态码, [(头, 值)], 正文)。"""
+    enc = pick_encoding(req_headers.get("Accept-Encoding", ""), ent["variants"])
+    headers = [("ETag", entity_tag(ent, enc)), ("Cache-Control", "public, max-age=120"), ("Vary", "Accept-Encoding")]
+    if not_modified(ent, req_headers.get("If-None-Match", ""), req_headers.get("If-Modified-Since", "")):
+        return 304, headers, b""
+    body = ent["variants"][enc] if enc else ent["raw"]
+    headers = [("Content-Type", ctype)] + ([("Content-Encoding", enc)] if enc else []) + headers + [
+        ("Last-Modified", ent["last_modified"]),
+        ("Content-Length", str(len(body))),
+    ]
+    return 200, headers, body
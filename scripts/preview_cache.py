@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Office 文档在线预览：首次请求时经 LibreOffice 进程池转为 PDF，结果按 (path, size, mtime) 缓存到磁盘。
+
+同一文档的并发请求只触发一次转换（single-flight），其余请求等待该次结果；
+缓存总大小超过上限时按最近访问时间（文件 mtime）淘汰。夜间构建后可用 prewarm 预先转换各分类最新文档。
+"""
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+import office_pool
+
+BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREVIEW_DIR = os.path.join(BASE, "data", "preview_cache")
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get("TUANKB_PREVIEW_CACHE_MB", "1024")) * 1024 * 1024
+PREVIEW_TIMEOUT = int(os.environ.get("TUANKB_PREVIEW_TIMEOUT", "120"))
+# 转换失败的文档在该时长（秒）内不再重试，避免损坏文件被反复提交给 LibreOffice
+PREVIEW_FAIL_TTL = 600
+PREVIEW_EXT = {".doc", ".docx", ".ppt", ".pptx", ".xls", ".xlsx", ".wps"}
+
+_LOCK = threading.Lock()
+# key -> {"event", "path", "error"}：正在进行的转换，后到的请求等待同一结果
+_INFLIGHT = {}
+# key -> 失败时间
+_FAILED = {}
+_STATE = {"size": None}
+STATS = {"hit": 0, "miss": 0, "coalesced": 0, "failed": 0, "evicted": 0}
+
+
+def preview_key(path: str, size: int, mtime_ns: int) -> str:
+    return hashlib.sha1(f"{path}|{size}|{mtime_ns}".encode("utf-8")).hexdigest()
+
+
+def _dir_size() -> int:
+    total = 0
+    try:
+        with os.scandir(PREVIEW_DIR) as it:
+            for e in it:
+                if e.is_file() and e.name.endswith(".pdf"):
+                    total += e.stat().st_size
+    except OSError:
+        pass
+    return total
+
+
+def _evict(keep: str):
+    entries = []
+    with os.scandir(PREVIEW_DIR) as it:
+        for e in it:
+            if e.is_file() and e.name.endswith(".pdf") and e.name != keep:
+                st = e.stat()
+                entries.append((st.st_mtime, e.name, st.st_size))
+    entries.sort()
+    for _, name, size in entries:
+        if _STATE["size"] <= PREVIEW_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(os.path.join(PREVIEW_DIR, name))
+        except OSError:
+            continue
+        _STATE["size"] -= size
+        STATS["evicted"] += 1
+
+
+def _convert(src: str, dst: str):
+    tmp = tempfile.mkdtemp(prefix="tuankb-preview-")
+    try:
+        out = office_pool.convert(src, "pdf", tmp, timeout=PREVIEW_TIMEOUT)
+        if os.path.getsize(out) == 0:
+            raise RuntimeError("预览转换结果为空")
+        os.makedirs(PREVIEW_DIR, exist_ok=True)
+        # 先移入缓存目录再原子改名（临时目录可能在另一文件系统上），读者不会看到写了一半的文件
+        part = f"{dst}.{os.getpid()}.tmp"
+        shutil.move(out, part)
+        os.replace(part, dst)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    with _LOCK:
+        if _STATE["size"] is None:
+            _STATE["size"] = _dir_size()
+        else:
+            _STATE["size"] += os.path.getsize(dst)
+        if _STATE["size"] > PREVIEW_CACHE_MAX_BYTES:
+            _evict(keep=os.path.basename(dst))
+
+
+def preview_pdf(path: str) -> str:
+    """返回 path 对应的预览 PDF 路径（必要时转换）；转换失败抛出异常。"""
+    st = os.stat(path)
+    key = preview_key(path, st.st_size, st.st_mtime_ns)
+    dst = os.path.join(PREVIEW_DIR, key + ".pdf")
+    with _LOCK:
+        if os.path.exists(dst):
+            STATS["hit"] += 1
+            try:
+                # 命中即刷新 mtime，淘汰时按 mtime 排序实现 LRU
+                os.utime(dst, None)
+            except OSError:
+                pass
+            return dst
+        failed_at = _FAILED.get(key)
+        if failed_at is not None and time.time() - failed_at < PREVIEW_FAIL_TTL:
+            raise RuntimeError("预览转换近期失败，暂不重试")
+        flight = _INFLIGHT.get(key)
+        leader = flight is None
+        if leader:
+            flight = _INFLIGHT[key] = {"event": threading.Event(), "path": None, "error": None}
+            STATS["miss"] += 1
+        else:
+            STATS["coalesced"] += 1
+
+    if not leader:
+        if not flight["event"].wait(PREVIEW_TIMEOUT + 30):
+            raise TimeoutError("预览转换超时")
+        if flight["error"] is not None:
+            raise flight["error"]
+        return flight["path"]
+
+    try:
+        _convert(path, dst)
+        flight["path"] = dst
+        return dst
+    except Exception as e:
+        STATS["failed"] += 1
+        flight["error"] = e
+        with _LOCK:
+            _FAILED[key] = time.time()
+        raise
+    finally:
+        with _LOCK:
+            _INFLIGHT.pop(key, None)
+        flight["event"].set()
+
+
+def prewarm(by_category: dict, per_category: int):
+    """为每个分类最新的 per_category 个可预览文档预先生成 PDF（by_category 中文档已按更新时间倒序）。"""
+    done = failed = 0
+    for docs in by_category.values():
+        picked = [d for d in docs if d.get("ext") in PREVIEW_EXT][:per_category]
+        for d in picked:
+            try:
+                preview_pdf(d["file_path"])
+                done += 1
+            except Exception:
+                failed += 1
+    return {"prewarmed": done, "failed": failed}
+
+
+def cache_stats():
+    with _LOCK:
+        if _STATE["size"] is None:
+            _STATE["size"] = _dir_size()
+        out = dict(STATS)
+        out["bytes"] = _STATE["size"]
+        out["max_bytes"] = PREVIEW_CACHE_MAX_BYTES
+        out["inflight"] = len(_INFLIGHT)
+    return out
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""招标文件分析 PDF 报告：按 (文件名, 分析结果, 模板版本) 的哈希命名，已生成的报告直接复用。
+
+报告先写临时文件再原子改名，同一报告的并发请求只渲染一次（single-flight）。
+ReportLab 渲染为纯 Python 计算、长时间持有 GIL，因此放在独立的渲染进程池（TUANKB_REPORT_WORKERS，默认 1）中执行，
+不与检索等请求线程争抢；设为 0 时在调用线程内渲染。字体注册与段落/表格样式在每个渲染进程内只构建一次。
+"""
+import os
+import json
+import hashlib
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from bid_analysis import risk_hints
+
+# 报告版式变化（栏目、样式、文字）时递增，旧报告不再复用
+TEMPLATE_VERSION = 1
+REPORT_WORKERS = int(os.environ.get("TUANKB_REPORT_WORKERS", "1"))
+# 单份报告渲染超时（秒），超时的请求报错，渲染进程继续完成后报告仍可复用
+REPORT_TIMEOUT = int(os.environ.get("TUANKB_REPORT_TIMEOUT", "120"))
+
+_LOCK = threading.Lock()
+# 报告路径 -> Future：正在渲染的报告，后到的请求等待同一结果
+_INFLIGHT = {}
+_STATE = {"pool": None, "styles": None}
+STATS = {"hit": 0, "miss": 0, "coalesced": 0, "failed": 0}
+
+
+def _pick_cn_font():
+    candidates = [
+        "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+        "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    ]
+    for p in candidates:
+        if os.path.exists(p):
+            return p
+    return None
+
+
+def _register_font() -> str:
+    cn_font = _pick_cn_font()
+    if cn_font:
+        try:
+            pdfmetrics.registerFont(TTFont("TuanCN", cn_font))
+            return "TuanCN"
+        except Exception:
+            pass
+    # 兜底：使用 ReportLab 内置中文 CID 字体（避免中文乱码）
+    try:
+        pdfmetrics.registerFont(UnicodeCIDFont("STSong-Light"))
+        return "STSong-Light"
+    except Exception:
+        return "Helvetica"
+
+
+def _styles() -> dict:
+    # 字体与样式在本进程内只构建一次，之后各报告共用（渲染时只读）
+    with _LOCK:
+        if _STATE["styles"] is None:
+            font = _register_font()
+            base = getSampleStyleSheet()
+            _STATE["styles"] = {
+                "font": font,
+                "title": ParagraphStyle("t", parent=base["Title"], fontName=font, fontSize=16),
+                "h1": ParagraphStyle("h1", parent=base["Heading2"], fontName=font, fontSize=13, leading=16),
+                "h2": ParagraphStyle("h2", parent=base["Heading3"], fontName=font, fontSize=11, leading=14),
+                "n": ParagraphStyle("n", parent=base["Normal"], fontName=font, fontSize=9.2, leading=12.5),
+                "table": TableStyle([
+                    ("FONTNAME", (0, 0), (-1, -1), font),
+                    ("FONTSIZE", (0, 0), (-1, -1), 9),
+                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#dbe5f1")),
+                    ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#999999")),
+                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+                    ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f7f9fc")]),
+                    ("LEFTPADDING", (0, 0), (-1, -1), 6),
+                    ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+                    ("TOPPADDING", (0, 0), (-1, -1), 4),
+                    ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+                ]),
+            }
+        return _STATE["styles"]
+
+
+def report_key(file_name: str, analysis: dict) -> str:
+    # 分析结果按原有键顺序序列化（顺序决定报告中各栏目的排列）
+    raw = json.dumps([TEMPLATE_VERSION, file_name, analysis], ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _render(out: str, file_name: str, analysis: dict, report_no: str):
+    """渲染到 out 的临时文件后原子改名（在渲染进程或调用线程中执行）。"""
+    st = _styles()
+    font, n_style, h1 = st["font"], st["n"], st["h1"]
+    generated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    part = f"{out}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    story = [
+        Paragraph("《招标文件分析报告》", st["title"]),
+        Spacer(1, 6),
+        Paragraph("1️⃣ 项目基本信息", h1),
+        Paragraph(f"文件名称：{file_name}<br/>生成时间：{generated}<br/>报告编号：{report_no}", n_style),
+        Spacer(1, 8),
+    ]
+
+    sections = [
+        ("2️⃣ 供应商要求分析表", analysis.get("供应商分析", {})),
+        ("3️⃣ 评分办法拆解表", analysis.get("评分分析", {})),
+        ("5️⃣ 标书编制目录建议", analysis.get("标书编制分析", {})),
+    ]
+
+    for sec_title, sec_data in sections:
+        story.append(Paragraph(sec_title, h1))
+        data = [["分析项", "分析内容（可逐条核查）", "建议响应内容", "页码"]]
+        for lvl2, items in (sec_data or {}).items():
+            rows = items if isinstance(items, list) else [{"point": str(items), "suggestion": "", "page": "-"}]
+            for idx, it in enumerate(rows):
+                label = str(lvl2) if idx == 0 else ""
+                data.append([
+                    Paragraph(label, n_style),
+                    Paragraph(str(it.get("point", "")).replace("\n", "<br/>"), n_style),
+                    Paragraph(str(it.get("suggestion", "")).replace("\n", "<br/>"), n_style),
+                    Paragraph(str(it.get("page", "-")), n_style),
+                ])
+
+        t = Table(data, colWidths=[110, 220, 165, 25], repeatRows=1)
+        t.setStyle(st["table"])
+        story.append(t)
+        story.append(Spacer(1, 10))
+
+    story.append(Paragraph("4️⃣ 废标条款清单", h1))
+    fb = analysis.get("供应商分析", {}).get("废标条款分析", [])
+    if isinstance(fb, list) and fb:
+        for it in fb:
+            story.append(Paragraph(f"- {it.get('point','')}（页码：{it.get('page','-')}）", n_style))
+    else:
+        story.append(Paragraph("未识别到明显废标条款。", n_style))
+    story.append(Spacer(1, 10))
+
+    story.append(Paragraph("6️⃣ 风险提示", h1))
+    for r in risk_hints(analysis):
+        story.append(Paragraph(f"- {r}", n_style))
+
+    def _decorate(canv, _doc):
+        canv.saveState()
+        canv.setFont(font, 9)
+        canv.drawString(24, A4[1]-20, "图安标书分析系统")
+        canv.drawString(24, 14, f"生成时间：{generated}  报告编号：{report_no}")
+        canv.drawRightString(A4[0]-24, 14, f"第 {canv.getPageNumber()} 页")
+        canv.restoreState()
+
+    try:
+        doc = SimpleDocTemplate(part, pagesize=A4, leftMargin=24, rightMargin=24, topMargin=36, bottomMargin=28)
+        doc.build(story, onFirstPage=_decorate, onLaterPages=_decorate)
+        os.replace(part, out)
+    except BaseException:
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+        raise
+    return out
+
+
+def _pool():
+    # spawn 启动渲染进程：服务进程有多个线程，fork 后子进程可能继承被占用的锁
+    with _LOCK:
+        if _STATE["pool"] is None and REPORT_WORKERS > 0:
+            _STATE["pool"] = ProcessPoolExecutor(max_workers=REPORT_WORKERS,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return _STATE["pool"]
+
+
+def _submit(out: str, file_name: str, analysis: dict, report_no: str):
+    pool = _pool()
+    if pool is None:
+        return _render(out, file_name, analysis, report_no)
+    try:
+        fut = pool.submit(_render, out, file_name, analysis, report_no)
+    except (BrokenProcessPool, RuntimeError):
+        # 渲染进程异常退出后进程池不可再用，换新的进程池重试一次
+        with _LOCK:
+            if _STATE["pool"] is pool:
+                _STATE["pool"] = None
+        pool.shutdown(wait=False)
+        fut = _pool().submit(_render, out, file_name, analysis, report_no)
+    return fut.result(timeout=REPORT_TIMEOUT)
+
+
+def render_report(report_dir: str, file_name: str, analysis: dict) -> str:
+    """返回分析报告 PDF 路径：同一 (文件名, 分析结果, 模板版本) 的报告已存在时直接复用，否则渲染；失败抛出异常。"""
+    key = report_key(file_name, analysis)
+    out = os.path.join(report_dir, f"bid-analysis-{key[:24]}.pdf")
+    with _LOCK:
+        if os.path.exists(out):
+            STATS["hit"] += 1
+            return out
+        flight = _INFLIGHT.get(out)
+        leader = flight is None
+        if leader:
+            flight = _INFLIGHT[out] = {"event": threading.Event(), "error": None}
+            STATS["miss"] += 1
+        else:
+            STATS["coalesced"] += 1
+
+    if not leader:
+        if not flight["event"].wait(REPORT_TIMEOUT + 30):
+            raise TimeoutError("报告生成超时")
+        if flight["error"] is not None:
+            raise flight["error"]
+        return out
+
+    try:
+        os.makedirs(report_dir, exist_ok=True)
+        return _submit(out, file_name, analysis, key[:12])
+    except Exception as e:
+        flight["error"] = e
+        with _LOCK:
+            STATS["failed"] += 1
+        raise
+    finally:
+        with _LOCK:
+            _INFLIGHT.pop(out, None)
+        flight["event"].set()
+
+
+def report_stats():
+    with _LOCK:
+        out = dict(STATS)
+        out["inflight"] = len(_INFLIGHT)
+        out["workers"] = REPORT_WORKERS
+    return out
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""检索结果缓存：规范化查询 → 排好序的结果，按知识库代号（generation）区分，进程内 LRU。
+
+规范化只做 lower().strip()（与 search_index.search 的处理一致），不改变结果；
+kb.json 换代后旧代条目由 retain() 清除。同一查询的并发未命中只计算一次，其余请求等待该次结果。
+查询次数记入 search_history.json，新一代快照切换前按历史次数预热前 N 个查询。
+"""
+import os
+import json
+import threading
+from collections import OrderedDict
+
+BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FILE = os.path.join(BASE, "data", "search_history.json")
+# 缓存条目数上限（0 为不缓存）
+SEARCH_CACHE_SIZE = int(os.environ.get("TUANKB_SEARCH_CACHE", "2048"))
+# 换代时按历史次数预热的查询数
+SEARCH_PREWARM = int(os.environ.get("TUANKB_SEARCH_PREWARM", "50"))
+# 历史查询最多保留的条数，超出时只留次数最多的一半
+HISTORY_MAX = 5000
+
+_LOCK = threading.Lock()
+# (kind, generation, 规范化查询, k) -> 结果
+_CACHE = OrderedDict()
+# key -> {"event", "value", "error"}：正在计算的查询，后到的请求等待同一结果
+_INFLIGHT = {}
+_HISTORY = {"counts": None, "dirty": False}
+STATS = {"hit": 0, "miss": 0, "coalesced": 0, "evicted": 0, "prewarmed": 0}
+
+
+def normalize_query(q: str) -> str:
+    return q.lower().strip()
+
+
+def cached(kind: str, generation: str, q: str, k: int, compute, count: bool = True):
+    """返回 compute() 的结果，按 (kind, generation, 规范化 q, k) 缓存；compute 抛出的异常不缓存。
+
+    count=False 时不计入命中统计（预热用）。
+    """
+    if SEARCH_CACHE_SIZE <= 0:
+        return compute()
+    key = (kind, generation, normalize_query(q), k)
+    with _LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            if count:
+                STATS["hit"] += 1
+            return _CACHE[key]
+        flight = _INFLIGHT.get(key)
+        leader = flight is None
+        if leader:
+            flight = _INFLIGHT[key] = {"event": threading.Event(), "value": None, "error": None}
+        if count:
+            STATS["miss" if leader else "coalesced"] += 1
+
+    if not leader:
+        flight["event"].wait()
+        if flight["error"] is not None:
+            raise flight["error"]
+        return flight["value"]
+
+    try:
+        value = flight["value"] = compute()
+        with _LOCK:
+            _CACHE[key] = value
+            while len(_CACHE) > SEARCH_CACHE_SIZE:
+                _CACHE.popitem(last=False)
+                STATS["evicted"] += 1
+        return value
+    except Exception as e:
+        flight["error"] = e
+        raise
+    finally:
+        with _LOCK:
+            _INFLIGHT.pop(key, None)
+        flight["event"].set()
+
+
+def retain(generation: str):
+    """删除其他代的缓存条目（新快照切换后调用）。"""
+    with _LOCK:
+        for key in [k for k in _CACHE if k[1] != generation]:
+            del _CACHE[key]
+
+
+def _counts():
+    # 调用方持有 _LOCK
+    if _HISTORY["counts"] is None:
+        try:
+            with open(HISTORY_FILE, "r", encoding="utf-8") as f:
+                _HISTORY["counts"] = {str(q): int(n) for q, n in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            _HISTORY["counts"] = {}
+    return _HISTORY["counts"]
+
+
+def record_query(q: str):
+    q = normalize_query(q)
+    if not q:
+        return
+    with _LOCK:
+        counts = _counts()
+        counts[q] = counts.get(q, 0) + 1
+        _HISTORY["dirty"] = True
+        if len(counts) > HISTORY_MAX:
+            keep = sorted(counts.items(), key=lambda x: -x[1])[:HISTORY_MAX // 2]
+            _HISTORY["counts"] = dict(keep)
+
+
+def top_queries(n: int):
+    with _LOCK:
+        return [q for q, _ in sorted(_counts().items(), key=lambda x: (-x[1], x[0]))[:n]]
+
+
+def save_history():
+    """历史查询次数写回 search_history.json（有变化时）。"""
+    with _LOCK:
+        if not _HISTORY["dirty"]:
+            return
+        raw = json.dumps(_counts(), ensure_ascii=False, separators=(",", ":"))
+        _HISTORY["dirty"] = False
+    try:
+        os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+        tmp = f"{HISTORY_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(raw)
+        os.replace(tmp, HISTORY_FILE)
+    except OSError:
+        with _LOCK:
+            _HISTORY["dirty"] = True
+
+
+def prewarm(run, n: int = None):
+    """对历史次数最多的 n 个查询调用 run(q)（run 经 cached(..., count=False) 写入缓存），返回预热的查询数。"""
+    done = 0
+    for q in top_queries(SEARCH_PREWARM if n is None else n):
+        try:
+            run(q)
+            done += 1
+        except Exception:
+            continue
+    with _LOCK:
+        STATS["prewarmed"] += done
+    return done
+
+
+def cache_stats():
+    with _LOCK:
+        out = dict(STATS)
+        out["entries"] = len(_CACHE)
+        out["max_entries"] = SEARCH_CACHE_SIZE
+        out["inflight"] = len(_INFLIGHT)
+        out["history"] = len(_counts())
+    total = out["hit"] + out["coalesced"] + out["miss"]
+    out["hit_ratio"] = (out["hit"] + out["coalesced"]) / total if total else 0.0
+    return out
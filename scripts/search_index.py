@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""知识库检索：打分规则与构建期倒排索引（build_index.py 生成，server.py 查询共用）。
+
+倒排词项：中文连续片段取二元组（单字片段取单字），ASCII 取 [a-z0-9]+ 连续串。
+查询时先用词项求出候选文档（必然是“子串命中”文档的超集），再对候选逐个
+score_doc 精确打分，因此排序结果与全量线性扫描完全一致。
+"""
+import re
+import array
+import heapq
+from itertools import accumulate
+
+INDEX_VERSION = 1
+SEARCH_FIELDS = ("title", "project_name", "file_path", "category", "industry_type")
+
+_RUN_RE = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]+")
+
+
+def _low(v) -> str:
+    s = str(v)
+    low = s.lower()
+    # 无大写字母（多数中文字段）时复用原字符串，快照中不多占内存
+    return s if low == s else low
+
+
+def search_fields(d: dict):
+    """score_doc 用到的各字段的小写形式 (title, project, path, category, industry) 及排序用的 updated_at，
+    知识库快照中按文档预先计算。"""
+    return (_low(d.get("title", "")), _low(d.get("project_name", "")), _low(d.get("file_path", "")),
+            _low(d.get("category", "")), _low(d.get("industry_type", "")), d.get("updated_at", ""))
+
+
+def query_tokens(q: str):
+    return [t for t in q.replace("_", " ").replace("-", " ").split() if t]
+
+
+def score_fields(q: str, tokens, fields):
+    """q 须已小写并去掉首尾空白，tokens 为 query_tokens(q)。"""
+    title, project, p, category, industry, _ = fields
+    s = 0
+    if q in title:
+        s += 8
+    if q in project:
+        s += 7
+    if q in p:
+        s += 4
+    if q in category:
+        s += 2
+    if q in industry:
+        s += 2
+
+    for t in tokens:
+        if t in title:
+            s += 2
+        if t in project:
+            s += 2
+        if t in p:
+            s += 1
+    return s
+
+
+def score_doc(q: str, d: dict):
+    q = q.lower().strip()
+    if not q:
+        return 0
+    return score_fields(q, query_tokens(q), search_fields(d))
+
+
+def index_terms(text: str):
+    terms = set()
+    for run in _RUN_RE.findall(text.lower()):
+        if run.isascii() or len(run) == 1:
+            terms.add(run)
+        else:
+            terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def doc_terms(d: dict):
+    terms = set()
+    for f in SEARCH_FIELDS:
+        terms |= index_terms(str(d.get(f, "")))
+    return terms
+
+
+def build_search_index(docs):
+    """docs 的下标即文档 id；返回内存索引（postings 为升序 id 数组）。"""
+    postings = {}
+    for i, d in enumerate(docs):
+        for t in doc_terms(d):
+            postings.setdefault(t, []).append(i)
+    postings = {t: array.array("I", ids) for t, ids in postings.items()}
+    return prepare_index({"doc_count": len(docs), "postings": postings})
+
+
+def encode_postings(postings: dict):
+    # 差分编码缩小文件体积
+    enc = {}
+    for t, ids in postings.items():
+        prev = 0
+        out = []
+        for i in ids:
+            out.append(i - prev)
+            prev = i
+        enc[t] = out
+    return enc
+
+
+def decode_postings(enc: dict):
+    # 文档 id 存为 array('I')，比 int 列表省内存（每个 id 4 字节）
+    return {t: array.array("I", accumulate(deltas)) for t, deltas in enc.items()}
+
+
+def dump_search_index(index: dict, kb_generation: str):
+    return {
+        "version": INDEX_VERSION,
+        "kb_generation": kb_generation,
+        "fields": list(SEARCH_FIELDS),
+        "doc_count": index["doc_count"],
+        "postings": encode_postings(index["postings"]),
+    }
+
+
+def load_search_index(raw: dict, kb_generation: str, doc_count: int):
+    if raw.get("version") != INDEX_VERSION or raw.get("fields") != list(SEARCH_FIELDS):
+        return None
+    # 旧索引只记录了 kb.json 的 generated_at（秒级），同一秒内的两次构建无法区分，视为不匹配
+    if not kb_generation or raw.get("kb_generation") != kb_generation or raw.get("doc_count") != doc_count:
+        return None
+    return prepare_index({"doc_count": doc_count, "postings": decode_postings(raw.get("postings", {}))})
+
+
+def prepare_index(index: dict):
+    # 单字/ASCII 子串需要按“包含关系”展开词表，预先按字分好桶
+    ascii_terms = []
+    char_terms = {}
+    for t in index["postings"]:
+        if t.isascii():
+            ascii_terms.append(t)
+        else:
+            for c in set(t):
+                char_terms.setdefault(c, []).append(t)
+    index["ascii_terms"] = ascii_terms
+    index["char_terms"] = char_terms
+    return index
+
+
+def _piece_candidates(index: dict, piece: str):
+    """返回可能包含子串 piece 的文档 id 集合；piece 无可索引字符时返回 None。"""
+    postings = index["postings"]
+    result = None
+    runs = _RUN_RE.findall(piece)
+    if not runs:
+        return None
+    for run in runs:
+        if run.isascii():
+            ids = set()
+            for t in index["ascii_terms"]:
+                if run in t:
+                    ids.update(postings[t])
+            groups = [ids]
+        elif len(run) == 1:
+            ids = set()
+            for t in index["char_terms"].get(run, ()):
+                ids.update(postings[t])
+            groups = [ids]
+        else:
+            groups = [set(postings.get(run[i:i + 2], ())) for i in range(len(run) - 1)]
+        for g in groups:
+            result = g if result is None else (result & g)
+            if not result:
+                return result
+    return result
+
+
+def candidate_ids(index: dict, q: str):
+    """返回候选文档 id 升序列表；无法用索引过滤时返回 None（调用方全量扫描）。"""
+    q = q.lower().strip()
+    pieces = [q] + [t for t in q.replace("_", " ").replace("-", " ").split() if t]
+    cand = set()
+    for piece in pieces:
+        ids = _piece_candidates(index, piece)
+        if ids is None:
+            return None
+        cand |= ids
+    return sorted(cand)
+
+
+def search_ids(docs, index, q: str, k: int = 5, fields=None):
+    """返回 (命中总数, 前 k 个 (score, 文档 id))，排序与全量扫描 + 稳定排序一致。
+
+    fields 为各文档预先计算的 search_fields（下标与 docs 对应），缺省时逐个现算。
+    """
+    ql = q.lower().strip()
+    if not ql:
+        return 0, []
+    tokens = query_tokens(ql)
+    ids = candidate_ids(index, q) if index is not None else None
+    if ids is None:
+        ids = range(len(docs))
+    scored = []
+    for i in ids:
+        f = fields[i] if fields is not None else search_fields(docs[i])
+        s = score_fields(ql, tokens, f)
+        if s > 0:
+            scored.append((s, f[5], i))
+    top = heapq.nlargest(k, scored, key=lambda x: (x[0], x[1]))
+    return len(scored), [(s, i) for s, _, i in top]
+
+
+def search(docs, index, q: str, k: int = 5, fields=None):
+    """返回 (命中总数, 前 k 个 (score, doc))；只对前 k 个取文档，docs 可以是按需解码的紧凑格式。"""
+    count, top = search_ids(docs, index, q, k, fields)
+    return count, [(s, docs[i]) for s, i in top]
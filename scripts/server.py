@@ -1,391 +1,512 @@
 #!/usr/bin/env python3
 from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs, unquote, quote
+from urllib.parse import urlparse, parse_qs, unquote
 import os
-import json
-import gzip
 import re
-import cgi
+import json
 import tempfile
-import subprocess
-import zipfile
 import uuid
 import time
+import queue
+import threading
 from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from search_index import build_search_index, load_search_index, search_ids, search_fields
+from kb_pack import open_pack, PackedDocs, search_fields_packed
+from suggest import build_suggest, open_suggest, suggest
+from text_extract import safe_remove
+from content_index import load_content_index, search_content
+from bid_cache import cached_analysis, cache_stats
+from precompress import load_precompressed, precompressed_response
+from file_send import file_response, send_range
+from report_pdf import render_report, report_stats
+from preview_cache import preview_pdf, PREVIEW_EXT, cache_stats as preview_cache_stats
+from kb_docs import load_shard, query_docs, DEFAULT_PAGE_SIZE
+from multipart import parse_multipart, UploadError
+from task_store import create_task, get_task, update_task, tasks_in_state, expire_tasks
+import metrics
+import office_pool
+import search_cache
 
 BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_FILE = os.path.join(BASE, "data", "kb.json")
+SEARCH_INDEX_FILE = os.path.join(BASE, "data", "kb.search.json")
+PACK_FILE = os.path.join(BASE, "data", "kb.pack")
+SUGGEST_FILE = os.path.join(BASE, "data", "kb.suggest")
+META_FILE = os.path.join(BASE, "data", "kb.meta.json")
+BUILD_STATS_FILE = os.path.join(BASE, "data", "kb.stats.json")
+CONTENT_INDEX_FILE = os.path.join(BASE, "data", "kb.content.json")
+CONTENT_CACHE_DIR = os.path.join(BASE, "data", "content_cache")
+THUMB_DIR = os.path.join(BASE, "data", "thumbs")
 ROOT = "/mnt/tuan"
 HOST = os.environ.get("TUANKB_HOST", "0.0.0.0")
 PORT = int(os.environ.get("TUANKB_PORT", "18893"))
 
-_KB_CACHE = {"mtime": 0, "data": {}}
+# 知识库快照：kb.json 的每一代只加载一次，构建完成后由后台线程整体替换；
+# 请求线程只读取 _KB["snap"] 的引用，快照内容加载完成后不再修改，因此无需加锁
+KB_POLL_SECONDS = float(os.environ.get("TUANKB_KB_POLL", "2"))
+# /api/search 与 /api/dingtalk_search 返回的条数（检索缓存预热使用同一值）
+SEARCH_TOP_K = 5
+# 与 kb.json 同代的 kb.pack 存在时以 mmap 加载紧凑格式（文档按需解码）；设为 0 时始终解析 kb.json
+KB_PACK = os.environ.get("TUANKB_KB_PACK", "1") != "0"
+_EMPTY_KB = {"generation": "", "format": "json", "mtime": None, "size": None, "data": {"documents": []}, "docs": [], "index": None,
+             "fields": [], "by_path": {}, "suggest": None}
+_KB = {"snap": None, "checked": 0.0, "loading": False, "failed": None}
+_KB_LOCK = threading.Lock()
+_CONTENT_CACHE = {"mtime": 0, "index": None}
 REPORT_DIR = os.path.join(BASE, "data", "reports")
-TASKS_FILE = os.path.join(BASE, "data", "bid_tasks.json")
 UPLOAD_DIR = os.path.join(BASE, "data", "uploads")
 os.makedirs(REPORT_DIR, exist_ok=True)
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 STATE_WAIT_FILE = "WAIT_FILE"
 STATE_WAIT_CONFIRM = "WAIT_CONFIRM"
+STATE_QUEUED = "QUEUED"
 STATE_ANALYZING = "ANALYZING"
 STATE_DONE = "DONE"
 STATE_CANCELED = "CANCELED"
 STATE_ERROR = "ERROR"
 
+BID_UPLOAD_EXT = {".doc", ".docx", ".pdf", ".xls", ".xlsx", ".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff"}
+
+# 标书分析后台队列：确认后入队立即返回，由固定数量的工作线程依次执行 抽取→分析→生成报告
+BID_WORKERS = int(os.environ.get("TUANKB_BID_WORKERS", "2"))
+BID_QUEUE_SIZE = int(os.environ.get("TUANKB_BID_QUEUE", "32"))
+STAGE_EXTRACTING = "extracting"
+STAGE_ANALYZING = "analyzing"
+STAGE_RENDERING = "rendering"
+_BID_QUEUE = queue.Queue(maxsize=BID_QUEUE_SIZE)
+# 已结束（及长期未推进）的任务保留天数，过期后连同上传文件一起清理
+TASK_TTL_DAYS = float(os.environ.get("TUANKB_TASK_TTL_DAYS", "30"))
+TASK_CLEANUP_INTERVAL = 3600
+# 允许（重新）上传文件的状态；排队中/分析中的任务不允许替换文件
+_UPLOADABLE_STATES = (STATE_WAIT_FILE, STATE_WAIT_CONFIRM, STATE_DONE, STATE_CANCELED, STATE_ERROR)
+
+
+def _kb_generation(path: str) -> str:
+    # build_index.py 把 generation 写在 kb.json 开头，只读前几百字节即可核对 kb.pack 是否同代
+    with open(path, "rb") as f:
+        m = re.search(rb'"generation":"([^"]*)"', f.read(512))
+    return m.group(1).decode("utf-8") if m else ""
+
+
+def _load_packed():
+    pack = open_pack(PACK_FILE)
+    docs = PackedDocs(pack)
+    data = pack["header"]
+    return {
+        "generation": data.get("generation", ""),
+        "format": "pack",
+        "data": data,
+        "docs": docs,
+        "index": _load_search_index(data, docs),
+        "fields": search_fields_packed(pack),
+        "by_path": docs.by_path,
+        "suggest": _load_suggest(data.get("generation", ""), docs),
+    }
+
 
-def _pick_cn_font():
-    candidates = [
-        "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
-        "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-    ]
-    for p in candidates:
-        if os.path.exists(p):
-            return p
-    return None
+def _load_snapshot():
+    st = os.stat(DATA_FILE)
+    if KB_PACK and os.path.exists(PACK_FILE):
+        try:
+            gen = _kb_generation(DATA_FILE)
+            snap = _load_packed() if gen else None
+            if snap is not None and snap["generation"] == gen:
+                snap.update(mtime=st.st_mtime_ns, size=st.st_size)
+                return snap
+        except (OSError, ValueError, KeyError):
+            # kb.pack 损坏或格式不符时退回 kb.json
+            pass
+    with open(DATA_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    docs = data.get("documents")
+    if docs is None:
+        docs = []
+        for _, arr in (data.get("by_category") or {}).items():
+            docs.extend(arr)
+    return {
+        "generation": data.get("generation") or data.get("generated_at", ""),
+        "format": "json",
+        "mtime": st.st_mtime_ns,
+        "size": st.st_size,
+        "data": data,
+        "docs": docs,
+        "index": _load_search_index(data, docs),
+        "fields": [search_fields(d) for d in docs],
+        "by_path": {d.get("file_path", ""): d for d in docs},
+        "suggest": _load_suggest(data.get("generation", ""), docs),
+    }
 
 
-_FONT_NAME = "Helvetica"
-_CN_FONT = _pick_cn_font()
-if _CN_FONT:
+def _reload_kb():
+    t0 = time.perf_counter()
     try:
-        pdfmetrics.registerFont(TTFont("TuanCN", _CN_FONT))
-        _FONT_NAME = "TuanCN"
+        snap = _load_snapshot()
     except Exception:
-        _CN_FONT = None
+        try:
+            st = os.stat(DATA_FILE)
+            # 同一份损坏文件不反复解析，等下一次构建
+            _KB["failed"] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            _KB["failed"] = None
+        metrics.inc("tuankb_kb_reloads_total", {"outcome": "error"})
+        if _KB["snap"] is None:
+            _KB["snap"] = _EMPTY_KB
+    else:
+        metrics.inc("tuankb_kb_reloads_total", {"outcome": "ok"})
+        metrics.set_gauge("tuankb_kb_reload_seconds", time.perf_counter() - t0)
+        # 切换前按历史查询预热新一代的检索缓存，换代后的首批请求直接命中
+        search_cache.prewarm(lambda q: (search_kb(q, SEARCH_TOP_K, snap, count=False),
+                                        search_kb_content(q, SEARCH_TOP_K, snap, count=False)))
+        _KB["snap"] = snap
+        _KB["failed"] = None
+        search_cache.retain(snap["generation"])
+        search_cache.save_history()
+    finally:
+        _KB["loading"] = False
+
+
+def kb_snapshot():
+    """返回当前知识库快照 dict（generation/format/data/docs/index/fields/by_path），调用方只读。
+
+    首次调用同步加载；之后至多每 TUANKB_KB_POLL 秒检查一次 kb.json，变化时由单个后台线程加载新一代，
+    加载期间请求继续使用旧快照，加载完成后一次赋值切换。
+    """
+    snap = _KB["snap"]
+    if snap is not None and time.monotonic() - _KB["checked"] < KB_POLL_SECONDS:
+        return snap
+    with _KB_LOCK:
+        if _KB["snap"] is None:
+            _KB["checked"] = time.monotonic()
+            _reload_kb()
+            return _KB["snap"]
+        snap = _KB["snap"]
+        if _KB["loading"] or time.monotonic() - _KB["checked"] < KB_POLL_SECONDS:
+            return snap
+        _KB["checked"] = time.monotonic()
+        try:
+            st = os.stat(DATA_FILE)
+        except OSError:
+            return snap
+        key = (st.st_mtime_ns, st.st_size)
+        if key == (snap["mtime"], snap["size"]) or key == _KB["failed"]:
+            return snap
+        _KB["loading"] = True
+    threading.Thread(target=_reload_kb, name="kb-loader", daemon=True).start()
+    return snap
+
+
+def load_kb():
+    return kb_snapshot()["data"]
+
 
-# 兜底：使用 ReportLab 内置中文 CID 字体（避免中文乱码）
-if _FONT_NAME == "Helvetica":
+def _load_suggest(generation: str, docs):
+    # 优先使用构建期生成的前缀索引；与 kb.json 不同代（旧索引/手工修改）时在内存中重建
     try:
-        pdfmetrics.registerFont(UnicodeCIDFont("STSong-Light"))
-        _FONT_NAME = "STSong-Light"
-    except Exception:
+        idx = open_suggest(SUGGEST_FILE)
+        if generation and idx["header"].get("generation") == generation:
+            return idx
+    except (OSError, ValueError):
         pass
+    return open_suggest(build_suggest(docs, generation))
 
 
-def load_kb():
+def _load_search_index(kb: dict, docs: list):
+    # 优先使用构建期生成的倒排索引；与 kb.json 不匹配（旧索引/手工修改）时在内存中重建
     try:
-        mtime = os.path.getmtime(DATA_FILE)
-        if mtime != _KB_CACHE["mtime"]:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                _KB_CACHE["data"] = json.load(f)
-            _KB_CACHE["mtime"] = mtime
-        return _KB_CACHE["data"]
+        with open(SEARCH_INDEX_FILE, "r", encoding="utf-8") as f:
+            idx = load_search_index(json.load(f), kb.get("generation", ""), len(docs))
+        if idx is not None:
+            return idx
     except Exception:
-        return {"documents": []}
+        pass
+    return build_search_index(docs)
+
 
+_META_CACHE = {"mtime": None, "meta": {}}
 
-def _load_tasks():
+
+def load_meta():
+    """读取 kb.meta.json（按 mtime 缓存），缺失或损坏时返回空 dict。"""
     try:
-        with open(TASKS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
+        mtime = os.stat(META_FILE).st_mtime_ns
+        if _META_CACHE["mtime"] != mtime:
+            with open(META_FILE, "r", encoding="utf-8") as f:
+                _META_CACHE["meta"] = json.load(f)
+            _META_CACHE["mtime"] = mtime
+    except (OSError, ValueError):
         return {}
+    return _META_CACHE["meta"]
 
 
-def _save_tasks(tasks: dict):
-    with open(TASKS_FILE, "w", encoding="utf-8") as f:
-        json.dump(tasks, f, ensure_ascii=False, indent=2)
+def _shard_path(category: str):
+    for c in load_meta().get("categories", []):
+        if c.get("name") == category and c.get("shard"):
+            return os.path.join(os.path.dirname(META_FILE), c["shard"])
+    return None
+
+
+def search_kb(q: str, k: int = 5, snap: dict = None, count: bool = True):
+    snap = snap or kb_snapshot()
+    total, top = search_cache.cached("title", snap["generation"], q, k,
+                                     lambda: search_ids(snap["docs"], snap["index"], q, k, snap["fields"]), count)
+    return total, [(s, snap["docs"][i]) for s, i in top]
+
+
+def _load_content():
+    try:
+        mtime = os.path.getmtime(CONTENT_INDEX_FILE)
+        if mtime != _CONTENT_CACHE["mtime"]:
+            with open(CONTENT_INDEX_FILE, "r", encoding="utf-8") as f:
+                _CONTENT_CACHE["index"] = load_content_index(json.load(f))
+            _CONTENT_CACHE["mtime"] = mtime
+        return _CONTENT_CACHE["index"]
+    except Exception:
+        return None
+
+
+def search_kb_content(q: str, k: int = 5, snap: dict = None, count: bool = True):
+    # 全文索引与 kb.json 由同一次构建发布，按 kb 代号缓存
+    snap = snap or kb_snapshot()
+    return search_cache.cached("content", snap["generation"], q, k,
+                               lambda: search_content(_load_content(), CONTENT_CACHE_DIR, q, k, doc_by_path=snap["by_path"]),
+                               count)
 
 
 def _new_task(user_id: str, session_id: str):
     tid = f"bid-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
-    tasks = _load_tasks()
-    tasks[tid] = {
+    return create_task({
         "task_id": tid,
         "user_id": user_id or "",
         "session_id": session_id or "",
         "state": STATE_WAIT_FILE,
-        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "file_path": "",
-        "file_name": "",
-        "file_type": "",
-        "file_summary": "",
-        "pdf_path": "",
-    }
-    _save_tasks(tasks)
-    return tasks[tid]
+    })
 
 
-def _update_task(task_id: str, **kwargs):
-    tasks = _load_tasks()
-    if task_id not in tasks:
-        return None
-    tasks[task_id].update(kwargs)
-    tasks[task_id]["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    _save_tasks(tasks)
-    return tasks[task_id]
+def _analysis_path(task_id: str) -> str:
+    return os.path.join(REPORT_DIR, f"{task_id}.analysis.json")
 
 
-def _safe_remove(path: str):
-    try:
-        if path and os.path.isfile(path):
-            os.remove(path)
-    except Exception:
-        pass
+def _run_bid_task(task_id: str):
+    # 原子地领取任务：已取消/已被处理的任务不再执行
+    t = update_task(task_id, from_states=(STATE_QUEUED, STATE_ANALYZING), state=STATE_ANALYZING, stage="", timings={}, error="")
+    if not t:
+        return
+    timings = {}
+    mark = {"stage": "", "t0": time.time()}
 
+    def enter(stage: str):
+        if stage == mark["stage"]:
+            return
+        now = time.time()
+        if mark["stage"]:
+            timings[mark["stage"]] = round(now - mark["t0"], 3)
+        mark["stage"], mark["t0"] = stage, now
+        update_task(task_id, stage=stage, timings=dict(timings))
 
-def score_doc(q: str, d: dict):
-    q = q.lower().strip()
-    if not q:
-        return 0
-    title = str(d.get("title", "")).lower()
-    project = str(d.get("project_name", "")).lower()
-    category = str(d.get("category", "")).lower()
-    industry = str(d.get("industry_type", "")).lower()
-    p = str(d.get("file_path", "")).lower()
-
-    s = 0
-    if q in title:
-        s += 8
-    if q in project:
-        s += 7
-    if q in p:
-        s += 4
-    if q in category:
-        s += 2
-    if q in industry:
-        s += 2
-
-    tokens = [t for t in q.replace("_", " ").replace("-", " ").split() if t]
-    for t in tokens:
-        if t in title:
-            s += 2
-        if t in project:
-            s += 2
-        if t in p:
-            s += 1
-    return s
-
-
-def _extract_text(path: str) -> str:
-    ext = os.path.splitext(path)[1].lower()
     try:
-        if ext == ".pdf":
-            p = subprocess.run(["pdftotext", "-layout", path, "-"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=40)
-            if p.returncode == 0 and p.stdout.strip():
-                return p.stdout
-        if ext == ".docx":
-            with zipfile.ZipFile(path) as z:
-                xml = z.read("word/document.xml").decode("utf-8", errors="ignore")
-                xml = re.sub(r"</w:p>|</w:tr>|</w:tbl>", "\n", xml)
-                xml = re.sub(r"<w:tab[^>]*>", "\t", xml)
-                xml = re.sub(r"<[^>]+>", " ", xml)
-                return _normalize_text_for_extract(xml)
-        if ext in (".xlsx", ".xls"):
-            p = subprocess.run(["libreoffice", "--headless", "--convert-to", "csv", "--outdir", tempfile.gettempdir(), path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60)
-            out_csv = os.path.join(tempfile.gettempdir(), os.path.splitext(os.path.basename(path))[0] + ".csv")
-            if os.path.exists(out_csv):
-                with open(out_csv, "r", encoding="utf-8", errors="ignore") as f:
-                    txt = f.read()
-                _safe_remove(out_csv)
-                if txt.strip():
-                    return txt
-        if ext in (".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff"):
-            p = subprocess.run(["tesseract", path, "stdout", "-l", "chi_sim+eng"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60)
-            if p.returncode == 0 and p.stdout.strip():
-                return p.stdout
-    except Exception:
-        pass
-
+        enter(STAGE_EXTRACTING)
+        analysis = cached_analysis(t.get("file_path", ""), on_stage=enter)
+        with open(_analysis_path(task_id), "w", encoding="utf-8") as f:
+            json.dump(analysis, f, ensure_ascii=False)
+        enter(STAGE_RENDERING)
+        pdf_path = render_report(REPORT_DIR, t.get("file_name", ""), analysis)
+        timings[STAGE_RENDERING] = round(time.time() - mark["t0"], 3)
+        update_task(task_id, state=STATE_DONE, stage="", timings=timings, pdf_path=pdf_path)
+    except Exception as e:
+        timings[mark["stage"]] = round(time.time() - mark["t0"], 3)
+        update_task(task_id, state=STATE_ERROR, timings=timings, error=str(e) or type(e).__name__)
+
+
+def _bid_worker():
+    while True:
+        task_id = _BID_QUEUE.get()
+        metrics.inc("tuankb_bid_analyzing")
+        try:
+            _run_bid_task(task_id)
+        except Exception:
+            pass
+        finally:
+            metrics.inc("tuankb_bid_analyzing", value=-1)
+            _BID_QUEUE.task_done()
+
+
+def _enqueue_bid_task(task_id: str) -> bool:
     try:
-        p = subprocess.run(["strings", "-n", "4", path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=20)
-        return p.stdout[:250000]
-    except Exception:
-        return ""
-
-
-def _normalize_text_for_extract(text: str) -> str:
-    text = text.replace("\r", "\n")
-    text = re.sub(r"[\t\v]+", " ", text)
-    text = re.sub(r"\u3000", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    return text
-
-
-def _split_pages(text: str):
-    if "\f" in text:
-        pages = [p for p in text.split("\f") if p.strip()]
-        if pages:
-            return pages
-    return [text]
-
-
-def _find_hits(text: str, keywords, max_items=5, max_len=110):
-    pages = _split_pages(text)
-    out = []
-    seen = set()
-    for idx, p in enumerate(pages, 1):
-        for ln in [x.strip() for x in re.split(r"[\r\n]+", p) if x.strip()]:
-            s = ln.lower()
-            if any(k.lower() in s for k in keywords):
-                one = re.sub(r"\s+", " ", ln)[:max_len]
-                key = (one, idx)
-                if key in seen:
-                    continue
-                seen.add(key)
-                out.append({"point": one, "page": idx})
-            if len(out) >= max_items:
-                break
-        if len(out) >= max_items:
-            break
+        _BID_QUEUE.put_nowait(task_id)
+        return True
+    except queue.Full:
+        return False
+
+
+def cleanup_tasks():
+    """删除过期任务及其上传文件、分析结果；生成的 PDF 报告保留。"""
+    expired = expire_tasks((STATE_DONE, STATE_CANCELED, STATE_ERROR, STATE_WAIT_FILE, STATE_WAIT_CONFIRM), TASK_TTL_DAYS)
+    upload_root = os.path.realpath(UPLOAD_DIR) + os.sep
+    for t in expired:
+        if os.path.realpath(t.get("file_path") or "/").startswith(upload_root):
+            safe_remove(t["file_path"])
+        safe_remove(_analysis_path(t["task_id"]))
+    return len(expired)
+
+
+def _task_janitor():
+    while True:
+        try:
+            cleanup_tasks()
+        except Exception:
+            pass
+        # 顺带把检索历史写回磁盘，换代预热依赖它
+        search_cache.save_history()
+        time.sleep(TASK_CLEANUP_INTERVAL)
+
+
+def start_bid_workers():
+    """启动后台分析线程与过期任务清理线程，并把上次进程退出时排队中/分析中的任务重新入队。"""
+    for i in range(max(1, BID_WORKERS)):
+        threading.Thread(target=_bid_worker, name=f"bid-worker-{i}", daemon=True).start()
+    threading.Thread(target=_task_janitor, name="bid-task-janitor", daemon=True).start()
+    for t in tasks_in_state((STATE_QUEUED, STATE_ANALYZING)):
+        ok = os.path.isfile(t.get("file_path", ""))
+        # 先改状态再入队，避免工作线程领取后又被改回 QUEUED
+        if ok and update_task(t["task_id"], from_states=(STATE_QUEUED, STATE_ANALYZING), state=STATE_QUEUED, stage=""):
+            ok = _enqueue_bid_task(t["task_id"])
+        if not ok:
+            update_task(t["task_id"], state=STATE_ERROR, error="服务重启后无法恢复任务")
+
+
+def _task_status(t: dict) -> dict:
+    out = {
+        "ok": True,
+        "task_id": t["task_id"],
+        "state": t.get("state", ""),
+        "stage": t.get("stage", ""),
+        "timings": t.get("timings", {}),
+        "updated_at": t.get("updated_at", ""),
+    }
+    if t.get("state") in (STATE_QUEUED, STATE_ANALYZING):
+        out["reply"] = "正在分析招标文件，请稍候…"
+    elif t.get("state") == STATE_DONE:
+        out["reply"] = "招标文件分析完成，请查收报告"
+        out["pdf_path"] = t.get("pdf_path", "")
+        out["pdf_download_url"] = f"/download?path={t.get('pdf_path', '')}"
+        try:
+            with open(_analysis_path(t["task_id"]), "r", encoding="utf-8") as f:
+                out["analysis"] = json.load(f)
+        except Exception:
+            pass
+    elif t.get("state") == STATE_ERROR:
+        out["reply"] = "文件解析失败，请重新上传标准版招标文件"
+        out["error"] = t.get("error", "")
     return out
 
 
-def _make_rows(text: str, keywords, suggestion: str, max_items=4):
-    hits = _find_hits(text, keywords, max_items=max_items)
-    if not hits:
-        return [{"point": "未明显命中，建议人工复核原文。", "suggestion": suggestion, "page": "-"}]
-    return [{"point": h["point"], "suggestion": suggestion, "page": h["page"]} for h in hits]
+def _hit_ratio(hit: int, total: int) -> float:
+    return hit / total if total else 0.0
 
 
-def _score_rows(text: str, keywords, suggestion: str, max_items=8):
-    hits = _find_hits(text, keywords, max_items=max_items)
-    rows = []
-    for h in hits:
-        m = re.search(r"(\d+(?:\.\d+)?)\s*分", h["point"])
-        score = m.group(1) + "分" if m else "未明确"
-        rows.append({"point": f"{h['point']}（分值：{score}）", "suggestion": suggestion, "page": h["page"]})
-    if not rows:
-        rows = [{"point": "未识别到明确评分条款，按通用结构输出。", "suggestion": suggestion, "page": "-"}]
-    return rows
+def _collect_metrics():
+    """/metrics 抓取时读取的现有统计：知识库、分析队列、各缓存命中、LibreOffice 进程池与最近一次构建。"""
+    kb = _KB["snap"] or _EMPTY_KB
+    out = [
+        ("tuankb_kb_documents", "gauge", "当前加载的知识库文档数", {}, len(kb["docs"])),
+        ("tuankb_kb_generation_info", "gauge", "当前加载的知识库代号", {"generation": kb["generation"], "format": kb["format"]}, 1),
+        ("tuankb_bid_queue_depth", "gauge", "排队中的后台标书分析任务数", {}, _BID_QUEUE.qsize()),
+    ]
+    caches = []
+    bid = cache_stats()
+    caches.append(("bid_text", bid.get("text_hit", 0), bid.get("text_miss", 0)))
+    caches.append(("bid_analysis", bid.get("analysis_hit", 0), bid.get("analysis_miss", 0)))
+    pv = preview_cache_stats()
+    # 等待同一转换结果的请求不触发转换，按命中计
+    caches.append(("preview", pv["hit"] + pv["coalesced"], pv["miss"]))
+    sc = search_cache.cache_stats()
+    caches.append(("search", sc["hit"] + sc["coalesced"], sc["miss"]))
+    rp = report_stats()
+    caches.append(("report", rp["hit"] + rp["coalesced"], rp["miss"]))
+    for name, hit, miss in caches:
+        out.append(("tuankb_cache_requests_total", "counter", "缓存查询次数（按缓存与结果）", {"cache": name, "result": "hit"}, hit))
+        out.append(("tuankb_cache_requests_total", "counter", "缓存查询次数（按缓存与结果）", {"cache": name, "result": "miss"}, miss))
+        out.append(("tuankb_cache_hit_ratio", "gauge", "缓存累计命中率", {"cache": name}, _hit_ratio(hit, hit + miss)))
+    for name, st in (("bid", bid), ("preview", pv)):
+        out.append(("tuankb_cache_bytes", "gauge", "缓存占用字节数", {"cache": name}, st["bytes"]))
+        out.append(("tuankb_cache_evictions_total", "counter", "缓存淘汰条目数", {"cache": name}, st["evicted"]))
+    out.append(("tuankb_cache_entries", "gauge", "缓存条目数", {"cache": "search"}, sc["entries"]))
+    out.append(("tuankb_cache_evictions_total", "counter", "缓存淘汰条目数", {"cache": "search"}, sc["evicted"]))
+    out.append(("tuankb_preview_inflight", "gauge", "进行中的 Office 预览转换数", {}, pv["inflight"]))
+    out.append(("tuankb_report_inflight", "gauge", "进行中的 PDF 报告渲染数", {}, rp["inflight"]))
+    out.append(("tuankb_report_failures_total", "counter", "PDF 报告渲染失败次数", {}, rp["failed"]))
+
+    op = office_pool.pool_stats()
+    out.append(("tuankb_office_workers", "gauge", "LibreOffice 工作进程数", {"state": "total"}, op["workers"]))
+    out.append(("tuankb_office_workers", "gauge", "LibreOffice 工作进程数", {"state": "busy"}, op["busy"]))
+    for k in ("converted", "failed", "timeouts", "restarts"):
+        out.append(("tuankb_office_events_total", "counter", "LibreOffice 转换事件数", {"event": k}, op[k]))
 
+    try:
+        with open(BUILD_STATS_FILE, "r", encoding="utf-8") as f:
+            st = json.load(f)
+        built_at = os.path.getmtime(BUILD_STATS_FILE)
+    except (OSError, ValueError):
+        return out
+    out.append(("tuankb_build_last_timestamp_seconds", "gauge", "最近一次构建完成时间", {}, built_at))
+    out.append(("tuankb_build_seconds", "gauge", "最近一次构建总耗时", {"mode": st.get("mode", "")}, st.get("total_seconds", 0)))
+    for k, v in (st.get("phases") or {}).items():
+        out.append(("tuankb_build_phase_seconds", "gauge", "最近一次构建各阶段耗时", {"phase": k}, v))
+    for k, v in (st.get("files") or {}).items():
+        out.append(("tuankb_build_files", "gauge", "最近一次构建的文件/目录计数", {"kind": k}, v))
+    return out
 
-def _analyze_bid_text(text: str):
-    text = _normalize_text_for_extract(text)
-    return {
-        "供应商分析": {
-            "资质要求": _make_rows(text, ["资质", "资格", "营业执照", "认证", "证书"], "逐条准备资质证明并对应招标条款编号。"),
-            "业绩要求": _make_rows(text, ["业绩", "类似项目", "合同金额", "案例"], "准备对应合同、验收与中标通知书证明链。"),
-            "项目团队分析": _make_rows(text, ["项目经理", "团队", "人员", "工程师", "注册", "职称"], "根据评审办法准备人员证书、社保与任命文件。"),
-            "信誉要求": _make_rows(text, ["信誉", "信用", "不良记录", "处罚", "黑名单"], "提供信用中国、裁判文书等查询截图并加盖公章。"),
-            "废标条款分析": _make_rows(text, ["废标", "否决", "无效投标", "一票否决"], "建立废标条款核查清单，提交前逐项打勾复核。"),
-            "其他要求": _make_rows(text, ["其他要求", "特别说明", "补充"], "将补充条款纳入响应偏离表并逐条响应。"),
-        },
-        "评分分析": {
-            "商务评分": _score_rows(text, ["商务评分", "商务部分", "商务分"], "围绕可得分项准备对应证明材料，避免失分。"),
-            "技术评分": _score_rows(text, ["技术评分", "技术部分", "技术分"], "按评分细则组织技术方案，逐点评分响应。"),
-            "价格评分": _score_rows(text, ["价格评分", "报价得分", "价格分", "评审基准价"], "明确评审基准价公式并反推报价区间。"),
-        },
-        "标书编制分析": {
-            "响应标书文件目录要求": _make_rows(text, ["响应文件组成", "响应文件格式", "投标文件组成", "目录"], "按招标文件目录顺序逐章编排并保持页码连续。"),
-            "商务标书编制分析（商务评分标准）": _make_rows(text, ["商务评分", "商务文件", "资格审查", "承诺函"], "形成商务标材料清单（含承诺函）并一一对应评分点。"),
-            "技术标书编制分析（技术评分标准）": _make_rows(text, ["技术评分", "技术要求", "采购需求", "技术方案"], "围绕采购需求逐条响应，补充图表和里程碑计划。"),
-            "价格部分编制分析": _make_rows(text, ["价格评分", "最低价", "平均价", "评审基准价"], "按评分法测算最优报价区间并给出报价策略。"),
-            "承诺函分析": _make_rows(text, ["承诺函", "声明函", "承诺"], "梳理并统一模板，确保签章、日期、主体一致。"),
-            "其他部分分析": _make_rows(text, ["附件", "补充", "备注"], "将附件与正文建立交叉引用，防止缺页漏项。"),
-        }
-    }
 
+metrics.register_collector(_collect_metrics)
 
-def _risk_hints(analysis: dict):
-    txt = json.dumps(analysis, ensure_ascii=False)
-    risks = []
-    if any(k in txt for k in ["否决", "废标", "无效投标", "一票否决"]):
-        risks.append("存在一票否决/废标相关条款，需重点复核响应完整性。")
-    if any(k in txt for k in ["资质", "资格", "证书"]):
-        risks.append("请核对资质证书有效期与招标文件要求，避免资质缺口。")
-    if any(k in txt for k in ["业绩", "类似项目"]):
-        risks.append("请提前准备可证明业绩材料，防止业绩不足扣分。")
-    risks.append("请检查格式与签章要求，避免格式性风险导致否决。")
-    return risks[:4]
-
-
-def _analysis_to_pdf(file_name: str, analysis: dict, task_id: str = "") -> str:
-    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-    out = os.path.join(REPORT_DIR, f"bid-analysis-{ts}.pdf")
-
-    doc = SimpleDocTemplate(out, pagesize=A4, leftMargin=24, rightMargin=24, topMargin=36, bottomMargin=28)
-    styles = getSampleStyleSheet()
-    font = _FONT_NAME
-    title_style = ParagraphStyle("t", parent=styles["Title"], fontName=font, fontSize=16)
-    h1 = ParagraphStyle("h1", parent=styles["Heading2"], fontName=font, fontSize=13, leading=16)
-    h2 = ParagraphStyle("h2", parent=styles["Heading3"], fontName=font, fontSize=11, leading=14)
-    n_style = ParagraphStyle("n", parent=styles["Normal"], fontName=font, fontSize=9.2, leading=12.5)
-
-    story = [
-        Paragraph("《招标文件分析报告》", title_style),
-        Spacer(1, 6),
-        Paragraph(f"1️⃣ 项目基本信息", h1),
-        Paragraph(f"文件名称：{file_name}<br/>生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}<br/>任务ID：{task_id or '-'}", n_style),
-        Spacer(1, 8),
-    ]
 
-    sections = [
-        ("2️⃣ 供应商要求分析表", analysis.get("供应商分析", {})),
-        ("3️⃣ 评分办法拆解表", analysis.get("评分分析", {})),
-        ("5️⃣ 标书编制目录建议", analysis.get("标书编制分析", {})),
-    ]
+def file_param(u):
+    """/download、/preview 的 path 参数：解析为真实路径，且必须是允许目录下的文件，否则返回 None。"""
+    raw = parse_qs(u.query).get("path", [""])[0]
+    p = os.path.realpath(unquote(raw))
+    allowed_roots = [os.path.realpath(ROOT), os.path.realpath(REPORT_DIR)]
+    if not any(p.startswith(ar) for ar in allowed_roots) or not os.path.isfile(p):
+        return None
+    return p
 
-    for sec_title, sec_data in sections:
-        story.append(Paragraph(sec_title, h1))
-        data = [["分析项", "分析内容（可逐条核查）", "建议响应内容", "页码"]]
-        for lvl2, items in (sec_data or {}).items():
-            rows = items if isinstance(items, list) else [{"point": str(items), "suggestion": "", "page": "-"}]
-            for idx, it in enumerate(rows):
-                label = str(lvl2) if idx == 0 else ""
-                data.append([
-                    Paragraph(label, n_style),
-                    Paragraph(str(it.get("point", "")).replace("\n", "<br/>"), n_style),
-                    Paragraph(str(it.get("suggestion", "")).replace("\n", "<br/>"), n_style),
-                    Paragraph(str(it.get("page", "-")), n_style),
-                ])
-
-        t = Table(data, colWidths=[110, 220, 165, 25], repeatRows=1)
-        t.setStyle(TableStyle([
-            ("FONTNAME", (0, 0), (-1, -1), font),
-            ("FONTSIZE", (0, 0), (-1, -1), 9),
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#dbe5f1")),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#999999")),
-            ("VALIGN", (0, 0), (-1, -1), "TOP"),
-            ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f7f9fc")]),
-            ("LEFTPADDING", (0, 0), (-1, -1), 6),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 6),
-            ("TOPPADDING", (0, 0), (-1, -1), 4),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
-        ]))
-        story.append(t)
-        story.append(Spacer(1, 10))
-
-    story.append(Paragraph("4️⃣ 废标条款清单", h1))
-    fb = analysis.get("供应商分析", {}).get("废标条款分析", [])
-    if isinstance(fb, list) and fb:
-        for it in fb:
-            story.append(Paragraph(f"- {it.get('point','')}（页码：{it.get('page','-')}）", n_style))
-    else:
-        story.append(Paragraph("未识别到明显废标条款。", n_style))
-    story.append(Spacer(1, 10))
-
-    story.append(Paragraph("6️⃣ 风险提示", h1))
-    for r in _risk_hints(analysis):
-        story.append(Paragraph(f"- {r}", n_style))
-
-    def _decorate(canv, _doc):
-        canv.saveState()
-        canv.setFont(font, 9)
-        canv.drawString(24, A4[1]-20, "图安标书分析系统")
-        footer = f"生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  任务ID：{task_id or '-'}"
-        canv.drawString(24, 14, footer)
-        canv.drawRightString(A4[0]-24, 14, f"第 {canv.getPageNumber()} 页")
-        canv.restoreState()
-
-    doc.build(story, onFirstPage=_decorate, onLaterPages=_decorate)
-    return out
+
+def preview_target(path: str, log=None):
+    """返回 /preview 实际发送的 (文件路径, disposition, 文件名)。
+
+    Office 文档转成 PDF 后内嵌预览（可能阻塞在转换上）；转换失败（未安装 LibreOffice 等）时退回下载原文件。
+    其余文件是否真正内嵌由 file_send.file_response 按类型决定（html/svg 等改为附件）。
+    """
+    name = os.path.basename(path)
+    if os.path.splitext(path)[1].lower() not in PREVIEW_EXT:
+        return path, "inline", name
+    try:
+        return preview_pdf(path), "inline", os.path.splitext(name)[0] + ".pdf"
+    except Exception as e:
+        if log:
+            log("preview convert failed: %s: %s", path, e)
+    return path, "attachment", name
 
 
 class Handler(SimpleHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=BASE, **kwargs)
 
+    def handle_one_request(self):
+        # 线程版逐请求记录路由耗时与状态码；asyncio 版在 aio_server 中记录
+        self._status = None
+        t0 = time.perf_counter()
+        metrics.request_started()
+        try:
+            super().handle_one_request()
+        finally:
+            path = urlparse(self.path).path if getattr(self, "path", None) else ""
+            metrics.request_finished(getattr(self, "command", None) or "-", path, self._status, time.perf_counter() - t0)
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
     def _json(self, obj, code=200):
         b = json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
         self.send_response(code)
@@ -394,55 +515,168 @@ class Handler(SimpleHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(b)
 
+    def _parse_upload(self, dest_dir: str):
+        """流式解析上传，返回 (表单字段, file 字段的文件信息)；出错时已回写错误响应并返回 None。"""
+        try:
+            fields, files = parse_multipart(self.rfile, self.headers, dest_dir, allowed_ext=BID_UPLOAD_EXT)
+        except UploadError as e:
+            self._json({"ok": False, "error": str(e)}, code=e.code)
+            return None
+        up = files.pop("file", None)
+        for other in files.values():
+            safe_remove(other["path"])
+        if up is None:
+            self._json({"ok": False, "error": "未检测到上传文件"}, code=400)
+            return None
+        return fields, up
+
+    def _check_uploadable(self, t, task_id: str) -> bool:
+        if not t:
+            self._json({"ok": False, "error": "任务不存在，请先发送：图安：分析标书"}, code=400)
+            return False
+        if t.get("state") not in _UPLOADABLE_STATES:
+            self._json({"ok": False, "task_id": task_id, "state": t["state"], "error": "分析进行中，请等待完成后再上传"}, code=400)
+            return False
+        return True
+
+    def _send_precompressed(self, path: str, ctype: str):
+        code, headers, body = precompressed_response(load_precompressed(path), self.headers, ctype)
+        self.send_response(code)
+        for k, v in headers:
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_file(self, path: str, disposition: str, head: bool = False, filename: str = None):
+        """发送文件：支持单/多区间 206、If-Range、ETag/Last-Modified 条件请求，正文走 sendfile。"""
+        filename = filename or os.path.basename(path)
+        with open(path, "rb") as f:
+            code, headers, body = file_response(self.headers, os.fstat(f.fileno()), filename, disposition)
+            self.send_response(code)
+            for k, v in headers:
+                self.send_header(k, v)
+            self.end_headers()
+            if head:
+                return
+            for part in body:
+                if isinstance(part, bytes):
+                    self.wfile.write(part)
+                else:
+                    send_range(self.connection, self.wfile, f, *part)
+
+    def _send_preview(self, path: str, head: bool = False):
+        send_path, disposition, filename = preview_target(path, self.log_message)
+        self._send_file(send_path, disposition, head=head, filename=filename)
+
+    def do_HEAD(self):
+        u = urlparse(self.path)
+        if u.path in ("/download", "/preview"):
+            p = file_param(u)
+            if p is None:
+                self.send_error(404, "file not found")
+                return
+            if u.path == "/preview":
+                self._send_preview(p, head=True)
+            else:
+                self._send_file(p, "attachment", head=True)
+            return
+        return super().do_HEAD()
+
     def do_GET(self):
         u = urlparse(self.path)
 
-        # 首次打开优化：对 kb.json 开启 gzip + cache
+        # 首次打开优化：kb.json 使用构建期预压缩版本 + ETag/Last-Modified 条件请求
         if u.path == "/data/kb.json":
             try:
-                with open(DATA_FILE, "rb") as f:
-                    raw = f.read()
-                ae = (self.headers.get("Accept-Encoding") or "").lower()
-                if "gzip" in ae:
-                    body = gzip.compress(raw, compresslevel=6)
-                    self.send_response(200)
-                    self.send_header("Content-Type", "application/json; charset=utf-8")
-                    self.send_header("Content-Encoding", "gzip")
-                    self.send_header("Cache-Control", "public, max-age=120")
-                    self.send_header("Content-Length", str(len(body)))
-                    self.end_headers()
-                    self.wfile.write(body)
-                    return
+                self._send_precompressed(DATA_FILE, "application/json; charset=utf-8")
+            except OSError:
+                self.send_error(404, "kb.json not found")
+            return
 
-                self.send_response(200)
-                self.send_header("Content-Type", "application/json; charset=utf-8")
-                self.send_header("Cache-Control", "public, max-age=120")
-                self.send_header("Content-Length", str(len(raw)))
-                self.end_headers()
-                self.wfile.write(raw)
+        if u.path == "/data/kb.meta.json":
+            try:
+                self._send_precompressed(META_FILE, "application/json; charset=utf-8")
+            except OSError:
+                self.send_error(404, "kb.meta.json not found")
+            return
+
+        if u.path == "/api/docs":
+            qs = parse_qs(u.query)
+            arg = lambda k: qs.get(k, [""])[0].strip()
+            category = arg("category")
+            path = _shard_path(category)
+            if path is None:
+                self._json({"ok": False, "error": "分类不存在"}, code=404)
                 return
-            except Exception:
-                self.send_error(404, "kb.json not found")
+            try:
+                page, size = int(arg("page") or 1), int(arg("size") or DEFAULT_PAGE_SIZE)
+            except ValueError:
+                self._json({"ok": False, "error": "page/size 须为整数"}, code=400)
+                return
+            out = query_docs(load_shard(path), arg("primary"), arg("secondary"), arg("project"), arg("q"), page, size)
+            meta = load_meta()
+            out.update(ok=True, category=category, generated_at=meta.get("generated_at", ""), generation=meta.get("generation", ""))
+            self._json(out)
+            return
+
+        if u.path == "/api/dingtalk/bid/status":
+            task_id = parse_qs(u.query).get("task_id", [""])[0]
+            t = get_task(task_id)
+            if not t:
+                self._json({"ok": False, "error": "任务不存在"}, code=404)
+                return
+            self._json(_task_status(t))
+            return
+
+        if u.path == "/api/bid/cache_stats":
+            self._json(cache_stats())
+            return
+
+        if u.path == "/api/bid/report_stats":
+            self._json(report_stats())
+            return
+
+        if u.path == "/api/preview/cache_stats":
+            self._json(preview_cache_stats())
+            return
+
+        if u.path == "/api/search/cache_stats":
+            self._json(search_cache.cache_stats())
+            return
+
+        if u.path == "/metrics":
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if u.path == "/api/suggest":
+            qs = parse_qs(u.query)
+            try:
+                k = int(qs.get("k", ["8"])[0])
+            except ValueError:
+                self._json({"ok": False, "error": "k 须为整数"}, code=400)
                 return
+            q = qs.get("q", [""])[0]
+            snap = kb_snapshot()
+            self._json({"query": q, "generation": snap["generation"], "suggestions": suggest(snap["suggest"], q, k)})
+            return
 
         if u.path in ("/api/search", "/api/dingtalk_search"):
             q = parse_qs(u.query).get("q", [""])[0].strip()
-            kb = load_kb()
-            docs = kb.get("documents")
-            if docs is None:
-                docs = []
-                for _, arr in (kb.get("by_category") or {}).items():
-                    docs.extend(arr)
-            ranked = []
-            for d in docs:
-                s = score_doc(q, d)
-                if s > 0:
-                    item = dict(d)
-                    item["score"] = s
-                    item["download_url"] = f"/download?path={d.get('file_path','')}"
-                    ranked.append(item)
-            ranked.sort(key=lambda x: (x.get("score", 0), x.get("updated_at", "")), reverse=True)
-            top = ranked[:5]
+            # 同一请求内的标题检索与全文检索使用同一代快照
+            snap = kb_snapshot()
+            search_cache.record_query(q)
+            count, hits = search_kb(q, SEARCH_TOP_K, snap)
+            top = []
+            for s, d in hits:
+                item = dict(d)
+                item["score"] = s
+                item["download_url"] = f"/download?path={d.get('file_path','')}"
+                top.append(item)
             if u.path == "/api/dingtalk_search":
                 lines = [f"图安检索：{q}"]
                 if not top:
@@ -450,39 +684,58 @@ class Handler(SimpleHTTPRequestHandler):
                 else:
                     for i, x in enumerate(top, 1):
                         lines.append(f"{i}. {x.get('title','')} | 项目：{x.get('project_name','-')} | 下载：http://{HOST}:{PORT}/download?path={x.get('file_path','')}")
-                self._json({"query": q, "count": len(ranked), "top": top, "reply_text": "\n".join(lines)})
+                self._json({"query": q, "generation": snap["generation"], "count": count, "top": top,
+                            "reply_text": "\n".join(lines)})
                 return
-            self._json({"query": q, "count": len(ranked), "top": top})
+            # 正文只逐篇确认前 k 篇命中；总数是倒排候选数（命中数的上界），不作为命中数返回
+            content_candidates, content_hits = search_kb_content(q, SEARCH_TOP_K, snap)
+            content_top = [{
+                "title": d.get("title", ""),
+                "project_name": d.get("project_name", ""),
+                "category": d.get("category", ""),
+                "file_path": d.get("file_path", ""),
+                "updated_at": d.get("updated_at", ""),
+                "download_url": f"/download?path={d.get('file_path','')}",
+                "snippet": snippet,
+            } for d, snippet in content_hits]
+            self._json({"query": q, "generation": snap["generation"], "count": count, "top": top,
+                        "content_candidates": content_candidates, "content_top": content_top})
             return
 
         if u.path in ("/download", "/preview"):
-            raw = parse_qs(u.query).get("path", [""])[0]
-            p = os.path.realpath(unquote(raw))
-            allowed_roots = [os.path.realpath(ROOT), os.path.realpath(REPORT_DIR)]
-            if not any(p.startswith(ar) for ar in allowed_roots) or not os.path.isfile(p):
+            p = file_param(u)
+            if p is None:
                 self.send_error(404, "file not found")
                 return
+            if u.path == "/preview":
+                self._send_preview(p)
+            else:
+                self._send_file(p, "attachment")
+            return
 
-            fn = os.path.basename(p)
-            ext = os.path.splitext(fn)[1].lower()
-            ctype = "application/octet-stream"
-            if ext == ".pdf":
-                ctype = "application/pdf"
-            elif ext in (".mp4", ".mov", ".mkv", ".avi", ".wmv", ".flv"):
-                ctype = "video/mp4"
-
+        if u.path == "/thumb":
+            # id 由源文件 path/size/mtime 派生，内容不变则 id 不变，可长期缓存
+            tid = parse_qs(u.query).get("id", [""])[0]
+            p = os.path.join(THUMB_DIR, tid + ".jpg")
+            if not re.fullmatch(r"[0-9a-f]{40}", tid) or not os.path.isfile(p):
+                self.send_error(404, "thumbnail not found")
+                return
+            if tid in self.headers.get("If-None-Match", ""):
+                self.send_response(304)
+                self.send_header("ETag", f'"{tid}"')
+                self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+                self.end_headers()
+                return
+            with open(p, "rb") as f:
+                body = f.read()
             self.send_response(200)
-            self.send_header("Content-Type", ctype)
-            disposition = "inline" if u.path == "/preview" else "attachment"
-            self.send_header("Content-Disposition", f"{disposition}; filename*=UTF-8''{quote(fn)}")
-            self.send_header("Content-Length", str(os.path.getsize(p)))
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("X-Content-Type-Options", "nosniff")
+            self.send_header("ETag", f'"{tid}"')
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+            self.send_header("Content-Length", str(len(body)))
             self.end_headers()
-            with open(p, "rb") as f:
-                while True:
-                    chunk = f.read(1024 * 64)
-                    if not chunk:
-                        break
-                    self.wfile.write(chunk)
+            self.wfile.write(body)
             return
 
         return super().do_GET()
@@ -501,36 +754,26 @@ class Handler(SimpleHTTPRequestHandler):
             return
 
         if u.path == "/api/dingtalk/bid/upload":
-            ctype, _ = cgi.parse_header(self.headers.get("Content-Type", ""))
-            if ctype != "multipart/form-data":
-                self._json({"ok": False, "error": "请使用 multipart/form-data 上传文件"}, code=400)
-                return
-            form = cgi.FieldStorage(
-                fp=self.rfile,
-                headers=self.headers,
-                environ={"REQUEST_METHOD": "POST", "CONTENT_TYPE": self.headers.get("Content-Type")},
-            )
-            task_id = form.getfirst("task_id", "") if hasattr(form, "getfirst") else ""
-            tasks = _load_tasks()
-            t = tasks.get(task_id)
-            if not t:
-                self._json({"ok": False, "error": "任务不存在，请先发送：图安：分析标书"}, code=400)
+            # task_id 也可放在查询串中，此时在读取请求体之前即可校验任务
+            early_id = parse_qs(u.query).get("task_id", [""])[0]
+            if early_id and not self._check_uploadable(get_task(early_id), early_id):
                 return
-            file_item = form["file"] if "file" in form else None
-            if file_item is None or not getattr(file_item, "filename", ""):
-                self._json({"ok": False, "error": "未检测到上传文件"}, code=400)
+            got = self._parse_upload(UPLOAD_DIR)
+            if got is None:
                 return
-            filename = os.path.basename(file_item.filename)
-            ext = os.path.splitext(filename)[1].lower()
-            if ext not in (".doc", ".docx", ".pdf", ".xls", ".xlsx", ".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff"):
-                self._json({"ok": False, "error": "不支持的文件格式"}, code=400)
+            fields, up = got
+            task_id = fields.get("task_id", "") or early_id
+            if not self._check_uploadable(get_task(task_id), task_id):
+                safe_remove(up["path"])
                 return
 
-            save_path = os.path.join(UPLOAD_DIR, f"{task_id}{ext}")
-            with open(save_path, "wb") as wf:
-                wf.write(file_item.file.read())
-            summary = f"{filename} | 类型:{ext} | 大小:{os.path.getsize(save_path)} bytes"
-            t = _update_task(task_id, state=STATE_WAIT_CONFIRM, file_path=save_path, file_name=filename, file_type=ext, file_summary=summary)
+            save_path = os.path.join(UPLOAD_DIR, f"{task_id}{up['ext']}")
+            os.replace(up["path"], save_path)
+            summary = f"{up['filename']} | 类型:{up['ext']} | 大小:{up['size']} bytes"
+            t = update_task(task_id, from_states=_UPLOADABLE_STATES, state=STATE_WAIT_CONFIRM, file_path=save_path, file_name=up["filename"], file_type=up["ext"], file_summary=summary)
+            if not t:
+                self._json({"ok": False, "task_id": task_id, "error": "分析进行中，请等待完成后再上传"}, code=400)
+                return
             self._json({"ok": True, "task_id": task_id, "state": t["state"], "reply": "已收到招标文件\n请选择操作：\n1️⃣ 开始分析\n2️⃣ 取消分析"})
             return
 
@@ -540,69 +783,56 @@ class Handler(SimpleHTTPRequestHandler):
             body = json.loads(raw.decode("utf-8") or "{}")
             task_id = body.get("task_id", "")
             action = str(body.get("action", "")).strip()
-            tasks = _load_tasks()
-            t = tasks.get(task_id)
+            t = get_task(task_id)
             if not t:
                 self._json({"ok": False, "error": "任务不存在"}, code=400)
                 return
             if action == "2":
-                _safe_remove(t.get("file_path", ""))
-                t = _update_task(task_id, state=STATE_CANCELED)
+                t = update_task(task_id, from_states=_UPLOADABLE_STATES + (STATE_QUEUED,), state=STATE_CANCELED)
+                if not t:
+                    self._json({"ok": False, "task_id": task_id, "state": STATE_ANALYZING, "error": "分析进行中，无法取消"}, code=400)
+                    return
+                safe_remove(t.get("file_path", ""))
                 self._json({"ok": True, "task_id": task_id, "state": t["state"], "reply": "已取消本次标书分析任务"})
                 return
             if action != "1":
                 self._json({"ok": False, "error": "仅支持 1 或 2"}, code=400)
                 return
 
-            try:
-                _update_task(task_id, state=STATE_ANALYZING)
-                text = _extract_text(t.get("file_path", ""))
-                analysis = _analyze_bid_text(text)
-                pdf_path = _analysis_to_pdf(t.get("file_name", ""), analysis, task_id=task_id)
-                t = _update_task(task_id, state=STATE_DONE, pdf_path=pdf_path)
-                self._json({
-                    "ok": True,
-                    "task_id": task_id,
-                    "state": t["state"],
-                    "reply_start": "正在分析招标文件，请稍候…",
-                    "reply_done": "招标文件分析完成，请查收报告",
-                    "pdf_path": pdf_path,
-                    "pdf_download_url": f"/download?path={pdf_path}",
-                    "analysis": analysis,
-                })
-            except Exception as e:
-                _update_task(task_id, state=STATE_ERROR)
-                self._json({"ok": False, "task_id": task_id, "state": STATE_ERROR, "reply": "文件解析失败，请重新上传标准版招标文件", "error": str(e)}, code=500)
+            queued = update_task(task_id, from_states=(STATE_WAIT_CONFIRM,), state=STATE_QUEUED, stage="", timings={}, error="")
+            if not queued:
+                t = get_task(task_id) or t
+                if t.get("state") in (STATE_QUEUED, STATE_ANALYZING, STATE_DONE):
+                    self._json(_task_status(t))
+                else:
+                    self._json({"ok": False, "task_id": task_id, "state": t.get("state", ""), "error": "请先上传招标文件"}, code=400)
+                return
+            if not _enqueue_bid_task(task_id):
+                update_task(task_id, from_states=(STATE_QUEUED,), state=STATE_WAIT_CONFIRM)
+                self._json({"ok": False, "task_id": task_id, "state": STATE_WAIT_CONFIRM, "reply": "当前分析任务较多，请稍后再试"}, code=503)
+                return
+            t = queued
+            self._json({
+                "ok": True,
+                "task_id": task_id,
+                "state": t["state"],
+                "reply_start": "正在分析招标文件，请稍候…",
+                "status_url": f"/api/dingtalk/bid/status?task_id={task_id}",
+            })
             return
 
         if u.path in ("/api/bid/analyze", "/api/bid/analyze_pdf"):
-            ctype, _ = cgi.parse_header(self.headers.get("Content-Type", ""))
-            if ctype != "multipart/form-data":
-                self._json({"ok": False, "error": "请使用 multipart/form-data 上传文件"}, code=400)
+            got = self._parse_upload(tempfile.gettempdir())
+            if got is None:
                 return
-
-            form = cgi.FieldStorage(
-                fp=self.rfile,
-                headers=self.headers,
-                environ={"REQUEST_METHOD": "POST", "CONTENT_TYPE": self.headers.get("Content-Type")},
-            )
-            file_item = form["file"] if "file" in form else None
-            if file_item is None or not getattr(file_item, "filename", ""):
-                self._json({"ok": False, "error": "未检测到上传文件"}, code=400)
-                return
-
-            filename = os.path.basename(file_item.filename)
-            ext = os.path.splitext(filename)[1].lower()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tf:
-                tf.write(file_item.file.read())
-                temp_path = tf.name
+            fields, up = got
+            filename, ext, temp_path = up["filename"], up["ext"], up["path"]
 
             try:
-                text = _extract_text(temp_path)
-                analysis = _analyze_bid_text(text)
-                task_id = form.getfirst("task_id", "") if hasattr(form, "getfirst") else ""
+                analysis = cached_analysis(temp_path, digest=up["sha256"])
+                task_id = fields.get("task_id", "")
                 if u.path == "/api/bid/analyze_pdf":
-                    pdf_path = _analysis_to_pdf(filename, analysis, task_id=task_id)
+                    pdf_path = render_report(REPORT_DIR, filename, analysis)
                     self._json({
                         "ok": True,
                         "file_name": filename,
@@ -621,16 +851,15 @@ class Handler(SimpleHTTPRequestHandler):
                     "analysis": analysis,
                 })
             finally:
-                try:
-                    os.remove(temp_path)
-                except Exception:
-                    pass
+                safe_remove(temp_path)
             return
 
         self._json({"ok": False, "error": "not found"}, code=404)
 
 
 if __name__ == "__main__":
+    kb_snapshot()
+    start_bid_workers()
     server = ThreadingHTTPServer((HOST, PORT), Handler)
     print(f"TuanKB serving on http://{HOST}:{PORT} base={BASE}")
     server.serve_forever()
@@ -11,6 +11,13 @@ if [[ -f "$PIDFILE" ]] && kill -0 "$(cat "$PIDFILE")" 2>/dev/null; then
   exit 0
 fi
 
-nohup python3 server.py >"$LOG" 2>&1 &
+# 默认 asyncio 服务核心；TUANKB_SERVER=threading 退回原 ThreadingHTTPServer
+if [[ "${TUANKB_SERVER:-aio}" == "threading" ]]; then
+  APP=server.py
+else
+  APP=aio_server.py
+fi
+
+nohup python3 "$APP" >"$LOG" 2>&1 &
 echo $! > "$PIDFILE"
 echo "started pid=$(cat "$PIDFILE") log=$LOG url=http://$HOST:$PORT"
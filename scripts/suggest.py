@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""搜索框联想（/api/suggest）：项目名、文件标题（去扩展名）与行业标签的前缀索引，build_index.py 生成 kb.suggest。
+
+同一文本只有一个条目（文档数按文档去重），条目按 (文档数 desc, 最近更新 desc, 文本) 排序后编号，编号越小越靠前；每个条目有两类键：
+小写文本，以及含中文时的拼音首字母（如 化工园区 → hgyq，ASCII 字母数字原样保留）。
+全部键升序排列，前缀查询即二分得到的一段连续区间，区间内编号最小的 k 个条目即结果。
+为在百万级文档下不扫描整段区间，按 BLOCK、BLOCK²、BLOCK³ 个键分块预存各块编号最小的 MAX_K 个条目，
+查询时区间分解为 O(BLOCK × 层数) 个整块与零散键，只合并这些候选。
+
+拼音首字母优先使用可选依赖 pypinyin（多音字更准），未安装时按 GB2312 一级汉字的拼音排序区间推算，
+二级汉字无法推算时该条目只有文本键。
+"""
+import os
+import bisect
+import array
+import heapq
+
+from kb_pack import write_sections, read_sections, map_file
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:
+    lazy_pinyin = None
+
+MAGIC = b"TKBSUGG1"
+VERSION = 1
+BLOCK = 32
+LEVELS = 3
+# 每块预存的条目数，即单次查询可返回的上限
+MAX_K = 10
+TYPES = ("project", "title", "tag")
+_NONE = 0xFFFFFFFF
+
+# GB2312 一级汉字按拼音排序，各声母首字的区位码
+_GB_INITIALS = [
+    (0xB0A1, "a"), (0xB0C5, "b"), (0xB2C1, "c"), (0xB4EE, "d"), (0xB6EA, "e"), (0xB7A2, "f"), (0xB8C1, "g"),
+    (0xB9FE, "h"), (0xBBF7, "j"), (0xBFA6, "k"), (0xC0AC, "l"), (0xC2E8, "m"), (0xC4C3, "n"), (0xC5B6, "o"),
+    (0xC5BE, "p"), (0xC6DA, "q"), (0xC8BB, "r"), (0xC8F6, "s"), (0xCBFA, "t"), (0xCDDA, "w"), (0xCEF4, "x"),
+    (0xD1B9, "y"), (0xD4D1, "z"),
+]
+_GB_CODES = [c for c, _ in _GB_INITIALS]
+
+
+def _gb_initial(ch: str) -> str:
+    try:
+        b = ch.encode("gb2312")
+    except UnicodeEncodeError:
+        return ""
+    if len(b) != 2:
+        return ""
+    code = b[0] << 8 | b[1]
+    if not 0xB0A1 <= code <= 0xD7F9:
+        return ""
+    return _GB_INITIALS[bisect.bisect_right(_GB_CODES, code) - 1][1]
+
+
+def _is_han(ch: str) -> bool:
+    return "一" <= ch <= "鿿"
+
+
+def pinyin_initials(text: str) -> str:
+    """拼音首字母键：汉字取首字母、ASCII 字母数字转小写保留、其余字符丢弃；无汉字或有汉字无法推算时返回空串。"""
+    text = text.lower()
+    if not any(_is_han(c) for c in text):
+        return ""
+    out = []
+    if lazy_pinyin is not None:
+        for c in text:
+            if _is_han(c):
+                out.append(lazy_pinyin(c, style=Style.FIRST_LETTER)[0][:1])
+            elif c.isascii() and c.isalnum():
+                out.append(c)
+        return "".join(out)
+    for c in text:
+        if _is_han(c):
+            ini = _gb_initial(c)
+            if not ini:
+                return ""
+            out.append(ini)
+        elif c.isascii() and c.isalnum():
+            out.append(c)
+    return "".join(out)
+
+
+def _updated_int(s: str) -> int:
+    digits = "".join(c for c in s if c.isdigit())[:14]
+    return int(digits.ljust(14, "0")) if digits else 0
+
+
+def build_suggest(docs, generation: str = "") -> bytes:
+    """docs 为 kb.json 的文档（dict 序列）；返回 kb.suggest 字节串。"""
+    # 文本 -> [文档数, 最近更新, 类型序号]；同一文本可能既是项目名又是标题，合并为一条，类型取 TYPES 中靠前者
+    stats = {}
+    for d in docs:
+        updated = _updated_int(d.get("updated_at", ""))
+        texts = {}
+        for kind, text in ((0, d.get("project_name", "")), (1, os.path.splitext(str(d.get("title", "")))[0]),
+                           (2, d.get("industry_primary") or d.get("industry_type")), (2, d.get("industry_secondary"))):
+            text = str(text or "").strip()
+            if text and texts.get(text, kind) >= kind:
+                texts[text] = kind
+        for text, kind in texts.items():
+            st = stats.get(text)
+            if st is None:
+                stats[text] = [1, updated, kind]
+            else:
+                st[0] += 1
+                st[1] = max(st[1], updated)
+                st[2] = min(st[2], kind)
+
+    entries = sorted(stats.items(), key=lambda x: (-x[1][0], -x[1][1], x[0]))
+    keys = []
+    text_blob, text_off = bytearray(), array.array("I", [0])
+    kinds, counts, updated = array.array("B"), array.array("I"), array.array("Q")
+    for i, (text, (n, up, kind)) in enumerate(entries):
+        text_blob += text.encode("utf-8")
+        text_off.append(len(text_blob))
+        kinds.append(kind)
+        counts.append(n)
+        updated.append(up)
+        low = text.lower()
+        keys.append((low, i))
+        ini = pinyin_initials(text)
+        if ini and ini != low:
+            keys.append((ini, i))
+    keys.sort()
+
+    key_blob, key_off = bytearray(), array.array("I", [0])
+    key_entry = array.array("I")
+    for k, i in keys:
+        key_blob += k.encode("utf-8")
+        key_off.append(len(key_blob))
+        key_entry.append(i)
+
+    sections = [("text_off", text_off), ("text_blob", bytes(text_blob)), ("kind", kinds), ("count", counts),
+                ("updated", updated), ("key_off", key_off), ("key_blob", bytes(key_blob)), ("key_entry", key_entry)]
+    # 各层分块的前 MAX_K 个条目编号（不足补 _NONE）
+    prev = [[i] for i in key_entry]
+    for level in range(1, LEVELS + 1):
+        tops = []
+        for b in range(0, len(prev), BLOCK):
+            tops.append(heapq.nsmallest(MAX_K, set().union(*prev[b:b + BLOCK])))
+        flat = array.array("I")
+        for t in tops:
+            flat.extend(t + [_NONE] * (MAX_K - len(t)))
+        sections.append((f"top{level}", flat))
+        prev = tops
+    header = {"suggest_version": VERSION, "generation": generation, "entries": len(entries), "keys": len(keys),
+              "block": BLOCK, "levels": LEVELS, "max_k": MAX_K}
+    return write_sections(MAGIC, header, sections)
+
+
+def open_suggest(src) -> dict:
+    """src 为 kb.suggest 路径或 build_suggest 的结果；格式不符时抛 ValueError。"""
+    idx = read_sections(map_file(src) if isinstance(src, str) else src, MAGIC)
+    h = idx["header"]
+    if h.get("suggest_version") != VERSION or h.get("block") != BLOCK or h.get("levels") != LEVELS:
+        raise ValueError("kb.suggest 版本不符")
+    return idx
+
+
+def _key_at(idx: dict, i: int) -> str:
+    off = idx["key_off"]
+    return str(idx["key_blob"][off[i]:off[i + 1]], "utf-8")
+
+
+class _Keys:
+    # 供 bisect 使用的按需解码键序列
+    def __init__(self, idx: dict):
+        self.idx = idx
+
+    def __len__(self):
+        return self.idx["header"]["keys"]
+
+    def __getitem__(self, i):
+        return _key_at(self.idx, i)
+
+
+def _range_candidates(idx: dict, lo: int, hi: int):
+    out = []
+    entry = idx["key_entry"]
+    i = lo
+    while i < hi:
+        level = 0
+        while level < LEVELS and i % BLOCK ** (level + 1) == 0 and i + BLOCK ** (level + 1) <= hi:
+            level += 1
+        if level == 0:
+            out.append(entry[i])
+            i += 1
+        else:
+            b = i // BLOCK ** level
+            top = idx[f"top{level}"]
+            out.extend(top[b * MAX_K:(b + 1) * MAX_K])
+            i += BLOCK ** level
+    return out
+
+
+def suggest(idx: dict, q: str, k: int = 8):
+    """前缀联想：返回至多 k（≤ MAX_K）个 {"text", "type", "count", "updated_at"}，按文档数、最近更新排序。"""
+    q = q.lower().strip()
+    if not q or idx is None:
+        return []
+    k = max(1, min(k, MAX_K))
+    keys = _Keys(idx)
+    lo = bisect.bisect_left(keys, q)
+    hi = bisect.bisect_left(keys, q + "\U0010ffff", lo)
+    ids = sorted(set(_range_candidates(idx, lo, hi)) - {_NONE})[:k]
+    out = []
+    off, blob = idx["text_off"], idx["text_blob"]
+    for i in ids:
+        up = f"{idx['updated'][i]:014d}"
+        out.append({
+            "text": str(blob[off[i]:off[i + 1]], "utf-8"),
+            "type": TYPES[idx["kind"][i]],
+            "count": idx["count"][i],
+            "updated_at": f"{up[0:4]}-{up[4:6]}-{up[6:8]} {up[8:10]}:{up[10:12]}:{up[12:14]}",
+        })
+    return out
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""合成语料：按共享盘 /mnt/tuan 的目录习惯生成测试目录树与招标文件文本，供基准与本地调试使用。
+
+目录树：<顶层目录>/<行业>/<地区>/<项目>/<资料类型>/文件，另有 01 图安世纪资质 下的资质目录。
+同一份资料生成 1~3 个版本（v2、(V3)、终版、最终版、定稿、副本、日期后缀等），mtime 依次递增，
+覆盖 normalize_name 的版本归并；扩展名覆盖 Office、PDF、Excel 报价清单与演示视频。文件内容为空。
+
+用法：python3 scripts/synth_corpus.py <目标目录> [--files 10000] [--seed 7]
+"""
+import os
+import random
+import argparse
+
+ROOT_DIR = "0图安世纪-标准解决方案"
+# 项目资料分布在多个顶层目录（标准解决方案目录名本身会命中“标准”关键词）
+TOP_DIRS = [ROOT_DIR, "1项目资料", "2售前支持"]
+QUAL_DIR = "01 图安世纪资质"
+INDUSTRIES = {
+    "AI赋能": ["AI视频分析一体机", "应急大模型", "化工园区AI赋能"],
+    "安全生产": ["HSE", "安全生产标准化", "重大危险源", "双重预防", "特殊作业", "人员定位", "承包商"],
+    "智慧园区": ["化工园区", "经开区", "数字孪生园区"],
+    "应急管理": ["应急指挥", "应急演练", "应急推演"],
+    "车路协同": ["智慧高速", "智慧隧道", "智慧服务区", "智慧收费站", "无人驾驶训练场"],
+}
+PARKS = ["经济开发区", "高新区", "石化基地", "港区", "新材料产业园", "化学工业园", "临港产业区", "市本级"]
+PHASES = ["", "一期", "二期", "提升改造", "扩建"]
+PLACES = ["南京", "苏州", "无锡", "常州", "连云港", "宁波", "嘉兴", "东营", "淄博", "惠州", "泉州", "荆门", "泰兴", "如东", "大连", "宁东"]
+# (资料目录, 文件名后缀, 可选扩展名)
+KINDS = [
+    ("汇报材料", "汇报", [".pptx", ".ppt", ".pdf"]),
+    ("解决方案", "建设方案", [".docx", ".doc", ".pdf"]),
+    ("解决方案", "技术方案", [".docx", ".pdf"]),
+    ("招标文件", "招标文件", [".pdf", ".docx"]),
+    ("投标文件", "投标文件", [".docx", ".pdf"]),
+    ("报价", "报价清单", [".xlsx", ".xls"]),
+    ("报价", "分项预算", [".xlsx"]),
+    ("合同", "合同", [".pdf", ".docx"]),
+    ("演示视频", "演示视频", [".mp4", ".mov"]),
+    ("参考资料", "建设指南", [".pdf"]),
+    ("参考资料", "设备参数表", [".xlsx"]),
+]
+QUAL_GROUPS = {
+    "公司介绍（含产品介绍）": ["公司介绍", "产品手册", "宣传册"],
+    "相关证书": ["ISO9001认证证书", "高新技术企业证书", "资信等级证书"],
+    "专利": ["发明专利证书", "实用新型专利"],
+    "著作权": ["软件著作权登记证书", "软著"],
+    "测试报告": ["软件测试报告", "检测报告"],
+    "合同业绩": ["项目合同业绩", "案例合同"],
+    "人员资质": ["注册安全工程师证书", "一级建造师", "高级职称"],
+}
+VERSION_SUFFIXES = ["", "v2", "V3", "(v2)", "（2）", "终版", "最终版", "定稿", "-副本", "_new", "v1.2"]
+# 文件 mtime 范围：2019-01-01 ~ 2026-06-30
+MTIME_FROM, MTIME_TO = 1546272000, 1782748800
+
+
+def _versions(rnd, base: str, ext: str):
+    """同一份资料的 1~3 个版本文件名，第一个为原始名。"""
+    names = [base + ext]
+    for _ in range(rnd.choices([0, 1, 2], weights=[5, 3, 2])[0]):
+        if rnd.random() < 0.3:
+            y, m, d = rnd.randint(2019, 2026), rnd.randint(1, 12), rnd.randint(1, 28)
+            suffix = rnd.choice([f"{y}{m:02d}{d:02d}", f"{y}-{m:02d}-{d:02d}", f"{y}年{m}月{d}日"])
+        else:
+            suffix = rnd.choice(VERSION_SUFFIXES[1:])
+        names.append(f"{base}{suffix}{ext}")
+    return list(dict.fromkeys(names))
+
+
+def _touch(path: str, mtime: int):
+    open(path, "wb").close()
+    os.utime(path, (mtime, mtime))
+
+
+def make_tree(root: str, files: int = 10000, seed: int = 7):
+    """在 root 下生成约 files 个文件，返回统计 {"files", "dirs", "projects"}。"""
+    rnd = random.Random(seed)
+    base = os.path.join(root, ROOT_DIR)
+    made = {"files": 0, "dirs": 0, "projects": 0}
+    dirs = set()
+
+    def put(d: str, name: str, mtime: int):
+        if d not in dirs:
+            os.makedirs(d, exist_ok=True)
+            dirs.add(d)
+        _touch(os.path.join(d, name), mtime)
+        made["files"] += 1
+
+    # 资质目录约占 3%
+    qual_files = max(1, files * 3 // 100)
+    while made["files"] < qual_files:
+        group = rnd.choice(list(QUAL_GROUPS))
+        title = f"{rnd.choice(QUAL_GROUPS[group])}{rnd.randint(1, 999):03d}"
+        t = rnd.randint(MTIME_FROM, MTIME_TO)
+        for i, name in enumerate(_versions(rnd, title, rnd.choice([".pdf", ".jpg", ".docx"]))):
+            put(os.path.join(base, QUAL_DIR, group), name, t + i * 86400)
+
+    n = 0
+    while made["files"] < files:
+        n += 1
+        industry = rnd.choice(list(INDUSTRIES))
+        topic = rnd.choice(INDUSTRIES[industry])
+        place = rnd.choice(PLACES)
+        stem = f"{place}{rnd.choice(PARKS)}{topic}{rnd.choice(PHASES)}"
+        project = f"{stem}项目{n}"
+        top = rnd.choice(TOP_DIRS)
+        made["projects"] += 1
+        t = rnd.randint(MTIME_FROM, MTIME_TO)
+        for folder, kind, exts in rnd.sample(KINDS, rnd.randint(3, len(KINDS))):
+            d = os.path.join(root, top, industry, place, project, folder)
+            title = f"{stem}{kind}"
+            if rnd.random() < 0.2:
+                title = f"【{rnd.choice(['内部', '对外', '精简'])}】{title}"
+            for i, name in enumerate(_versions(rnd, title, rnd.choice(exts))):
+                put(d, name, t + i * 86400 + rnd.randint(0, 3600))
+            if made["files"] >= files:
+                break
+    made["dirs"] = len(dirs)
+    return made
+
+
+TENDER_LINES = [
+    "第一章 投标邀请", "采购需求详见第三章", "投标人须具备有效的营业执照及相关资质证书",
+    "近三年具有类似项目业绩不少于2个，以合同金额为准", "项目经理须具有注册安全工程师证书及高级职称",
+    "投标人不得被列入失信被执行人黑名单，无行政处罚记录", "出现下列情形之一的，投标将被否决：",
+    "未按要求签章的视为无效投标", "其他要求：特别说明见补充条款", "商务评分（30分）",
+    "商务部分：企业资质每项得2分，最高6分", "技术评分 60 分", "技术部分：总体技术方案合理得10.5分",
+    "价格评分采用低价优先法，评审基准价为有效投标报价的最低价", "报价得分=(评审基准价/投标报价)×10", "价格分 10分",
+    "投标文件组成及目录", "响应文件格式见附件", "资格审查资料", "承诺函（格式自拟）", "声明函", "技术要求与技术方案",
+    "备注：本项目不接受联合体投标", "附件1 法定代表人授权书", "ISO9001 认证", "团队人员配置表", "信用记录查询",
+    "交货期：合同签订后90日内", "付款方式：按进度支付", "质保期：三年",
+]
+FILLER = ["系统应支持多级用户权限管理与操作日志审计。", "平台部署于园区政务云，提供接口对接省级监管平台。",
+          "视频接入不少于500路，支持AI算法识别烟火、人员闯入等场景。", "正文内容"]
+
+
+def make_tender(pages: int, seed: int = 3) -> str:
+    """合成招标文件全文：首页为项目名称，各页以 \\f 分隔，命中行稀疏分布在正文填充之间。"""
+    rnd = random.Random(seed)
+    industry = rnd.choice(list(INDUSTRIES))
+    out = [f"{rnd.choice(PLACES)}{rnd.choice(INDUSTRIES[industry])}建设项目\n招标文件\n项目编号：JSZC-{seed:06d}"]
+    for _ in range(pages - 1):
+        body = [rnd.choice(TENDER_LINES) if rnd.random() < 0.15 else rnd.choice(FILLER) * rnd.randint(1, 6)
+                for _ in range(rnd.randint(20, 60))]
+        out.append("\n".join(body))
+    return "\f".join(out)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="生成合成测试目录树")
+    ap.add_argument("root")
+    ap.add_argument("--files", type=int, default=10000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    print(make_tree(args.root, args.files, args.seed))
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""标书分析任务存储：SQLite（WAL 模式），替代整体读写的 bid_tasks.json。
+
+每个线程一个连接；状态流转用带前置状态条件的单行 UPDATE 完成，并发请求不会互相覆盖。
+首次打开时自动导入旧的 bid_tasks.json（导入后重命名为 .migrated）。
+"""
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS_DB = os.path.join(BASE, "data", "bid_tasks.db")
+LEGACY_TASKS_FILE = os.path.join(BASE, "data", "bid_tasks.json")
+
+FIELDS = [
+    "task_id", "user_id", "session_id", "state", "created_at", "updated_at",
+    "file_path", "file_name", "file_type", "file_summary", "pdf_path", "stage", "timings", "error",
+]
+# 以 JSON 文本存储的字段
+_JSON_FIELDS = {"timings"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL DEFAULT '',
+    session_id TEXT NOT NULL DEFAULT '',
+    state TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    file_path TEXT NOT NULL DEFAULT '',
+    file_name TEXT NOT NULL DEFAULT '',
+    file_type TEXT NOT NULL DEFAULT '',
+    file_summary TEXT NOT NULL DEFAULT '',
+    pdf_path TEXT NOT NULL DEFAULT '',
+    stage TEXT NOT NULL DEFAULT '',
+    timings TEXT NOT NULL DEFAULT '{}',
+    error TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_user ON tasks(user_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_session ON tasks(session_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks(state, updated_at);
+"""
+
+_LOCAL = threading.local()
+_INIT_LOCK = threading.Lock()
+_INIT = {"db": None}
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _open(path: str):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+def _migrate_json(conn):
+    try:
+        with open(LEGACY_TASKS_FILE, "r", encoding="utf-8") as f:
+            tasks = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    rows = [_to_row(t) for t in tasks.values() if t.get("task_id")]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(f"INSERT OR IGNORE INTO tasks ({','.join(FIELDS)}) VALUES ({','.join('?' * len(FIELDS))})", rows)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    os.replace(LEGACY_TASKS_FILE, LEGACY_TASKS_FILE + ".migrated")
+    return len(rows)
+
+
+def _conn():
+    conn = getattr(_LOCAL, "conn", None)
+    if conn is not None and _LOCAL.db == TASKS_DB:
+        return conn
+    with _INIT_LOCK:
+        if _INIT["db"] != TASKS_DB:
+            os.makedirs(os.path.dirname(TASKS_DB), exist_ok=True)
+            c = _open(TASKS_DB)
+            c.executescript(_SCHEMA)
+            _migrate_json(c)
+            c.close()
+            _INIT["db"] = TASKS_DB
+    _LOCAL.conn = _open(TASKS_DB)
+    _LOCAL.db = TASKS_DB
+    return _LOCAL.conn
+
+
+def _to_row(t: dict):
+    out = []
+    for k in FIELDS:
+        v = t.get(k)
+        if k in _JSON_FIELDS:
+            v = json.dumps(v or {}, ensure_ascii=False)
+        out.append("" if v is None else v)
+    return out
+
+
+def _from_row(r) -> dict:
+    if r is None:
+        return None
+    t = dict(r)
+    for k in _JSON_FIELDS:
+        try:
+            t[k] = json.loads(t[k] or "{}")
+        except ValueError:
+            t[k] = {}
+    return t
+
+
+def create_task(task: dict) -> dict:
+    t = dict(task)
+    t.setdefault("created_at", _now())
+    t.setdefault("updated_at", t["created_at"])
+    _conn().execute(f"INSERT INTO tasks ({','.join(FIELDS)}) VALUES ({','.join('?' * len(FIELDS))})", _to_row(t))
+    return get_task(t["task_id"])
+
+
+def get_task(task_id: str):
+    if not task_id:
+        return None
+    return _from_row(_conn().execute("SELECT * FROM tasks WHERE task_id=?", (task_id,)).fetchone())
+
+
+def update_task(task_id: str, from_states=None, **fields):
+    """更新单个任务；给定 from_states 时仅当当前状态属于其中才更新（原子状态流转）。
+
+    返回更新后的任务，任务不存在或前置状态不满足时返回 None。
+    """
+    fields = {k: v for k, v in fields.items() if k in FIELDS and k != "task_id"}
+    fields["updated_at"] = _now()
+    sets = ", ".join(f"{k}=?" for k in fields)
+    args = [json.dumps(v or {}, ensure_ascii=False) if k in _JSON_FIELDS else v for k, v in fields.items()]
+    sql = f"UPDATE tasks SET {sets} WHERE task_id=?"
+    args.append(task_id)
+    if from_states:
+        sql += f" AND state IN ({','.join('?' * len(from_states))})"
+        args.extend(from_states)
+    conn = _conn()
+    # RETURNING 需要 SQLite 3.35+，这里在同一事务内更新后读回
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        changed = conn.execute(sql, args).rowcount
+        row = conn.execute("SELECT * FROM tasks WHERE task_id=?", (task_id,)).fetchone() if changed else None
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return _from_row(row)
+
+
+def tasks_in_state(states):
+    rows = _conn().execute(
+        f"SELECT * FROM tasks WHERE state IN ({','.join('?' * len(states))}) ORDER BY updated_at", list(states)
+    ).fetchall()
+    return [_from_row(r) for r in rows]
+
+
+def expire_tasks(states, ttl_days: float):
+    """删除 states 中最后更新早于 ttl_days 天的任务，返回被删除的任务（调用方清理关联文件）。"""
+    cutoff = (datetime.now() - timedelta(days=ttl_days)).strftime("%Y-%m-%d %H:%M:%S")
+    marks = ",".join("?" * len(states))
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(f"SELECT * FROM tasks WHERE state IN ({marks}) AND updated_at < ?", [*states, cutoff]).fetchall()
+        conn.execute(f"DELETE FROM tasks WHERE state IN ({marks}) AND updated_at < ?", [*states, cutoff])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return [_from_row(r) for r in rows]
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""招标文件/知识库文档文本抽取（server.py 标书分析与 build_index.py 全文索引共用）。"""
+import os
+import re
+import shutil
+import tempfile
+import subprocess
+import zipfile
+
+from metrics import run_tool
+from office_pool import convert as office_convert
+from page_extract import extract_pdf_pages, extract_tiff_pages, ocr_image
+
+# 抽取逻辑变化时递增，使标书分析缓存中的旧文本失效
+EXTRACT_VERSION = 2
+
+
+def safe_remove(path: str):
+    try:
+        if path and os.path.isfile(path):
+            os.remove(path)
+    except Exception:
+        pass
+
+
+def extract_text(path: str, fallback: bool = True, ocr: bool = True, workers: int = None) -> str:
+    """ocr=True 时 PDF 逐页抽取并对扫描页 OCR（标书分析）；全文索引只取文本层。workers 为页级并发数。"""
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == ".pdf":
+            if ocr:
+                txt = extract_pdf_pages(path, workers)
+                if txt.strip():
+                    return txt
+            p = run_tool(["pdftotext", "-layout", path, "-"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=40)
+            if p.returncode == 0 and p.stdout.strip():
+                return p.stdout
+        if ext == ".docx":
+            with zipfile.ZipFile(path) as z:
+                xml = z.read("word/document.xml").decode("utf-8", errors="ignore")
+                xml = re.sub(r"</w:p>|</w:tr>|</w:tbl>", "\n", xml)
+                xml = re.sub(r"<w:tab[^>]*>", "\t", xml)
+                xml = re.sub(r"<[^>]+>", " ", xml)
+                return normalize_text(xml)
+        if ext in (".xlsx", ".xls"):
+            # 每次转换使用独立输出目录，同名文件并发转换互不覆盖
+            outdir = tempfile.mkdtemp(prefix="tuankb-conv-")
+            try:
+                with open(office_convert(path, "csv", outdir), "r", encoding="utf-8", errors="ignore") as f:
+                    txt = f.read()
+            finally:
+                shutil.rmtree(outdir, ignore_errors=True)
+            if txt.strip():
+                return txt
+        if ext in (".tif", ".tiff"):
+            txt = extract_tiff_pages(path, workers)
+            if txt.strip():
+                return txt
+        if ext in (".png", ".jpg", ".jpeg", ".bmp", ".webp"):
+            txt = ocr_image(path)
+            if txt.strip():
+                return txt
+    except Exception:
+        pass
+
+    # 全文索引不需要 strings 兜底出来的二进制噪声
+    if not fallback:
+        return ""
+    try:
+        p = run_tool(["strings", "-n", "4", path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=20)
+        return p.stdout[:250000]
+    except Exception:
+        return ""
+
+
+def normalize_text(text: str) -> str:
+    text = text.replace("\r", "\n")
+    text = re.sub(r"[\t\v]+", " ", text)
+    text = re.sub(r"\u3000", " ", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text
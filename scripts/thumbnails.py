@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""文档缩略图：构建时渲染 PDF 首页、PPT 首张幻灯片（经 LibreOffice 转 PDF）、视频帧与图片缩略图。
+
+缩略图按 (path, size, mtime) 生成内容键缓存为 JPEG，文件未变化时直接复用；渲染失败写 .fail 标记，
+文件变化后才重试。所需外部工具（pdftoppm / LibreOffice / ffmpeg）缺失时跳过对应类型，不写失败标记，
+安装工具后的下一次构建会自动补齐。渲染在外部进程中进行，用有界线程池并发驱动。
+"""
+import os
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import office_pool
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 调整尺寸或渲染方式后递增，旧缩略图随之失效
+THUMB_VERSION = 1
+THUMB_WORKERS = int(os.environ.get("TUANKB_THUMB_WORKERS", str(min(4, os.cpu_count() or 2))))
+THUMB_TIMEOUT = int(os.environ.get("TUANKB_THUMB_TIMEOUT", "60"))
+# 详情页缩略框 92x120，按 2 倍像素渲染
+THUMB_WIDTH = 184
+THUMB_MAX_SIZE = 500 * 1024 * 1024
+
+PDF_EXT = {".pdf"}
+SLIDE_EXT = {".ppt", ".pptx"}
+VIDEO_EXT = {".mp4", ".mov", ".mkv", ".avi", ".wmv", ".flv"}
+IMAGE_EXT = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff"}
+THUMB_EXT = PDF_EXT | SLIDE_EXT | VIDEO_EXT | IMAGE_EXT
+
+
+def thumb_key(path: str, size: int, mtime: int) -> str:
+    return hashlib.sha1(f"{path}|{size}|{mtime}|t{THUMB_VERSION}".encode("utf-8")).hexdigest()
+
+
+def _tool_ok(ext: str) -> bool:
+    if ext in PDF_EXT:
+        return shutil.which("pdftoppm") is not None
+    if ext in SLIDE_EXT:
+        return shutil.which("pdftoppm") is not None and shutil.which(office_pool.OFFICE_BIN) is not None
+    if ext in VIDEO_EXT:
+        return shutil.which("ffmpeg") is not None
+    return Image is not None
+
+
+def _pdf_first_page(src: str, out: str):
+    base = out[:-len(".jpg")]
+    subprocess.run(["pdftoppm", "-f", "1", "-l", "1", "-scale-to-x", str(THUMB_WIDTH), "-scale-to-y", "-1",
+                    "-jpeg", "-singlefile", src, base],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=THUMB_TIMEOUT)
+
+
+def _video_frame(src: str, out: str):
+    # 先取第 3 秒（跳过片头黑场），过短的视频退回第一帧
+    for ss in ("3", "0"):
+        subprocess.run(["ffmpeg", "-v", "error", "-y", "-ss", ss, "-i", src, "-frames:v", "1",
+                        "-vf", f"scale={THUMB_WIDTH}:-2", out],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=THUMB_TIMEOUT)
+        if os.path.exists(out) and os.path.getsize(out) > 0:
+            return
+
+
+def _image(src: str, out: str):
+    with Image.open(src) as im:
+        im.seek(0)
+        im = im.convert("RGB")
+        im.thumbnail((THUMB_WIDTH, THUMB_WIDTH * 2))
+        im.save(out, "JPEG", quality=80)
+
+
+def render_thumb(src: str, out: str) -> bool:
+    """把 src 的缩略图写到 out（JPEG），成功返回 True。"""
+    ext = os.path.splitext(src)[1].lower()
+    tmp = tempfile.mkdtemp(prefix="tuankb-thumb-")
+    try:
+        part = os.path.join(tmp, "t.jpg")
+        if ext in PDF_EXT:
+            _pdf_first_page(src, part)
+        elif ext in SLIDE_EXT:
+            _pdf_first_page(office_pool.convert(src, "pdf", tmp, timeout=THUMB_TIMEOUT), part)
+        elif ext in VIDEO_EXT:
+            _video_frame(src, part)
+        else:
+            _image(src, part)
+        if not os.path.exists(part) or os.path.getsize(part) == 0:
+            return False
+        os.replace(part, out)
+        return True
+    except Exception:
+        return False
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def build_thumbnails(files, thumb_dir: str, workers: int = THUMB_WORKERS):
+    """files: [(path, size, mtime)]；返回 ({path: 缩略图 id}, 统计)，只包含已有缩略图的文件。"""
+    os.makedirs(thumb_dir, exist_ok=True)
+    keys = {}
+    todo = []
+    stats = {"docs": 0, "cached": 0, "rendered": 0, "failed": 0, "skipped": 0}
+    tool_ok = {}
+    for path, size, mtime in files:
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in THUMB_EXT or size > THUMB_MAX_SIZE:
+            continue
+        stats["docs"] += 1
+        key = thumb_key(path, size, mtime)
+        keys[path] = key
+        if os.path.exists(os.path.join(thumb_dir, key + ".jpg")) or os.path.exists(os.path.join(thumb_dir, key + ".fail")):
+            stats["cached"] += 1
+            continue
+        if ext not in tool_ok:
+            tool_ok[ext] = _tool_ok(ext)
+        if not tool_ok[ext]:
+            stats["skipped"] += 1
+            continue
+        todo.append((path, key))
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="tuankb-thumb") as ex:
+            futs = {ex.submit(render_thumb, path, os.path.join(thumb_dir, key + ".jpg")): key for path, key in todo}
+            for fut in as_completed(futs):
+                if fut.result():
+                    stats["rendered"] += 1
+                else:
+                    stats["failed"] += 1
+                    open(os.path.join(thumb_dir, futs[fut] + ".fail"), "w").close()
+
+    # 清理已失效（文件删除或变化）的缩略图
+    live = set(keys.values())
+    for fn in os.listdir(thumb_dir):
+        if fn.split(".", 1)[0] not in live:
+            try:
+                os.remove(os.path.join(thumb_dir, fn))
+            except OSError:
+                pass
+
+    out = {p: k for p, k in keys.items() if os.path.exists(os.path.join(thumb_dir, k + ".jpg"))}
+    return out, stats